@@ -1,13 +1,24 @@
 import logging
-import requests
+import os
+import time
 import pandas as pd
 import streamlit as st
 
-from constants import COIN_API_ENDPOINT, BITCOIN_DATA_ANALYSIS_TITLE, TOOL_INVITATION_DESCRIPTION
-from market_data_calculator import MarketDataCalculator
-from data_retriever import DataRetriever
-import prediction
-import visualize
+from constants import (
+    APP_CACHE_MAX_ENTRIES,
+    APP_PERIODS,
+    BITCOIN_DATA_ANALYSIS_TITLE,
+    COIN_API_WS_URL,
+    LIVE_CHART_REFRESH_SECONDS,
+    LIVE_FEED_URL_ENV,
+    LIVE_IDLE_TIMEOUT_SECONDS,
+    LIVE_SESSION_SECONDS,
+    PERIOD_SECONDS,
+    TOOL_INVITATION_DESCRIPTION,
+    VIDEO_FILE,
+    VIDEO_STATIC_DIR,
+)
+from instrumentation import PROFILER, stage
 
 # Logging setup
 logging.basicConfig(
@@ -17,50 +28,142 @@ logging.basicConfig(
 )
 
 
-def apply_market_calculations(df, calculations):
-    """Applies a series of market calculations on the DataFrame."""
-    for calculation in calculations:
-        df = calculation(df)
-    return df
+# Cached charts are keyed by the snapshot they are drawn from, so they go stale when a new candle opens;
+# the TTL of the shortest selectable period only bounds how long unused entries stay in memory.
+CACHE_TTL = PERIOD_SECONDS["1HRS"]
+
+# Most recent stage records listed in the profiling panel.
+PROFILING_PANEL_ROWS = 200
+
+
+class MarketDataUnavailable(Exception):
+    """Raised when the refresher has no snapshot for the selected period; the message says why."""
 
 
-def visualize_data(df):
-    """Visualizes the market data using various methods."""
-    visualize.market_data(df)
-    visualize.volatility(df)
-    visualize.trade_velocity(df)
-    visualize.rsi_and_macd(df)
+def visualize_data(df=None, figures=None):
+    """Visualizes the market data using various methods; df is only read for charts missing from figures."""
+    import visualize  # deferred with plotly until the first chart is drawn
+
+    figures = figures or {}
+    visualize.market_data(df, figures.get("market_data"))
+    visualize.volatility(df, figures.get("volatility"))
+    visualize.trade_velocity(df, figures.get("trade_velocity"))
+    visualize.rsi_and_macd(df, figures.get("rsi_and_macd"))
+
+
+@st.cache_resource
+def load_video(path):
+    """Reads a video file once per process."""
+    with open(path, 'rb') as video_file:
+        return video_file.read()
 
 
 def display_video():
-    """Displays a WEBM video."""
-    with open('app.webm', 'rb') as video_file:
-        st.video(video_file.read(), format='video/webm')
+    """
+    Displays a WEBM video.
+
+    With static serving enabled (.streamlit/config.toml) and the video in the static
+    folder, the browser fetches it by URL with range requests and it is never read
+    into this process; otherwise the file is read once and kept in memory.
+    """
+    if st.get_option("server.enableStaticServing") and os.path.isfile(os.path.join(VIDEO_STATIC_DIR, VIDEO_FILE)):
+        st.video(f"app/{VIDEO_STATIC_DIR}/{VIDEO_FILE}", format='video/webm')
+    elif os.path.isfile(VIDEO_FILE):
+        logging.warning(f"{VIDEO_FILE} is read into memory; move it to {VIDEO_STATIC_DIR}/{VIDEO_FILE} to serve it statically")
+        st.video(load_video(VIDEO_FILE), format='video/webm')
+
+
+def display_profiling():
+    """Displays the latest stage timings and their Prometheus exposition in a collapsible panel."""
+    if not PROFILER.enabled:
+        return
+    with st.expander("Profiling"):
+        records = PROFILER.recent(PROFILING_PANEL_ROWS)
+        if records:
+            st.dataframe(pd.DataFrame(records[::-1]), use_container_width=True)
+        else:
+            st.write("No stages recorded yet.")
+        st.code(PROFILER.prometheus_text(), language="text")
+
+
+@st.cache_resource
+def shared_refresher():
+    """The background refresher of this server process; every session reads the same snapshots."""
+    from refresher import Refresher  # deferred with the pipeline until the first API key is entered
+
+    return Refresher(APP_PERIODS)
 
 
 def fetch_and_predict_data(api_key, period):
-    limit = DataRetriever.set_limit(period)
-    url = f"{COIN_API_ENDPOINT}?period_id={period}&limit={limit}"
-    headers = {"X-CoinAPI-Key": api_key}
-
-    data = DataRetriever.retrieve_data(url, headers)
-
-    if isinstance(data, list) and data:
-        df = pd.DataFrame(data)
-        calculations = [
-            MarketDataCalculator.convert_to_datetime,
-            MarketDataCalculator.calculate_market_data,
-            MarketDataCalculator.calculate_volatility,
-            MarketDataCalculator.calculate_trade_velocity,
-            MarketDataCalculator.calculate_rsi,
-            MarketDataCalculator.calculate_macd
-        ]
-        df = apply_market_calculations(df, calculations)
-        df = prediction.append_forecasted_data(df)
-        return df
-    else:
-        st.write(f"Unexpected response format: {data}")
-        return None
+    """
+    Returns the shared snapshot of the analyzed period, computing it only if no session with this key has yet.
+
+    Refreshes run on the refresher's threads, which cannot write to the page, so their
+    errors come back through Refresher.last_error and are shown here.
+    """
+    refresher = shared_refresher()
+    with st.spinner("Fetching market data..."):
+        snapshot = refresher.get(api_key, period)
+    error = refresher.last_error(api_key, period)
+    if snapshot is None:
+        raise MarketDataUnavailable(error or f"No market data available for {period}")
+    if error:
+        refreshed = pd.Timestamp(snapshot.refreshed_at, unit="s", tz="UTC")
+        st.warning(f"Showing market data from {refreshed:%Y-%m-%d %H:%M} UTC, the latest refresh failed: {error}")
+    return snapshot
+
+
+@st.cache_resource(ttl=CACHE_TTL, max_entries=APP_CACHE_MAX_ENTRIES)
+def cached_figures(period, watermark, refreshed_at, start, end, max_points, _df):
+    """
+    Builds the charts once per snapshot and range; figures are shared read-only between sessions.
+
+    The range is selected on the snapshot frame as stored, so a compact frame is only
+    expanded on a cache miss, and only for the selected rows.
+    """
+    import visualize
+    from compact import expand_frame, select_rows
+
+    return visualize.build_figures(expand_frame(select_rows(_df, start, end)), max_points)
+
+
+def display_live(api_key, snapshot, start, end):
+    """
+    Follows the live trade feed of the snapshot's series and charts it after the history.
+
+    The charts are built from the history with indicators computed oldest first, the
+    order the streaming engine continues in, so live points extend the same curves;
+    they leave out the forecast. Every trade replaces or appends one point per trace,
+    and the charts are re-sent to the browser at most every LIVE_CHART_REFRESH_SECONDS.
+    The loop ends when the feed closes, after LIVE_IDLE_TIMEOUT_SECONDS without a trade,
+    after LIVE_SESSION_SECONDS, or when the page reruns.
+    """
+    import visualize
+    from downsample import point_budget, select_range
+    from live_feed import LiveFeed, stream
+
+    feed = LiveFeed(snapshot.candles, snapshot.symbol_id, snapshot.period)
+    figures = visualize.build_figures(select_range(feed.history_frame(), start, end), point_budget())
+    placeholders = {name: st.empty() for name in figures}
+    status = st.empty()
+
+    def render(update=None):
+        for name, fig in figures.items():
+            placeholders[name].plotly_chart(fig, use_container_width=True)
+        if update is not None:
+            status.caption(f"Last tick {update.candle['time_close']:%Y-%m-%d %H:%M:%S} UTC, processed in {update.seconds * 1000:.2f} ms")
+        return time.monotonic()
+
+    url = os.environ.get(LIVE_FEED_URL_ENV, COIN_API_WS_URL)
+    rendered, update = render(), None
+    updates = stream(url, api_key, feed, idle_timeout=LIVE_IDLE_TIMEOUT_SECONDS, duration=LIVE_SESSION_SECONDS)
+    for update in updates:
+        visualize.extend_figures(figures, update.candle, update.indicators)
+        if time.monotonic() - rendered >= LIVE_CHART_REFRESH_SECONDS:
+            rendered = render(update)
+    render(update)
+    st.info("The live feed has stopped. Rerun the page to resume it.")
+    st.button("Resume live feed")
 
 
 def main():
@@ -71,13 +174,28 @@ def main():
     col1, col2 = st.columns(2)
 
     api_key = col1.text_input('Enter your CoinAPI.io API Key:', type='password')
-    period = col2.selectbox('Select the time period:', ['1HRS', '4HRS', '12HRS'])
+    period = col2.selectbox('Select the time period:', APP_PERIODS)
+    live = col2.checkbox('Live', help='Follow the trade feed and update the charts as trades arrive')
 
     if api_key:
+        import requests
+        import visualize
+        from downsample import point_budget
+
         try:
-            df = fetch_and_predict_data(api_key, period)
-            if df is not None:
-                visualize_data(df)
+            with stage("page_load"):
+                snapshot = fetch_and_predict_data(api_key, period)
+                start, end = visualize.chart_range(snapshot.frame)
+                if not live:
+                    figures = cached_figures(
+                        period, snapshot.watermark, snapshot.refreshed_at, start, end, point_budget(), snapshot.frame
+                    )
+                    visualize_data(figures=figures)
+            if live:
+                display_live(api_key, snapshot, start, end)
+        except MarketDataUnavailable as e:
+            logging.error(f"No market data available for {period}: {e}")
+            st.error(str(e))
         except requests.RequestException as e:
             logging.error(f"Request error: {e}")
             st.write(f"Request error: {e}")
@@ -85,6 +203,8 @@ def main():
             logging.error(f"An unknown error occurred: {e}")
             st.write(f"An unknown error occurred: {e}")
 
+    display_profiling()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,206 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Union
+import aiohttp
+import pandas as pd
+
+from constants import COIN_API_BASE_URL, COIN_API_HISTORY_PATH, COIN_API_TIMEOUT, PERIOD_SECONDS
+
+logging.basicConfig(level=logging.INFO)
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Token-bucket throttle shared by every request of a retriever.
+
+    The bucket refills at a fixed rate and is additionally capped by the quota the
+    CoinAPI rate-limit headers report, waiting for the advertised reset once it is
+    exhausted.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost: float = 1) -> None:
+        """Waits until a request of the given cost may be sent."""
+        async with self.lock:
+            while True:
+                self._refill()
+                wait = max(self.blocked_until - time.monotonic(), 0.0)
+                if not wait and self.tokens >= cost:
+                    self.tokens -= cost
+                    return
+                await asyncio.sleep(max(wait, (cost - self.tokens) / self.rate))
+
+    def update_from_headers(self, headers) -> None:
+        """Adjusts the bucket to the X-RateLimit-* headers of a CoinAPI response."""
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return
+
+        self._refill()
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0:
+            reset = headers.get("X-RateLimit-Reset")
+            try:
+                delay = (pd.Timestamp(reset) - pd.Timestamp.now(tz="UTC")).total_seconds()
+            except (TypeError, ValueError):
+                delay = 1.0
+            self.blocked_until = time.monotonic() + max(delay, 0.0)
+
+
+class AsyncDataRetriever:
+    """
+    Asyncio counterpart of DataRetriever with one pooled HTTP client per instance.
+
+    Use as an async context manager. Requests are throttled through a token bucket,
+    retried with exponential backoff on rate limiting, server errors and connection
+    failures, and long history ranges are split into time-ranged pages fetched in
+    parallel. ``base_url`` can point to a local stub server.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = COIN_API_BASE_URL,
+        max_connections: int = 8,
+        requests_per_second: float = 10,
+        retries: int = 5,
+        backoff: float = 0.5,
+        timeout: float = COIN_API_TIMEOUT,
+        page_limit: int = 1000,
+    ):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.bucket = TokenBucket(requests_per_second, max(requests_per_second, 1))
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.page_limit = page_limit
+        self.session = None
+
+    async def __aenter__(self) -> "AsyncDataRetriever":
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            headers={"X-CoinAPI-Key": self.api_key},
+            timeout=self.timeout,
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.session.close()
+        self.session = None
+
+    async def fetch_json(self, path: str, params: dict) -> Union[dict, list]:
+        """
+        Sends one GET request, retrying transient failures.
+
+        :param path: The API path, e.g. "/v1/ohlcv/BITSTAMP_SPOT_BTC_USD/history".
+        :param params: The query parameters.
+        :return: The decoded JSON body.
+        """
+        for attempt in range(self.retries + 1):
+            await self.bucket.acquire()
+            retry_after = None
+            try:
+                async with self.session.get(f"{self.base_url}{path}", params=params) as response:
+                    self.bucket.update_from_headers(response.headers)
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        return await response.json(content_type=None)
+                    error = f"HTTP {response.status}"
+                    retry_after = response.headers.get("Retry-After")
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                error = str(e) or type(e).__name__
+
+            if attempt == self.retries:
+                raise aiohttp.ClientError(f"Giving up on {path} after {attempt + 1} attempts: {error}")
+
+            delay = self.backoff * (2 ** attempt) * (1 + random.random())
+            if retry_after is not None:
+                try:
+                    delay = max(delay, float(retry_after))
+                except ValueError:
+                    pass
+            logging.warning(f"Retrying {path} in {delay:.2f}s: {error}")
+            await asyncio.sleep(delay)
+
+    def history_pages(self, period: str, time_start: pd.Timestamp, time_end: pd.Timestamp) -> list:
+        """Splits [time_start, time_end) into ranges of at most page_limit candles."""
+        step = pd.Timedelta(seconds=PERIOD_SECONDS[period] * self.page_limit)
+        pages = []
+        start = time_start
+        while start < time_end:
+            pages.append((start, min(start + step, time_end)))
+            start += step
+        return pages
+
+    async def retrieve_history(self, symbol_id: str, period: str, time_start, time_end) -> list:
+        """
+        Retrieves the candles of a time range, one parallel request per page.
+
+        :param symbol_id: The CoinAPI symbol identifier.
+        :param period: The CoinAPI period identifier.
+        :param time_start: Start of the range (inclusive), anything pd.Timestamp accepts, UTC if naive.
+        :param time_end: End of the range (exclusive).
+        :return: The OHLCV records of the range, oldest first and without duplicates.
+        """
+        time_start = _utc(time_start)
+        time_end = _utc(time_end)
+        path = COIN_API_HISTORY_PATH.format(symbol_id=symbol_id)
+
+        pages = await asyncio.gather(*[
+            self.fetch_json(path, {
+                "period_id": period,
+                "time_start": start.strftime("%Y-%m-%dT%H:%M:%S"),
+                "time_end": end.strftime("%Y-%m-%dT%H:%M:%S"),
+                "limit": self.page_limit,
+            })
+            for start, end in self.history_pages(period, time_start, time_end)
+        ])
+
+        # Pages are requested in chronological order and each page is sorted oldest first.
+        records = {}
+        for page in pages:
+            if not isinstance(page, list):
+                raise ValueError(f"Unexpected response format: {page}")
+            for record in page:
+                records.setdefault(record["time_period_start"], record)
+        return list(records.values())
+
+
+def _utc(value) -> pd.Timestamp:
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp.tz_convert("UTC")
+
+
+def retrieve_history(api_key: str, symbol_id: str, period: str, time_start, time_end, **kwargs) -> list:
+    """
+    Synchronous wrapper running AsyncDataRetriever.retrieve_history in a fresh event loop.
+
+    :param kwargs: Extra AsyncDataRetriever options such as base_url or page_limit.
+    """
+    async def run():
+        async with AsyncDataRetriever(api_key, **kwargs) as retriever:
+            return await retriever.retrieve_history(symbol_id, period, time_start, time_end)
+
+    return asyncio.run(run())
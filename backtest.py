@@ -0,0 +1,231 @@
+import logging
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+import numpy as np
+from pandas import DataFrame
+
+from constants import BACKTEST_FEE
+from batch import available_cores
+from candle_store import COUNT_COLUMNS, PRICE_COLUMNS, TIME_COLUMNS
+from indicator_engine import INDICATOR_COLUMNS, StreamingIndicatorEngine
+from indicator_kernel import datetime_values
+import prediction
+
+logging.basicConfig(level=logging.INFO)
+
+# RSI levels below which the market is considered oversold (buy) and above which overbought (sell).
+RSI_OVERSOLD = 30
+RSI_OVERBOUGHT = 70
+
+# Window chunks handed to each worker process; more chunks balance the load better.
+CHUNKS_PER_WORKER = 4
+
+
+def _chronological(df: DataFrame) -> DataFrame:
+    times = datetime_values(df["time_period_start"])
+    return df.iloc[np.argsort(times, kind="stable")].reset_index(drop=True)
+
+
+def _indicators(engine: StreamingIndicatorEngine, candles: DataFrame) -> np.ndarray:
+    """Advances the engine over the candles and returns their indicator values, one column per INDICATOR_COLUMNS entry."""
+    return engine.update_frame(candles).to_numpy(dtype="float64")
+
+
+def _positions(entries: np.ndarray, exits: np.ndarray) -> np.ndarray:
+    """Long (1) from each entry until the next exit, flat (0) before the first entry."""
+    events = np.where(entries, 1.0, np.where(exits, 0.0, np.nan))
+    last = np.where(np.isnan(events), -1, np.arange(len(events)))
+    np.maximum.accumulate(last, out=last)
+    return np.where(last >= 0, events[np.maximum(last, 0)], 0.0)
+
+
+def signal_events(close: np.ndarray, indicators: np.ndarray) -> dict:
+    """
+    Entry and exit events of each strategy at every candle, decided on its close.
+
+    - macd_crossover: enter when the MACD line crosses above the signal line, exit when it crosses below.
+    - rsi: enter when the RSI falls below RSI_OVERSOLD, exit when it rises above RSI_OVERBOUGHT.
+    - bollinger: enter when the close crosses back above the lower band, exit when it falls back below the upper band.
+
+    :return: A dict of strategy name to (entries, exits) boolean arrays.
+    """
+    column = {name: indicators[:, i] for i, name in enumerate(INDICATOR_COLUMNS)}
+    spread = column["macd"] - column["macd_signal"]
+    previous_spread = np.concatenate(([np.nan], spread[:-1]))
+    previous_close = np.concatenate(([np.nan], close[:-1]))
+    lower, upper = column["bollinger_lower"], column["bollinger_upper"]
+    previous_lower = np.concatenate(([np.nan], lower[:-1]))
+    previous_upper = np.concatenate(([np.nan], upper[:-1]))
+    with np.errstate(invalid="ignore"):
+        return {
+            "macd_crossover": ((previous_spread <= 0) & (spread > 0), (previous_spread >= 0) & (spread < 0)),
+            "rsi": (column["rsi"] < RSI_OVERSOLD, column["rsi"] > RSI_OVERBOUGHT),
+            "bollinger": (
+                (previous_close < previous_lower) & (close >= lower),
+                (previous_close > previous_upper) & (close <= upper),
+            ),
+        }
+
+
+def simulate(close: np.ndarray, entries: np.ndarray, exits: np.ndarray, fee: float = BACKTEST_FEE) -> dict:
+    """
+    Simulates a long-only strategy that starts flat and trades at the close of the signalling candle.
+
+    Every position change costs ``fee`` of the equity and an open position is closed
+    (paying the fee) after the last candle.
+
+    :return: A dict with the total return, the buy-and-hold return, the number of trades,
+             the fraction of time invested and the maximum drawdown.
+    """
+    position = _positions(entries, exits)
+    returns = close[1:] / close[:-1] - 1
+    held = position[:-1]
+    changes = np.abs(np.diff(np.concatenate(([0.0], held, [0.0]))))
+    step = (1 + held * returns) * (1 - fee) ** changes[:-1]
+    equity = np.cumprod(np.concatenate(([1.0], step)))
+    equity[-1] *= (1 - fee) ** changes[-1]
+    peak = np.maximum.accumulate(equity)
+    return {
+        "total_return": equity[-1] - 1,
+        "buy_and_hold_return": close[-1] / close[0] - 1,
+        "trades": int(changes.sum()),
+        "exposure": float(held.mean()) if len(held) else 0.0,
+        "max_drawdown": float(np.max(1 - equity / peak)),
+    }
+
+
+def _fit_predict(X_train: np.ndarray, Y_train: np.ndarray, X_test: np.ndarray) -> np.ndarray:
+    """
+    Least-squares fit with intercept and prediction, the same solution LinearRegression finds.
+
+    Like LinearRegression the data is centered and the minimum-norm solution is taken,
+    but without its per-call input validation, which dominates for thousands of small fits.
+    """
+    X_mean = X_train.mean(axis=0)
+    Y_mean = Y_train.mean(axis=0)
+    coef, *_ = np.linalg.lstsq(X_train - X_mean, Y_train - Y_mean, rcond=None)
+    return (X_test - X_mean) @ coef + Y_mean
+
+
+def _forecast_errors(X: np.ndarray, Y: np.ndarray, train: slice, test: slice) -> dict:
+    """Fits the forecast model on the train rows and returns MAE, RMSE and MAPE arrays over the test rows."""
+    Y_train = Y[train].copy()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # columns that are all NaN are left unevaluated
+        means = np.nanmean(Y_train, axis=0)
+    np.copyto(Y_train, means, where=np.isnan(Y_train))
+    usable = np.isfinite(Y_train).all(axis=0)
+
+    errors = {name: np.full(Y.shape[1], np.nan) for name in ["mae", "rmse", "mape"]}
+    if not usable.any():
+        return errors
+    predicted = _fit_predict(X[train], Y_train[:, usable], X[test])
+    residuals = predicted - Y[test][:, usable]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        errors["mae"][usable] = np.nanmean(np.abs(residuals), axis=0)
+        errors["rmse"][usable] = np.sqrt(np.nanmean(residuals ** 2, axis=0))
+        errors["mape"][usable] = np.nanmean(np.abs(residuals / Y[test][:, usable]), axis=0) * 100
+    return errors
+
+
+def _run_chunk(candles: DataFrame, engine: StreamingIndicatorEngine, starts: list, train_size: int, test_size: int, fee: float) -> tuple:
+    """
+    Evaluates the windows starting at the given offsets of a contiguous candle span.
+
+    The engine holds the indicator state just before the span; it is advanced once
+    over the span, so overlapping windows share the same incremental indicator values.
+    """
+    indicators = _indicators(engine, candles)
+    close = candles["price_close"].to_numpy(dtype="float64")
+    times = datetime_values(candles["time_period_start"])
+    X = prediction.calendar_features(times, np.empty((len(candles), len(prediction.FEATURE_COLUMNS))))
+    targets = {col: i for i, col in enumerate(INDICATOR_COLUMNS)}
+    Y = np.column_stack([
+        indicators[:, targets[col]] if col in targets else candles[col].to_numpy(dtype="float64")
+        for col in prediction.FORECAST_COLUMNS
+    ])
+    events = signal_events(close, indicators)
+
+    forecasts, signals = [], []
+    for start in starts:
+        train = slice(start, start + train_size)
+        test = slice(start + train_size, start + train_size + test_size)
+        window = {"window_start": times[start], "test_start": times[test.start]}
+
+        errors = _forecast_errors(X, Y, train, test)
+        for i, col in enumerate(prediction.FORECAST_COLUMNS):
+            forecasts.append({**window, "column": col, **{name: values[i] for name, values in errors.items()}})
+
+        for name, (entries, exits) in events.items():
+            signals.append({**window, "strategy": name, **simulate(close[test], entries[test], exits[test], fee)})
+    return forecasts, signals
+
+
+def backtest(
+    df: DataFrame,
+    train_size: int = 24 * 7 * 4,
+    test_size: int = 24 * 7,
+    step: int = 24,
+    fee: float = BACKTEST_FEE,
+    max_workers: Union[int, None] = None,
+) -> dict:
+    """
+    Walk-forward backtest of the forecasts and the indicator trading signals.
+
+    Windows of train_size candles followed by test_size candles advance by step
+    candles. For each window the forecast model is fitted on the train candles and
+    its error measured on the test candles, and the MACD crossover, RSI and Bollinger
+    band strategies are simulated over the test candles with the given fee per trade.
+
+    Windows are split into contiguous chunks evaluated in a process pool. Each chunk
+    starts from a StreamingIndicatorEngine warmed up on the candles before it and
+    advances it incrementally, so indicators are never recomputed per window.
+
+    :param df: Candles in any order.
+    :param train_size: Number of candles the forecast model is fitted on.
+    :param test_size: Number of candles forecasts and strategies are evaluated on.
+    :param step: Number of candles between the starts of consecutive windows.
+    :param fee: Fraction of equity paid on every position change.
+    :param max_workers: Number of worker processes, all available cores if None.
+    :return: A dict with a "forecast" frame (MAE, RMSE and MAPE per window and column)
+             and a "signals" frame (returns, trades, exposure and drawdown per window and strategy).
+    """
+    candles = _chronological(df[[col for col in TIME_COLUMNS + PRICE_COLUMNS + COUNT_COLUMNS if col in df.columns]])
+    starts = list(range(0, len(candles) - train_size - test_size + 1, step))
+    if not starts:
+        raise ValueError(f"Not enough candles ({len(candles)}) for a window of {train_size} + {test_size}")
+
+    workers = max(1, min(max_workers or available_cores(), len(starts)))
+    chunks = [list(chunk) for chunk in np.array_split(starts, min(len(starts), workers * CHUNKS_PER_WORKER)) if len(chunk)]
+
+    tasks = []
+    for chunk in chunks:
+        first, last = chunk[0], chunk[-1] + train_size + test_size
+        engine = StreamingIndicatorEngine.from_history(candles.iloc[:first])
+        tasks.append((candles.iloc[first:last], engine, [start - first for start in chunk], train_size, test_size, fee))
+
+    if workers == 1:
+        results = [_run_chunk(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as processes:
+            results = list(processes.map(_run_chunk, *zip(*tasks)))
+
+    forecasts = [row for chunk_forecasts, _ in results for row in chunk_forecasts]
+    signals = [row for _, chunk_signals in results for row in chunk_signals]
+    logging.info(f"Backtested {len(starts)} windows in {len(chunks)} chunks on {workers} workers")
+    frames = {"forecast": DataFrame(forecasts), "signals": DataFrame(signals)}
+    for frame in frames.values():
+        for col in ["window_start", "test_start"]:
+            frame[col] = frame[col].dt.tz_localize("UTC")
+    return frames
+
+
+def summarize(results: dict) -> dict:
+    """Averages the backtest results over all windows, per forecast column and per strategy."""
+    return {
+        "forecast": results["forecast"].groupby("column", sort=False)[["mae", "rmse", "mape"]].mean(),
+        "signals": results["signals"].groupby("strategy", sort=False)[
+            ["total_return", "buy_and_hold_return", "trades", "exposure", "max_drawdown"]
+        ].mean(),
+    }
@@ -0,0 +1,78 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import product
+from typing import Union
+import pandas as pd
+from pandas import DataFrame
+
+import pipeline
+
+logging.basicConfig(level=logging.INFO)
+
+# Upper bound on simultaneous CoinAPI requests while fetching a batch.
+MAX_FETCH_THREADS = 16
+
+
+def available_cores() -> int:
+    """Returns the number of CPU cores this process may run on."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _fetch(api_key: str, symbol_id: str, period: str) -> Union[DataFrame, None]:
+    try:
+        return pipeline.fetch_candles(api_key, period, symbol_id)
+    except Exception as e:
+        logging.error(f"Error fetching {symbol_id} {period}: {e}")
+        return None
+
+
+def analyze_symbols(
+    api_key: str,
+    symbols: list,
+    periods: list,
+    max_workers: Union[int, None] = None,
+    long_format: bool = False,
+) -> Union[dict, DataFrame]:
+    """
+    Runs the indicator and forecast pipeline for every combination of symbols and periods.
+
+    Candles are fetched concurrently in threads, then each series is analyzed in a
+    process pool sized to the available cores.
+
+    :param api_key: The CoinAPI.io API key.
+    :param symbols: CoinAPI symbol identifiers, e.g. ["BITSTAMP_SPOT_BTC_USD", "COINBASE_SPOT_ETH_USD"].
+    :param periods: CoinAPI period identifiers, e.g. ["1HRS", "4HRS"].
+    :param max_workers: Number of worker processes, all available cores if None.
+    :param long_format: Return one frame with symbol_id and period_id columns instead of a dict.
+    :return: A dict of (symbol_id, period_id) to data frame, or one long-format data frame.
+    """
+    keys = list(product(symbols, periods))
+
+    with ThreadPoolExecutor(max_workers=min(len(keys), MAX_FETCH_THREADS) or 1) as threads:
+        frames = list(threads.map(lambda key: _fetch(api_key, *key), keys))
+
+    fetched = [(key, df) for key, df in zip(keys, frames) if df is not None and not df.empty]
+    for key, df in zip(keys, frames):
+        if df is None or df.empty:
+            logging.error(f"No market data retrieved for {key[0]} {key[1]}")
+
+    results = {}
+    if fetched:
+        with ProcessPoolExecutor(max_workers=min(max_workers or available_cores(), len(fetched))) as processes:
+            analyzed = processes.map(
+                pipeline.analyze,
+                [df for _, df in fetched],
+                [key[1] for key, _ in fetched],
+                [key[0] for key, _ in fetched],
+            )
+            results = dict(zip([key for key, _ in fetched], analyzed))
+
+    if not long_format:
+        return results
+    if not results:
+        return DataFrame()
+    return pd.concat(results, names=["symbol_id", "period_id", None]).reset_index(level=[0, 1]).reset_index(drop=True)
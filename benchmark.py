@@ -0,0 +1,342 @@
+"""
+Offline benchmarks of the pipeline hot paths on synthetic CoinAPI OHLCV payloads.
+
+    python benchmark.py --sizes 1000 100000
+    python benchmark.py --sizes 1000 100000 10000000 --save-baseline
+    python benchmark.py --sizes 1000 100000 --tolerance 0.25
+    python benchmark.py --imports
+    python benchmark.py --compact --sizes 100000
+
+Every stage is timed (best of --repeat runs) and then run once more under
+tracemalloc to record peak traced memory, the number of allocations still live
+at its peak, and the process peak RSS.
+Results are compared with the stored baseline; the exit status is 1 when a stage
+is slower than the baseline by more than the tolerance.
+
+With --imports, the cold import time of the entry points is measured in fresh
+interpreters instead and checked against IMPORT_TIME_BUDGETS; the exit status is 1
+when a module exceeds its budget or loads one of the DEFERRED_MODULES.
+
+With --compact, the analyzed frame of each size is converted to the compact layout
+(compact.py) and its bytes per candle are reported; the exit status is 1 when the
+result breaks the accuracy contract.
+"""
+import argparse
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+from constants import DEFERRED_MODULES, IMPORT_TIME_BUDGETS, PERIOD_SECONDS
+
+logging.basicConfig(level=logging.WARNING)
+
+DEFAULT_BASELINE = os.path.join(".benchmarks", "baseline.json")
+
+# Candles per synthetic API response, CoinAPI's largest page. The parse stage decodes one
+# response of at most this many candles, so large runs never build their payload as one string.
+PAYLOAD_CHUNK_ROWS = 100000
+
+
+def synthetic_columns(rows: int, period: str = "1HRS", seed: int = 0, end: str = "2023-09-20T12:00:00") -> dict:
+    """
+    Generates the columns of a CoinAPI-shaped OHLCV series, newest candle first like the /latest endpoint.
+
+    Prices follow a geometric random walk; volumes and trade counts are uniform.
+
+    :param rows: Number of candles.
+    :param period: The CoinAPI period identifier of the candles.
+    :param seed: Seed of the random generator.
+    :param end: time_period_start of the newest candle.
+    :return: datetime64[s] time columns and float64/int64 value columns by CoinAPI field name.
+    """
+    rng = np.random.default_rng(seed)
+    step = np.timedelta64(PERIOD_SECONDS[period], "s")
+    starts = np.datetime64(end, "s") - step * np.arange(rows)
+    close = 26000 * np.exp(np.cumsum(rng.normal(0, 0.005, rows)))
+    price_open = np.roll(close, -1)
+    price_open[-1] = close[-1]
+    return {
+        "time_period_start": starts,
+        "time_period_end": starts + step,
+        "time_open": starts + np.timedelta64(3, "s"),
+        "time_close": starts + step - np.timedelta64(2, "s"),
+        "price_open": price_open,
+        "price_high": np.maximum(price_open, close) * (1 + rng.uniform(0, 0.003, rows)),
+        "price_low": np.minimum(price_open, close) * (1 - rng.uniform(0, 0.003, rows)),
+        "price_close": close,
+        "volume_traded": rng.uniform(5, 200, rows),
+        "trades_count": rng.integers(100, 3000, rows),
+    }
+
+
+def synthetic_candles(rows: int, period: str = "1HRS", seed: int = 0, end: str = "2023-09-20T12:00:00") -> bytes:
+    """
+    Serializes synthetic_columns as the JSON body of one CoinAPI response.
+
+    :return: The UTF-8 encoded JSON array.
+    """
+    columns = synthetic_columns(rows, period, seed, end)
+
+    def iso(values):
+        return np.char.add(np.datetime_as_string(values, unit="s"), ".0000000Z")
+
+    return ("[" + ",".join(
+        f'{{"time_period_start":"{tps}","time_period_end":"{tpe}","time_open":"{to}","time_close":"{tc}",'
+        f'"price_open":{po!r},"price_high":{ph!r},"price_low":{pl!r},"price_close":{pc!r},'
+        f'"volume_traded":{v!r},"trades_count":{n}}}'
+        for tps, tpe, to, tc, po, ph, pl, pc, v, n in zip(
+            *(iso(columns[col]) for col in ["time_period_start", "time_period_end", "time_open", "time_close"]),
+            *(columns[col].tolist() for col in ["price_open", "price_high", "price_low", "price_close", "volume_traded", "trades_count"]),
+        )
+    ) + "]").encode()
+
+
+def synthetic_frame(rows: int, period: str = "1HRS", seed: int = 0, end: str = "2023-09-20T12:00:00") -> pd.DataFrame:
+    """
+    Builds synthetic_columns directly as the typed frame ingest.parse_candles returns for their JSON.
+
+    Large inputs are made this way, so they never pass through a JSON payload.
+    """
+    columns = synthetic_columns(rows, period, seed, end)
+    for col in ["time_period_start", "time_period_end", "time_open", "time_close"]:
+        columns[col] = pd.DatetimeIndex(columns[col].astype("datetime64[ns]")).tz_localize("UTC")
+    return pd.DataFrame(columns, copy=False)
+
+
+def _peak_rss_bytes() -> int:
+    """Peak resident set size of the process; reset per stage where Linux allows it."""
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+def _reset_peak_rss() -> None:
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def measure(stage, setup, rows: int, repeat: int) -> dict:
+    """
+    Times one stage and records its memory behaviour.
+
+    :param stage: Callable receiving the value returned by setup.
+    :param setup: Callable returning a fresh input for every run, excluded from the timing.
+    :param rows: Number of input rows, used for the throughput.
+    :param repeat: Number of timed runs; the fastest is reported.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        value = setup()
+        start = time.perf_counter()
+        stage(value)
+        best = min(best, time.perf_counter() - start)
+
+    value = setup()
+    _reset_peak_rss()
+    tracemalloc.start()
+    stage(value)
+    _, peak = tracemalloc.get_traced_memory()
+    allocations = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+
+    return {
+        "seconds": best,
+        "rows_per_second": rows / best if best else float("inf"),
+        "peak_traced_bytes": peak,
+        "live_allocations": allocations,
+        "peak_rss_bytes": _peak_rss_bytes(),
+    }
+
+
+def run_benchmarks(rows: int, repeat: int = 3) -> dict:
+    """
+    Runs every stage on a synthetic series of the given size and returns the results per stage.
+
+    parse_candles_typed decodes one API response through ingest.parse_candles, the parser
+    DataRetriever.retrieve_frame uses, of at most PAYLOAD_CHUNK_ROWS candles; its
+    rows_per_second is per decoded candle. The other stages start from the typed frame
+    built directly by synthetic_frame, and build_figures downsamples to the app's point_budget().
+    """
+    from market_data_calculator import MarketDataCalculator
+    from indicator_kernel import compute_indicators
+    from downsample import point_budget
+    from ingest import parse_candles
+    import pipeline
+    import prediction
+    import visualize
+
+    response_rows = min(rows, PAYLOAD_CHUNK_ROWS)
+    payload = synthetic_candles(response_rows)
+    results = {"parse_candles_typed": measure(parse_candles, lambda: payload, response_rows, repeat)}
+    logging.warning(f"{response_rows} rows parse_candles_typed: {results['parse_candles_typed']['seconds']:.4f}s")
+    del payload
+
+    typed = synthetic_frame(rows)
+    indicators = pipeline.calculate_indicators(typed.copy())
+
+    stages = {
+        "convert_to_datetime": (MarketDataCalculator.convert_to_datetime, typed.copy),
+        "calculate_market_data": (MarketDataCalculator.calculate_market_data, typed.copy),
+        "calculate_volatility": (MarketDataCalculator.calculate_volatility, typed.copy),
+        "calculate_trade_velocity": (MarketDataCalculator.calculate_trade_velocity, typed.copy),
+        "calculate_rsi": (MarketDataCalculator.calculate_rsi, typed.copy),
+        "calculate_macd": (MarketDataCalculator.calculate_macd, typed.copy),
+        "compute_indicators_numpy": (compute_indicators, typed.copy),
+        "append_forecasted_data": (prediction.append_forecasted_data, indicators.copy),
+        "build_figures": (lambda df: visualize.build_figures(df, point_budget()), lambda: indicators),
+        "analyze_copy": (lambda df: pipeline.analyze(df, mode="copy"), typed.copy),
+        "analyze_in_place": (lambda df: pipeline.analyze(df, mode="in_place"), typed.copy),
+    }
+
+    for name, (stage, setup) in stages.items():
+        results[name] = measure(stage, setup, rows, repeat)
+        logging.warning(f"{rows} rows {name}: {results[name]['seconds']:.4f}s")
+    return results
+
+
+def check_compact_layout(rows: int) -> dict:
+    """Compacts the analyzed frame of a synthetic payload and checks it against the accuracy contract."""
+    from compact import accuracy_problems, compact_frame, expand_frame
+    import pipeline
+
+    # Without a period the forecast stays hourly and bypasses MODEL_REGISTRY, so nothing is persisted.
+    frame = pipeline.analyze(synthetic_frame(rows))
+    result = {}
+    for calendar in ("narrow", "recompute"):
+        start = time.perf_counter()
+        compacted = compact_frame(frame, "1HRS", calendar)
+        compact_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        expand_frame(compacted)
+        result[calendar] = {
+            "bytes_per_candle": compacted.memory_usage(index=False).sum() / len(frame),
+            "full_bytes_per_candle": frame.memory_usage(index=False).sum() / len(frame),
+            "compact_seconds": compact_seconds,
+            "expand_seconds": time.perf_counter() - start,
+            "problems": accuracy_problems(frame, compacted),
+        }
+    return result
+
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {deferred!r} if name in sys.modules and name != {module!r}]}}))
+"""
+
+
+def measure_import(module: str, repeat: int = 3) -> dict:
+    """
+    Measures the cold import time of a module in fresh interpreters started in this directory.
+
+    :return: The fastest time in seconds and the DEFERRED_MODULES the import loaded.
+    """
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True,
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    return best
+
+
+def check_import_budgets(repeat: int = 3) -> list:
+    """Lists the (module, problem) of every entry point over its import budget or loading a deferred module."""
+    problems = []
+    for module, budget in IMPORT_TIME_BUDGETS.items():
+        result = measure_import(module, repeat)
+        print(f"{module}: {result['seconds']:.3f}s (budget {budget:.3f}s)")
+        if result["seconds"] > budget:
+            problems.append((module, f"imported in {result['seconds']:.3f}s, over its {budget:.3f}s budget"))
+        if result["loaded"]:
+            problems.append((module, f"loads {', '.join(result['loaded'])} at import time"))
+    return problems
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """Lists the (size, stage, seconds, baseline seconds) whose time exceeds the baseline by more than tolerance."""
+    regressions = []
+    for size, stages in results.items():
+        for name, result in stages.items():
+            reference = baseline.get(size, {}).get(name)
+            if reference and result["seconds"] > reference["seconds"] * (1 + tolerance):
+                regressions.append((size, name, result["seconds"], reference["seconds"]))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 100000], help="Candle counts to benchmark, e.g. 1000 100000 10000000.")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the fastest is kept.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Baseline JSON file to compare with.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a stage is flagged.")
+    parser.add_argument("--output", help="Also write the results to this JSON file.")
+    parser.add_argument("--imports", action="store_true", help="Check the cold import times against IMPORT_TIME_BUDGETS instead.")
+    parser.add_argument("--compact", action="store_true", help="Check the compact frame layout against its accuracy contract instead.")
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        results = {str(rows): check_compact_layout(rows) for rows in args.sizes}
+        print(json.dumps(results, indent=2))
+        broken = [(size, calendar, problem) for size, layouts in results.items()
+                  for calendar, result in layouts.items() for problem in result["problems"]]
+        for size, calendar, (column, problem) in broken:
+            print(f"COMPACT ACCURACY {size} rows {calendar} {column}: {problem}", file=sys.stderr)
+        return 1 if broken else 0
+
+    if args.imports:
+        problems = check_import_budgets(args.repeat)
+        for module, problem in problems:
+            print(f"IMPORT BUDGET {module}: {problem}", file=sys.stderr)
+        return 1 if problems else 0
+
+    results = {str(rows): run_benchmarks(rows, args.repeat) for rows in args.sizes}
+    print(json.dumps(results, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w") as fh:
+            json.dump(results, fh, indent=2)
+        return 0
+
+    try:
+        with open(args.baseline) as fh:
+            baseline = json.load(fh)
+    except FileNotFoundError:
+        logging.warning(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions = find_regressions(results, baseline, args.tolerance)
+    for size, name, seconds, reference in regressions:
+        print(f"REGRESSION {size} rows {name}: {seconds:.4f}s vs baseline {reference:.4f}s", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Headless entry point running the fetch, indicator and forecast pipeline without Streamlit.
+
+    COIN_API_KEY=... python -m bitcoin_analysis run --period 4HRS --out result.parquet
+    python -m bitcoin_analysis run --symbol COINBASE_SPOT_ETH_USD --period 1HRS --out eth.csv --api-key ...
+    python -m bitcoin_analysis replay --period 1HRS --shift-to-now
+
+The pipeline modules are imported only once a command runs, and nothing on that path
+imports Streamlit or Plotly, so scheduled jobs load just the data stack. The result is
+written in the columnar format given by the extension of --out: .parquet, .feather or .csv.
+The exit status is 1 when no market data could be retrieved.
+
+replay serves the candles of the local candle store as a CoinAPI-compatible WebSocket
+feed for offline testing of the app's live mode (set LIVE_FEED_URL=ws://localhost:8765).
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+from constants import (
+    COIN_API_KEY_ENV,
+    DEFAULT_SYMBOL_ID,
+    LIVE_REPLAY_INTERVAL_SECONDS,
+    LIVE_REPLAY_PORT,
+    PERIOD_SECONDS,
+    PIPELINE_MODE,
+)
+
+logging.basicConfig(level=logging.INFO)
+
+# Output writers by file extension.
+OUTPUT_FORMATS = {
+    ".parquet": lambda df, path: df.to_parquet(path, index=False),
+    ".feather": lambda df, path: df.reset_index(drop=True).to_feather(path),
+    ".csv": lambda df, path: df.to_csv(path, index=False),
+}
+
+
+def write_output(df, path: str) -> None:
+    """
+    Writes the pipeline result in the format given by the extension of path.
+
+    :param df: The analyzed data frame.
+    :param path: The output file, ending in one of OUTPUT_FORMATS.
+    :raises ValueError: If the extension is not supported.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format {extension!r}, expected one of {', '.join(OUTPUT_FORMATS)}")
+    OUTPUT_FORMATS[extension](df, path)
+
+
+def run(args: argparse.Namespace) -> int:
+    """Fetches and analyzes one symbol and period and writes the result; returns the exit status."""
+    api_key = args.api_key or os.environ.get(COIN_API_KEY_ENV)
+    if not api_key:
+        logging.error(f"No API key given, pass --api-key or set {COIN_API_KEY_ENV}")
+        return 2
+
+    from pipeline import fetch_and_analyze
+
+    started = time.perf_counter()
+    df = fetch_and_analyze(api_key, args.period, args.symbol, horizon=args.horizon, mode=args.mode)
+    if df is None:
+        logging.error(f"No market data available for {args.symbol} {args.period}")
+        return 1
+
+    write_output(df, args.out)
+    logging.info(f"Wrote {len(df)} rows for {args.symbol} {args.period} to {args.out} in {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+def replay(args: argparse.Namespace) -> int:
+    """Serves the stored candles of one symbol and period over WebSocket until interrupted; returns the exit status."""
+    from candle_store import CandleStore
+    from live_feed import replay_server
+
+    candles = CandleStore(symbol_id=args.symbol).load(args.period, args.limit)
+    if candles is None or candles.empty:
+        logging.error(f"No stored candles for {args.symbol} {args.period}, run the app or the run command first")
+        return 1
+
+    # Shifted candles continue the current one, so a client warmed up on live history treats them as new trades.
+    start = datetime.now(timezone.utc) if args.shift_to_now else None
+    with replay_server(candles, args.symbol, args.period, args.host, args.port, args.interval, start) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    return 0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="bitcoin_analysis", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Fetch candles, compute the indicators and forecasts and write the result")
+    run_parser.add_argument("--symbol", default=DEFAULT_SYMBOL_ID, help="CoinAPI symbol identifier")
+    run_parser.add_argument("--period", default="1HRS", choices=list(PERIOD_SECONDS), help="CoinAPI period identifier")
+    run_parser.add_argument("--out", required=True, help=f"Output file ({', '.join(OUTPUT_FORMATS)})")
+    run_parser.add_argument("--api-key", help=f"CoinAPI.io API key, read from {COIN_API_KEY_ENV} if omitted")
+    run_parser.add_argument("--horizon", type=int, help="Number of forecast rows to append (at least 1), one week's worth if omitted")
+    run_parser.add_argument("--mode", default=PIPELINE_MODE, choices=["copy", "in_place"], help="Pipeline mode")
+    run_parser.set_defaults(handler=run)
+
+    replay_parser = commands.add_parser("replay", help="Serve stored candles as a local WebSocket trade feed")
+    replay_parser.add_argument("--symbol", default=DEFAULT_SYMBOL_ID, help="CoinAPI symbol identifier")
+    replay_parser.add_argument("--period", default="1HRS", choices=list(PERIOD_SECONDS), help="CoinAPI period identifier")
+    replay_parser.add_argument("--limit", type=int, help="Replay only the newest LIMIT candles")
+    replay_parser.add_argument("--host", default="localhost", help="Interface to listen on")
+    replay_parser.add_argument("--port", type=int, default=LIVE_REPLAY_PORT, help="Port to listen on")
+    replay_parser.add_argument("--interval", type=float, default=LIVE_REPLAY_INTERVAL_SECONDS, help="Seconds between messages")
+    replay_parser.add_argument("--shift-to-now", action="store_true", help="Shift the candles so that the replay starts at the current candle")
+    replay_parser.set_defaults(handler=replay)
+
+    args = parser.parse_args(argv)
+    extension = os.path.splitext(getattr(args, "out", ""))[1].lower()
+    if args.command == "run" and extension not in OUTPUT_FORMATS:
+        parser.error(f"--out must end in one of {', '.join(OUTPUT_FORMATS)}")
+    if args.command == "run" and args.horizon is not None and args.horizon < 1:
+        parser.error("--horizon must be at least 1")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
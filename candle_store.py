@@ -0,0 +1,174 @@
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import CANDLE_STORE_DIR, DEFAULT_SYMBOL_ID
+from instrumentation import instrumented
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+logging.basicConfig(level=logging.INFO)
+
+TIME_COLUMNS = ["time_period_start", "time_period_end", "time_open", "time_close"]
+PRICE_COLUMNS = ["price_open", "price_high", "price_low", "price_close", "volume_traded"]
+COUNT_COLUMNS = ["trades_count"]
+CANDLE_COLUMNS = TIME_COLUMNS + PRICE_COLUMNS + COUNT_COLUMNS
+
+_directory_locks = {}
+_directory_locks_guard = threading.Lock()
+
+
+def to_utc_nanoseconds(values) -> np.ndarray:
+    """Converts ISO timestamp strings or datetimes to int64 nanoseconds since the epoch (UTC)."""
+    index = pd.DatetimeIndex(pd.to_datetime(values, utc=True))
+    return index.tz_localize(None).to_numpy(dtype="datetime64[ns]").view("int64")
+
+
+class CandleStore:
+    """
+    On-disk columnar store of OHLCV candles, one directory per symbol and period_id.
+
+    Every column is kept as a separate ``.npy`` file sorted by ``time_period_start``
+    and is opened memory-mapped, so reading the latest window does not load the
+    whole history into memory.
+
+    Writers of one directory are serialized by a lock per directory within the
+    process and a file lock on its ``.lock`` file across processes, and each stages
+    its columns under its own temporary names, so concurrent merges never mix
+    columns of different writers.
+    """
+
+    def __init__(self, root: str = CANDLE_STORE_DIR, symbol_id: str = DEFAULT_SYMBOL_ID):
+        self.root = root
+        self.symbol_id = symbol_id
+
+    def path(self, period_id: str) -> str:
+        """Returns the directory holding the columns of one period."""
+        return os.path.join(self.root, self.symbol_id, period_id)
+
+    @contextmanager
+    def lock(self, period_id: str):
+        """Holds the write lock of a period's directory, for a whole read-modify-write."""
+        directory = self.path(period_id)
+        os.makedirs(directory, exist_ok=True)
+        with _directory_locks_guard:
+            thread_lock = _directory_locks.setdefault(os.path.abspath(directory), threading.Lock())
+        with thread_lock, open(os.path.join(directory, ".lock"), "a") as fh:
+            if fcntl is not None:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            yield
+
+    def load_arrays(self, period_id: str) -> Union[dict, None]:
+        """
+        Opens the stored columns of a period as read-only memory maps.
+
+        :param period_id: The CoinAPI period identifier, e.g. "1HRS".
+        :return: A dict of column name to array, or None if nothing usable is stored.
+        """
+        directory = self.path(period_id)
+        try:
+            arrays = {
+                col: np.load(os.path.join(directory, f"{col}.npy"), mmap_mode="r")
+                for col in CANDLE_COLUMNS
+            }
+        except (FileNotFoundError, ValueError) as e:
+            logging.info(f"No candle store for {self.symbol_id} {period_id}: {e}")
+            return None
+
+        if len({len(values) for values in arrays.values()}) != 1:
+            logging.error(f"Candle store for {self.symbol_id} {period_id} has columns of different lengths, ignoring it")
+            return None
+        return arrays
+
+    def latest_start(self, period_id: str) -> Union[pd.Timestamp, None]:
+        """Returns the time_period_start of the newest stored candle, or None if the store is empty."""
+        arrays = self.load_arrays(period_id)
+        if arrays is None or not len(arrays["time_period_start"]):
+            return None
+        return pd.Timestamp(int(arrays["time_period_start"][-1]), tz="UTC")
+
+    def load(self, period_id: str, limit: Union[int, None] = None) -> Union[DataFrame, None]:
+        """
+        Loads the newest candles of a period in the order the CoinAPI ``/latest`` endpoint returns them.
+
+        :param period_id: The CoinAPI period identifier.
+        :param limit: Maximum number of candles to return, newest first. All candles if None.
+        :return: A data frame with typed columns, or None if nothing is stored.
+        """
+        arrays = self.load_arrays(period_id)
+        if arrays is None:
+            return None
+
+        start = 0 if limit is None else max(len(arrays["time_period_start"]) - limit, 0)
+        columns = {}
+        for col in CANDLE_COLUMNS:
+            # Only the requested tail is copied out of the memory map, newest candle first.
+            values = np.array(arrays[col][start:][::-1])
+            if col in TIME_COLUMNS:
+                values = pd.DatetimeIndex(values.view("datetime64[ns]")).tz_localize("UTC")
+            columns[col] = values
+        return DataFrame(columns)
+
+    def save(self, period_id: str, df: DataFrame) -> None:
+        """
+        Replaces the stored candles of a period with the given data frame.
+
+        :param period_id: The CoinAPI period identifier.
+        :param df: Candles with at least the CoinAPI OHLCV columns, in any order.
+        """
+        with self.lock(period_id):
+            self._write(period_id, df)
+
+    def _write(self, period_id: str, df: DataFrame) -> None:
+        """Writes the columns of a period; the caller holds its lock."""
+        directory = self.path(period_id)
+        order = np.argsort(to_utc_nanoseconds(df["time_period_start"]), kind="stable")
+        for col in CANDLE_COLUMNS:
+            if col in TIME_COLUMNS:
+                values = to_utc_nanoseconds(df[col])
+            elif col in COUNT_COLUMNS:
+                values = df[col].to_numpy(dtype="int64")
+            else:
+                values = df[col].to_numpy(dtype="float64")
+
+            target = os.path.join(directory, f"{col}.npy")
+            tmp = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as fh:
+                np.save(fh, values[order])
+            os.replace(tmp, target)
+
+    @instrumented()
+    def merge(self, period_id: str, data: Union[list, DataFrame], limit: Union[int, None] = None) -> DataFrame:
+        """
+        Merges freshly retrieved candles into the store without duplicates and persists the result.
+
+        Candles sharing a time_period_start with a stored one replace it, so the
+        still-open latest candle is refreshed on every merge.
+
+        :param period_id: The CoinAPI period identifier.
+        :param data: CoinAPI OHLCV records or a data frame of candles.
+        :param limit: Maximum number of candles to return, newest first. All candles if None.
+        :return: The stored candles after the merge, newest first.
+        """
+        new_df = DataFrame(data)
+        with self.lock(period_id):
+            stored = self.load(period_id)
+
+            if stored is not None and not stored.empty:
+                for col in TIME_COLUMNS:
+                    new_df[col] = pd.to_datetime(new_df[col], utc=True)
+                merged = pd.concat([stored, new_df[CANDLE_COLUMNS]], ignore_index=True)
+                merged = merged.drop_duplicates(subset="time_period_start", keep="last")
+            else:
+                merged = new_df[CANDLE_COLUMNS]
+
+            self._write(period_id, merged)
+            return self.load(period_id, limit)
@@ -0,0 +1,252 @@
+"""
+Compact in-memory layout of analyzed frames, for keeping long histories of many symbols in RAM.
+
+compact_frame turns the frame returned by pipeline.analyze from about 208 bytes per
+candle into about 121 (116 with calendar="recompute"):
+
+* derived float64 columns (indicators and forecast-only columns) are stored as float32;
+  the raw prices, volume and trade count stay float64,
+* hour, day and month are stored as int8 and year as int16, or dropped and recomputed
+  from time_period_start by expand_frame,
+* time_period_start is stored as an int32 number of periods after one int64 epoch base
+  when every start lies on the period grid, and time_period_end is dropped when it is
+  always one period later; both are kept as they are otherwise,
+* time_open and time_close are stored as int32 millisecond offsets from time_period_start.
+
+The layout is described in df.attrs[COMPACT_ATTR]; expand_frame restores the float64
+layout for the charts and other consumers. time_bounds and select_rows read the time
+axis of either layout, so a chart range can be picked and sliced before expanding.
+
+Accuracy contract, against the float64 frame compact_frame was given (checked by
+accuracy_problems and ``python benchmark.py --compact``):
+
+* float32 columns: NaN and infinities are kept, and every finite value x comes back as
+  x' with |x' - x| <= 2**-24 * |x| + 2**-149 (round to nearest float32), i.e. about 7
+  significant digits; values beyond the float32 range (|x| > 3.4e38) are not supported,
+* raw prices, volume and trade counts, calendar features, time_period_start and
+  time_period_end are exact,
+* time_open and time_close are rounded to the nearest millisecond; NaT is kept,
+* timestamps come back as datetime64[ns, UTC] and calendar features as int32.
+"""
+import logging
+from typing import Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import PERIOD_SECONDS
+from candle_store import COUNT_COLUMNS, PRICE_COLUMNS
+from indicator_kernel import datetime_values
+from instrumentation import instrumented
+import prediction
+
+logging.basicConfig(level=logging.INFO)
+
+# Key of the layout description in DataFrame.attrs.
+COMPACT_ATTR = "compact_layout"
+
+# Narrowest integer types holding each calendar feature.
+CALENDAR_DTYPES = {"hour": "int8", "day": "int8", "month": "int8", "year": "int16"}
+
+# Columns kept at full precision: the candles as retrieved.
+EXACT_COLUMNS = PRICE_COLUMNS + COUNT_COLUMNS
+
+# Timestamps stored as millisecond offsets from time_period_start.
+OFFSET_COLUMNS = ["time_open", "time_close"]
+
+# Bound of the float32 rounding error in the accuracy contract: relative, plus absolute for subnormals.
+FLOAT32_RTOL = 2.0 ** -24
+FLOAT32_ATOL = 2.0 ** -149
+
+_MILLISECOND = 10 ** 6
+_MISSING = np.iinfo("int32").min
+_INT32_MAX = np.iinfo("int32").max
+
+
+def is_compact(df: DataFrame) -> bool:
+    """True if the frame was returned by compact_frame."""
+    return COMPACT_ATTR in df.attrs
+
+
+def _utc(values: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(values.view("datetime64[ns]")).tz_localize("UTC")
+
+
+def _starts(df: DataFrame) -> np.ndarray:
+    """time_period_start of a frame in either layout, as int64 nanoseconds."""
+    layout = df.attrs.get(COMPACT_ATTR)
+    if layout is not None and layout["epoch_ns"] is not None:
+        return layout["epoch_ns"] + df["time_period_start"].to_numpy().astype("int64") * layout["step_ns"]
+    return datetime_values(df["time_period_start"]).view("int64")
+
+
+def time_bounds(df: DataFrame) -> tuple:
+    """
+    Returns the first and last time_period_start of a compact or float64 frame, without expanding it.
+
+    :return: A (first, last) tuple of UTC timestamps; NaT for an empty frame.
+    """
+    starts = _starts(df)
+    starts = starts[starts != np.iinfo("int64").min]
+    if not len(starts):
+        return pd.NaT, pd.NaT
+    return pd.Timestamp(starts.min(), tz="UTC"), pd.Timestamp(starts.max(), tz="UTC")
+
+
+def select_rows(df: DataFrame, start, end) -> DataFrame:
+    """
+    Returns the rows of a compact or float64 frame whose time_period_start lies within [start, end].
+
+    The result keeps the frame's layout, so only the selected rows need expand_frame.
+    """
+    starts = _starts(df)
+    mask = (starts >= pd.Timestamp(start).value) & (starts <= pd.Timestamp(end).value)
+    return df[mask]
+
+
+def _step(df: DataFrame, period: Union[str, None]) -> Union[int, None]:
+    """Period length in nanoseconds, from the period or else from time_period_end - time_period_start."""
+    if period is not None:
+        return PERIOD_SECONDS[period] * 10 ** 9
+    if "time_period_end" not in df or df.empty:
+        return None
+    spans = np.unique(datetime_values(df["time_period_end"]).view("int64") - datetime_values(df["time_period_start"]).view("int64"))
+    return int(spans[0]) if len(spans) == 1 and spans[0] > 0 else None
+
+
+@instrumented()
+def compact_frame(df: DataFrame, period: Union[str, None] = None, calendar: str = "narrow") -> DataFrame:
+    """
+    Returns a copy of an analyzed frame in the compact layout described in the module docstring.
+
+    :param df: A frame with time_period_start, as returned by pipeline.analyze.
+    :param period: The CoinAPI period of the candles; inferred from time_period_end if None.
+    :param calendar: "narrow" to store the calendar features as int8/int16, "recompute" to drop them.
+    :return: A new frame with the same rows and index, to be read through expand_frame.
+    """
+    if calendar not in ("narrow", "recompute"):
+        raise ValueError(f"Unknown calendar mode: {calendar}")
+    if is_compact(df):
+        return df
+
+    starts = datetime_values(df["time_period_start"]).view("int64")
+    layout = {"columns": list(df.columns), "epoch_ns": None, "step_ns": None, "derived": [], "offsets": [], "float32": []}
+
+    step = _step(df, period)
+    if step is not None and len(starts) and not pd.isna(df["time_period_start"]).any():
+        epoch = int(starts.min())
+        periods, remainder = np.divmod(starts - epoch, step)
+        if not remainder.any() and periods.max() <= _INT32_MAX:
+            layout.update(epoch_ns=epoch, step_ns=step)
+
+    columns = {}
+    for col in df.columns:
+        values = df[col]
+        if col == "time_period_start" and layout["epoch_ns"] is not None:
+            columns[col] = ((starts - layout["epoch_ns"]) // layout["step_ns"]).astype("int32")
+        elif col == "time_period_end" and layout["epoch_ns"] is not None and np.array_equal(
+            datetime_values(values).view("int64"), starts + layout["step_ns"]
+        ):
+            layout["derived"].append(col)
+        elif col in OFFSET_COLUMNS and pd.api.types.is_datetime64_any_dtype(values):
+            times = datetime_values(values).view("int64")
+            missing = pd.isna(values).to_numpy()
+            offsets = np.where(missing, 0, times - starts)
+            milliseconds = (offsets + _MILLISECOND // 2) // _MILLISECOND
+            if np.abs(milliseconds).max(initial=0) >= _INT32_MAX:
+                columns[col] = values
+                continue
+            columns[col] = np.where(missing, _MISSING, milliseconds).astype("int32")
+            layout["offsets"].append(col)
+        elif col in CALENDAR_DTYPES:
+            if calendar == "recompute":
+                layout["derived"].append(col)
+            else:
+                columns[col] = values.to_numpy().astype(CALENDAR_DTYPES[col])
+        elif col not in EXACT_COLUMNS and values.dtype == "float64":
+            columns[col] = values.to_numpy(dtype="float32")
+            layout["float32"].append(col)
+        else:
+            columns[col] = values
+
+    result = DataFrame(columns, index=df.index)
+    result.attrs[COMPACT_ATTR] = layout
+    return result
+
+
+@instrumented()
+def expand_frame(df: DataFrame) -> DataFrame:
+    """
+    Restores the float64 layout of a frame returned by compact_frame; other frames are returned unchanged.
+
+    :return: A new frame with the original columns, in their original order.
+    """
+    if not is_compact(df):
+        return df
+    layout = df.attrs[COMPACT_ATTR]
+
+    starts = _starts(df)
+    features = None
+    if any(col in CALENDAR_DTYPES for col in layout["derived"]):
+        features = prediction.calendar_features(
+            starts.view("datetime64[ns]"), np.empty((len(df), len(prediction.FEATURE_COLUMNS)), dtype="int32")
+        )
+
+    columns = {}
+    for col in layout["columns"]:
+        if col == "time_period_start":
+            columns[col] = _utc(starts) if layout["epoch_ns"] is not None else df[col]
+        elif col == "time_period_end" and col in layout["derived"]:
+            columns[col] = _utc(starts + layout["step_ns"])
+        elif col in layout["offsets"]:
+            offsets = df[col].to_numpy()
+            times = starts + offsets.astype("int64") * _MILLISECOND
+            columns[col] = _utc(np.where(offsets == _MISSING, np.iinfo("int64").min, times))
+        elif col in CALENDAR_DTYPES and col in layout["derived"]:
+            columns[col] = features[:, prediction.FEATURE_COLUMNS.index(col)]
+        elif col in CALENDAR_DTYPES:
+            columns[col] = df[col].to_numpy().astype("int32")
+        elif col in layout["float32"]:
+            columns[col] = df[col].to_numpy(dtype="float64")
+        else:
+            columns[col] = df[col]
+    return DataFrame(columns, index=df.index)
+
+
+def accuracy_problems(df: DataFrame, compacted: DataFrame) -> list:
+    """
+    Checks a compact frame against the accuracy contract of the float64 frame it was made from.
+
+    :param df: The frame given to compact_frame.
+    :param compacted: The frame compact_frame returned.
+    :return: (column, problem) pairs for every column outside the contract; empty if it holds.
+    """
+    layout = compacted.attrs[COMPACT_ATTR]
+    expanded = expand_frame(compacted)
+    problems = []
+    if list(expanded.columns) != list(df.columns):
+        problems.append(("columns", f"{list(expanded.columns)} != {list(df.columns)}"))
+        return problems
+
+    for col in df.columns:
+        expected, actual = df[col], expanded[col]
+        if pd.api.types.is_datetime64_any_dtype(expected):
+            expected = datetime_values(expected).view("int64")
+            actual = datetime_values(actual).view("int64")
+            tolerance = _MILLISECOND // 2 if col in layout["offsets"] else 0
+            if not np.array_equal(expected == np.iinfo("int64").min, actual == np.iinfo("int64").min):
+                problems.append((col, "missing timestamps differ"))
+            elif np.abs(expected - actual).max(initial=0) > tolerance:
+                problems.append((col, f"off by up to {np.abs(expected - actual).max() / 1e6:.3f} ms"))
+        elif col in layout["float32"]:
+            expected = expected.to_numpy(dtype="float64")
+            actual = actual.to_numpy(dtype="float64")
+            finite = np.isfinite(expected)
+            if not np.array_equal(expected[~finite], actual[~finite], equal_nan=True):
+                problems.append((col, "NaN or infinite values differ"))
+            error = np.abs(actual[finite] - expected[finite]) - FLOAT32_RTOL * np.abs(expected[finite]) - FLOAT32_ATOL
+            if not np.all(error <= 0):
+                problems.append((col, f"float32 rounding error beyond the contract at {np.count_nonzero(~(error <= 0))} rows"))
+        elif not expected.equals(actual) and not np.array_equal(expected.to_numpy(), actual.to_numpy(), equal_nan=True):
+            problems.append((col, "values differ"))
+    return problems
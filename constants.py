@@ -1,4 +1,120 @@
-COIN_API_ENDPOINT = "https://rest.coinapi.io/v1/ohlcv/BITSTAMP_SPOT_BTC_USD/latest"
+COIN_API_BASE_URL = "https://rest.coinapi.io"
+
+COIN_API_OHLCV_ENDPOINT = COIN_API_BASE_URL + "/v1/ohlcv/{symbol_id}/latest"
+
+COIN_API_HISTORY_PATH = "/v1/ohlcv/{symbol_id}/history"
+
+COIN_API_WS_URL = "wss://ws.coinapi.io/v1/"
+
+# Environment variable overriding the WebSocket URL of the live feed, e.g. ws://localhost:8765 for the replay server.
+LIVE_FEED_URL_ENV = "LIVE_FEED_URL"
+
+# Port and pause between messages of the local replay server (live_feed.replay_server).
+LIVE_REPLAY_PORT = 8765
+
+LIVE_REPLAY_INTERVAL_SECONDS = 0.05
+
+# Live charts are re-sent to the browser at most this often; every tick still updates them in memory.
+LIVE_CHART_REFRESH_SECONDS = 1.0
+
+# The live feed stops after this many seconds without a trade, and a live session after this many seconds
+# in total, so a page left open does not hold its script thread and WebSocket forever.
+LIVE_IDLE_TIMEOUT_SECONDS = 60
+
+LIVE_SESSION_SECONDS = 15 * 60
+
+# Seconds to wait for the CoinAPI REST endpoints before giving up on a request.
+COIN_API_TIMEOUT = 30
+
+# Stores missing more candles than this are backfilled from the /history endpoint in parallel,
+# rate-limited pages (async_retriever) rather than with one large /latest request.
+ASYNC_BACKFILL_MIN_ROWS = 1000
+
+DEFAULT_SYMBOL_ID = "BITSTAMP_SPOT_BTC_USD"
+
+# Environment variable the headless CLI (bitcoin_analysis.py) reads the CoinAPI.io API key from.
+COIN_API_KEY_ENV = "COIN_API_KEY"
+
+COIN_API_ENDPOINT = COIN_API_OHLCV_ENDPOINT.format(symbol_id=DEFAULT_SYMBOL_ID)
+
+CANDLE_STORE_DIR = ".candle_store"
+
+# Candles decoded from a response before their raw values are converted to typed arrays.
+INGEST_CHUNK_ROWS = 50000
+
+# Backend used to compute the indicators: "pandas" (MarketDataCalculator, the reference) or "numpy" (indicator_kernel).
+INDICATOR_BACKEND = "pandas"
+
+# Forecasts cover one week ahead, in steps of the selected candle period.
+FORECAST_HORIZON_SECONDS = 7 * 24 * 60 * 60
+
+# Fraction of equity paid on every position change when backtesting the indicator signals.
+BACKTEST_FEE = 0.001
+
+# "copy" runs the step-by-step DataFrame pipeline, "in_place" fills one preallocated frame (pipeline.analyze_in_place).
+PIPELINE_MODE = "copy"
+
+MODEL_REGISTRY_DIR = ".model_registry"
+
+MODEL_REGISTRY_MAX_ENTRIES = 512
+
+# Relative increase of a cached forecast model's training error above which it is refitted.
+MODEL_DRIFT_THRESHOLD = 0.05
+
+# Intro video of the app. With static serving enabled (.streamlit/config.toml) it is served from VIDEO_STATIC_DIR.
+VIDEO_FILE = "app.webm"
+
+VIDEO_STATIC_DIR = "static"
+
+# Periods selectable in the app; only the finest is downloaded and the others are resampled from it.
+APP_PERIODS = ["1HRS", "4HRS", "12HRS"]
+
+# Seconds after a candle closes before the background refresher fetches it, giving CoinAPI time to publish it.
+REFRESHER_CLOSE_DELAY_SECONDS = 5
+
+# Series nobody has read for this long are no longer refreshed in the background.
+REFRESHER_IDLE_SECONDS = 2 * 60 * 60
+
+# Pipeline runs the background refresher executes at the same time.
+REFRESHER_MAX_WORKERS = 4
+
+# Keep the refresher's snapshots in the compact layout (compact.py: float32 indicators, narrow calendar and
+# time columns, about 40% less memory per candle), expanded to float64 only while a page is drawn.
+COMPACT_SNAPSHOTS = False
+
+# Upper bound on cached pipeline results and chart sets kept by the Streamlit app.
+APP_CACHE_MAX_ENTRIES = 16
+
+# Charts are downsampled to about this many points per pixel of the assumed chart width.
+CHART_WIDTH_PX = 1200
+
+CHART_POINTS_PER_PIXEL = 2
+
+# Line traces of frames with more rows than this (counted before downsampling) are rendered with WebGL (Scattergl) instead of SVG.
+WEBGL_POINT_THRESHOLD = 5000
+
+# Cold import budgets in seconds checked by ``python benchmark.py --imports``, and the modules
+# (heavy ones or ones pulling in scikit-learn, scipy.signal or the charts) none of them may load at import time.
+IMPORT_TIME_BUDGETS = {"app": 1.5, "pipeline": 1.0, "bitcoin_analysis": 0.3}
+
+DEFERRED_MODULES = ["sklearn", "scipy.signal", "visualize", "pipeline"]
+
+# Record wall time, CPU time, memory delta and rows of each pipeline stage (see instrumentation.py).
+PROFILING_ENABLED = False
+
+# Stage records kept in memory for the profiling panel.
+PROFILING_MAX_RECORDS = 1000
+
+PERIOD_SECONDS = {
+    "1MIN": 60,
+    "5MIN": 5 * 60,
+    "15MIN": 15 * 60,
+    "30MIN": 30 * 60,
+    "1HRS": 60 * 60,
+    "4HRS": 4 * 60 * 60,
+    "12HRS": 12 * 60 * 60,
+    "1DAY": 24 * 60 * 60,
+}
 
 BITCOIN_DATA_ANALYSIS_TITLE = "Bitcoin Data Analysis"
 
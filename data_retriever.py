@@ -1,11 +1,66 @@
 import logging
+import threading
+from contextlib import contextmanager
 import requests
-from typing import Union
+from requests.adapters import HTTPAdapter
+from typing import Callable, Iterator, Union
+from urllib.parse import urlsplit
+from urllib3.util.retry import Retry
 import pandas as pd
-import streamlit as st
+
+from constants import ASYNC_BACKFILL_MIN_ROWS, COIN_API_TIMEOUT, PERIOD_SECONDS
+from candle_store import CandleStore
+from ingest import parse_candles
+from instrumentation import instrumented
 
 logging.basicConfig(level=logging.INFO)
 
+# One pooled session so repeated requests reuse the TLS connection, retrying rate limits and server errors.
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(max_retries=Retry(
+    total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], respect_retry_after_header=True
+)))
+
+# Callable shown the message of every retrieval error besides the log, e.g. st.write in the Streamlit app.
+_error_reporter = None
+
+# Per-thread lists collecting the errors of a block of work, see collect_errors.
+_collected = threading.local()
+
+
+def set_error_reporter(reporter: Union[Callable[[str], None], None]) -> None:
+    """Forwards retrieval error messages to the given callable (None to only log them), so this module never imports a UI."""
+    global _error_reporter
+    _error_reporter = reporter
+
+
+@contextmanager
+def collect_errors() -> Iterator[list]:
+    """
+    Collects the retrieval errors reported on this thread inside the block into the yielded list.
+
+    Work running on background threads, such as a refresher worker, has no UI to report
+    to; it collects its errors this way and hands them to whoever waits for it. Inside
+    the block the errors are not forwarded to the registered reporter.
+    """
+    previous = getattr(_collected, "messages", None)
+    _collected.messages = messages = []
+    try:
+        yield messages
+    finally:
+        _collected.messages = previous
+
+
+def report_error(message: str) -> None:
+    """Logs a retrieval error and forwards it to the collecting block or else the registered reporter, if any."""
+    logging.error(message)
+    messages = getattr(_collected, "messages", None)
+    if messages is not None:
+        messages.append(message)
+    elif _error_reporter is not None:
+        _error_reporter(message)
+
+
 class DataRetriever:
     """Class to encapsulate data retrieval and processing operations."""
     
@@ -23,29 +78,162 @@ class DataRetriever:
         else:
             return (24 * 7) * 2  # one week + one week more
 
-    def retrieve_data(url: str, headers: dict) -> Union[dict, list, None]:
+    @instrumented()
+    def get_response(url: str, headers: dict) -> Union[requests.Response, None]:
         """
-        Retrieves data from the API.
-        
+        Sends a GET request through the shared session.
+
         :param url: The API URL from which to retrieve data.
         :param headers: The headers to include in the API request.
-        :return: A data frame with the retrieved data, or None if an error occurred.
+        :return: The successful response, or None if an error occurred.
         """
         try:
-            response = requests.get(url, headers=headers)
+            response = SESSION.get(url, headers=headers, timeout=COIN_API_TIMEOUT)
             response.raise_for_status()
         except requests.exceptions.HTTPError as http_err:
-            logging.error(f"HTTP error occurred: {http_err}")
-            st.write(f"HTTP error occurred: {http_err}")
+            report_error(f"HTTP error occurred: {http_err}")
             return None
         except requests.exceptions.ConnectionError as conn_err:
-            logging.error(f"Connection error occurred: {conn_err}")
-            st.write(f"Connection error occurred: {conn_err}")
+            report_error(f"Connection error occurred: {conn_err}")
             return None
         except requests.exceptions.RequestException as req_err:
-            logging.error(f"Error fetching data: {req_err}")
-            st.write(f"Error fetching data: {req_err}")
+            report_error(f"Error fetching data: {req_err}")
+            return None
+
+        return response
+
+    @instrumented()
+    def retrieve_data(url: str, headers: dict) -> Union[dict, list, None]:
+        """
+        Retrieves data from the API.
+        
+        :param url: The API URL from which to retrieve data.
+        :param headers: The headers to include in the API request.
+        :return: A data frame with the retrieved data, or None if an error occurred.
+        """
+        response = DataRetriever.get_response(url, headers)
+        if response is None:
             return None
 
         data = response.json()
         return data
+
+    @instrumented()
+    def retrieve_frame(url: str, headers: dict) -> Union[pd.DataFrame, None]:
+        """
+        Retrieves OHLCV candles from the API decoded straight into a typed data frame.
+
+        The response bytes are parsed column by column (see ingest.parse_candles), so
+        no per-candle dicts are built and the timestamps are parsed only once.
+
+        :param url: The API URL from which to retrieve data.
+        :param headers: The headers to include in the API request.
+        :return: A data frame with the candles in response order, or None if an error occurred.
+        """
+        response = DataRetriever.get_response(url, headers)
+        if response is None:
+            return None
+
+        try:
+            return parse_candles(response.content)
+        except ValueError as e:
+            report_error(str(e))
+            return None
+
+    def missing_limit(
+        period: str, latest_start: Union[pd.Timestamp, None], stored_count: int, window: Union[int, None] = None
+    ) -> int:
+        """
+        Calculates how many of the latest candles must be requested to bring a local store up to date.
+
+        :param period: The time period of the candles.
+        :param latest_start: The time_period_start of the newest stored candle, or None if nothing is stored.
+        :param stored_count: The number of candles already stored.
+        :param window: The number of candles wanted, set_limit(period) if None.
+        :return: The limit to request from the API, never more than the full window.
+        """
+        limit = window or DataRetriever.set_limit(period)
+        if latest_start is None or stored_count == 0:
+            return limit
+
+        elapsed = (pd.Timestamp.now(tz="UTC") - latest_start).total_seconds()
+        # The newest stored candle is requested again because it may still have been open.
+        missing = max(int(elapsed // PERIOD_SECONDS.get(period, PERIOD_SECONDS["1HRS"])), 0) + 1
+        if stored_count + missing - 1 < limit:
+            return limit
+        return min(missing, limit)
+
+    @instrumented()
+    def retrieve_backfill(endpoint: str, period: str, headers: dict, store: CandleStore, limit: int) -> bool:
+        """
+        Backfills the limit candles up to the current one from the history endpoint into a local store.
+
+        The range is split into pages requested concurrently through async_retriever,
+        throttled by its token bucket and retried on rate limits and server errors.
+        The still-open current candle is left to the /latest request that follows.
+
+        :param endpoint: The CoinAPI OHLCV latest endpoint; its host serves the history endpoint too.
+        :param period: The time period of the candles.
+        :param headers: The headers of the API requests, with the X-CoinAPI-Key.
+        :param store: The local candle store to merge into.
+        :param limit: The number of candles to backfill, including the current one.
+        :return: True if the history was retrieved, False if an error occurred.
+        """
+        # Deferred so aiohttp is only loaded for deep backfills.
+        import aiohttp
+        from async_retriever import retrieve_history
+
+        step = pd.Timedelta(seconds=PERIOD_SECONDS[period])
+        current = pd.Timestamp.now(tz="UTC").floor(step)
+        url = urlsplit(endpoint)
+        try:
+            records = retrieve_history(
+                headers["X-CoinAPI-Key"], store.symbol_id, period, current - step * (limit - 1), current,
+                base_url=f"{url.scheme}://{url.netloc}",
+            )
+        except (aiohttp.ClientError, ValueError) as e:
+            report_error(f"Error backfilling {store.symbol_id} {period} history: {e}")
+            return False
+
+        if records:
+            store.merge(period, records)
+        return True
+
+    @instrumented()
+    def retrieve_incremental(
+        endpoint: str, period: str, headers: dict, store: CandleStore, window: Union[int, None] = None
+    ) -> Union[pd.DataFrame, None]:
+        """
+        Retrieves the latest candles, reading a local store first and requesting only the missing tail.
+
+        A tail longer than ASYNC_BACKFILL_MIN_ROWS candles, such as the first load of a
+        deep window, is backfilled through retrieve_backfill first, so only the newest
+        candles come from the /latest endpoint.
+
+        :param endpoint: The CoinAPI OHLCV latest endpoint.
+        :param period: The time period of the candles.
+        :param headers: The headers to include in the API request.
+        :param store: The local candle store to read from and merge into.
+        :param window: The number of latest candles to return, set_limit(period) if None.
+        :return: A data frame with the latest window candles newest first, or None if an error occurred.
+        """
+        window = window or DataRetriever.set_limit(period)
+        arrays = store.load_arrays(period)
+        stored_count = 0 if arrays is None else len(arrays["time_period_start"])
+        limit = DataRetriever.missing_limit(period, store.latest_start(period), stored_count, window)
+        if limit > ASYNC_BACKFILL_MIN_ROWS:
+            if not DataRetriever.retrieve_backfill(endpoint, period, headers, store, limit):
+                return None
+            arrays = store.load_arrays(period)
+            stored_count = 0 if arrays is None else len(arrays["time_period_start"])
+            limit = DataRetriever.missing_limit(period, store.latest_start(period), stored_count, window)
+
+        data = DataRetriever.retrieve_frame(f"{endpoint}?period_id={period}&limit={limit}", headers)
+        if data is None:
+            return None
+        if data.empty and stored_count == 0:
+            return None
+
+        if not data.empty:
+            return store.merge(period, data, window)
+        return store.load(period, window)
@@ -0,0 +1,119 @@
+import logging
+import numpy as np
+import pandas as pd
+
+from constants import CHART_POINTS_PER_PIXEL, CHART_WIDTH_PX
+
+logging.basicConfig(level=logging.INFO)
+
+
+def point_budget(width_px: int = CHART_WIDTH_PX, points_per_pixel: float = CHART_POINTS_PER_PIXEL) -> int:
+    """Returns how many points a chart of the given width should receive at most."""
+    return max(int(width_px * points_per_pixel), 3)
+
+
+def _sorted(x, *columns):
+    """Returns x and the columns as NumPy arrays in chronological order."""
+    # Series.values keeps tz-aware timestamps as datetime64 (UTC) instead of an object array.
+    x = x.values if isinstance(x, pd.Series) else np.asarray(x)
+    order = np.argsort(x, kind="stable")
+    return (x[order],) + tuple(np.asarray(column, dtype="float64")[order] for column in columns)
+
+
+def _as_float(x: np.ndarray) -> np.ndarray:
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.view("int64").astype("float64")
+    return x.astype("float64")
+
+
+def lttb(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Selects the points of a line with Largest-Triangle-Three-Buckets.
+
+    :param x: Sorted numeric x values.
+    :param y: Finite y values.
+    :param threshold: Number of points to keep.
+    :return: Indices of the kept points, in order.
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.append((np.arange(threshold - 1) * ((n - 2) / (threshold - 2))).astype(np.int64) + 1, n)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+
+    previous = 0
+    for i in range(threshold - 2):
+        start, end, next_end = edges[i], edges[i + 1], edges[i + 2]
+        next_x = x[end:next_end].mean()
+        next_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - next_x) * (y[start:end] - y[previous]) - (x[previous] - x[start:end]) * (next_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[i + 1] = previous
+    return selected
+
+
+def line_points(x, y, max_points: int):
+    """
+    Downsamples a line series with LTTB when it holds more than max_points points.
+
+    :return: The x and y values to plot; unchanged if no downsampling is needed.
+    """
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    x, y = _sorted(x, y)
+    finite = np.isfinite(y)
+    x, y = x[finite], y[finite]
+    keep = lttb(_as_float(x), y, max_points)
+    return x[keep], y[keep]
+
+
+def bar_points(x, y, max_points: int):
+    """
+    Downsamples a bar series keeping the lowest and highest bar of each bucket.
+
+    :return: The x and y values to plot; unchanged if no downsampling is needed.
+    """
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    x, y = _sorted(x, y)
+    size = int(np.ceil(len(y) / max(max_points // 2, 1)))
+    padded = np.full(int(np.ceil(len(y) / size)) * size, np.nan)
+    padded[:len(y)] = y
+    buckets = padded.reshape(-1, size)
+    offsets = np.arange(len(buckets)) * size
+    lowest = offsets + np.argmin(np.where(np.isnan(buckets), np.inf, buckets), axis=1)
+    highest = offsets + np.argmax(np.where(np.isnan(buckets), -np.inf, buckets), axis=1)
+    keep = np.unique(np.concatenate([lowest, highest]))
+    keep = keep[keep < len(y)]
+    keep = keep[np.isfinite(y[keep])]
+    return x[keep], y[keep]
+
+
+def candle_points(x, price_open, price_high, price_low, price_close, max_points: int) -> dict:
+    """
+    Re-buckets candles into at most max_points wider OHLC candles.
+
+    :return: A dict with x, open, high, low and close values; unchanged if no downsampling is needed.
+    """
+    if max_points is None or len(x) <= max_points:
+        return dict(x=x, open=price_open, high=price_high, low=price_low, close=price_close)
+    x, price_open, price_high, price_low, price_close = _sorted(x, price_open, price_high, price_low, price_close)
+    size = int(np.ceil(len(x) / max_points))
+    starts = np.arange(0, len(x), size)
+    ends = np.append(starts[1:], len(x)) - 1
+    return dict(
+        x=x[starts],
+        open=price_open[starts],
+        high=np.fmax.reduceat(price_high, starts),
+        low=np.fmin.reduceat(price_low, starts),
+        close=price_close[ends],
+    )
+
+
+def select_range(df: pd.DataFrame, start, end) -> pd.DataFrame:
+    """Returns the rows whose time_period_start lies within [start, end]."""
+    times = df["time_period_start"]
+    return df[(times >= start) & (times <= end)]
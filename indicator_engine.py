@@ -0,0 +1,279 @@
+import copy
+import logging
+import math
+from collections import deque
+from typing import Mapping
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+logging.basicConfig(level=logging.INFO)
+
+INDICATOR_COLUMNS = [
+    "vwap", "rolling_mean", "rolling_std", "bollinger_upper", "bollinger_lower", "ma50", "ma200",
+    "volatility", "trade_velocity", "rsi", "ema12", "ema26", "macd", "macd_signal"
+]
+
+
+class RollingWindow:
+    """
+    Fixed-size window keeping running sums so mean and sample std are O(1) per update.
+
+    Values are accumulated relative to the first value seen to limit cancellation in
+    the sum of squares, and the sums are rebuilt from the window every time it has
+    been fully replaced so rounding errors cannot drift over long streams. Like pandas,
+    a window holding a single repeated value reports that value and a std of exactly 0.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.shift = None
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.pushes = 0
+        self.same_run = 0
+        self._undo = None
+
+    def push(self, value: float) -> None:
+        """Appends a value, evicting the oldest one once the window is full."""
+        if self.shift is None:
+            self.shift = value
+        evicted = self.values.popleft() if len(self.values) == self.window else None
+        self._undo = (evicted, self.total, self.total_sq, self.pushes, self.same_run)
+
+        self.same_run = self.same_run + 1 if self.values and self.values[-1] == value else 1
+        self.values.append(value)
+        self.pushes += 1
+        if self.pushes % self.window == 0:
+            self._rebuild()
+            return
+
+        centered = value - self.shift
+        self.total += centered
+        self.total_sq += centered * centered
+        if evicted is not None:
+            centered = evicted - self.shift
+            self.total -= centered
+            self.total_sq -= centered * centered
+
+    def undo(self) -> None:
+        """Reverts the last push."""
+        evicted, self.total, self.total_sq, self.pushes, self.same_run = self._undo
+        self.values.pop()
+        if evicted is not None:
+            self.values.appendleft(evicted)
+        self._undo = None
+
+    def _rebuild(self) -> None:
+        centered = [value - self.shift for value in self.values]
+        self.total = math.fsum(centered)
+        self.total_sq = math.fsum(value * value for value in centered)
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window
+
+    def mean(self) -> float:
+        """Mean of the window, NaN until the window is full."""
+        if not self.full:
+            return math.nan
+        if self.same_run >= self.window:
+            return self.values[-1]
+        return self.shift + self.total / self.window
+
+    def std(self) -> float:
+        """Sample standard deviation (ddof=1) of the window, NaN until the window is full."""
+        if not self.full or self.window < 2:
+            return math.nan
+        if self.same_run >= self.window:
+            return 0.0
+        variance = (self.total_sq - self.total * self.total / self.window) / (self.window - 1)
+        return math.sqrt(max(variance, 0.0))
+
+
+class ExponentialAverage:
+    """Exponentially weighted mean with ``adjust=False`` semantics, carried as a single value."""
+
+    def __init__(self, span: int):
+        self.alpha = 2 / (span + 1)
+        self.value = None
+        self._undo = None
+
+    def push(self, value: float) -> float:
+        self._undo = self.value
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+    def undo(self) -> None:
+        self.value = self._undo
+        self._undo = None
+
+
+def _lfilter(b, a, x, axis=-1, zi=None):
+    """scipy.signal.lfilter, imported on first use since scipy.signal alone takes over a second to import."""
+    from scipy.signal import lfilter
+
+    return lfilter(b, a, x, axis=axis, zi=zi)
+
+
+def _ewm_series(values: np.ndarray, alpha: float) -> np.ndarray:
+    """adjust=False exponentially weighted mean of every prefix, seeded with the first value."""
+    result, _ = _lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+    return result
+
+
+class StreamingIndicatorEngine:
+    """
+    Stateful counterpart of MarketDataCalculator that updates every indicator in O(1) per candle.
+
+    Candles must be fed oldest first. Each column matches the batch pandas result of
+    ``MarketDataCalculator`` on the same chronologically ordered frame within a
+    relative tolerance of 1e-9 (absolute 1e-9 for values close to zero).
+    """
+
+    def __init__(self):
+        self.bollinger = RollingWindow(20)
+        self.ma50 = RollingWindow(50)
+        self.ma200 = RollingWindow(200)
+        self.gains = RollingWindow(14)
+        self.losses = RollingWindow(14)
+        self.ema12 = ExponentialAverage(12)
+        self.ema26 = ExponentialAverage(26)
+        self.macd_signal = ExponentialAverage(9)
+        self.cum_pv = 0.0
+        self.cum_volume = 0.0
+        self.last_close = None
+        self.count = 0
+        self._undo = None
+
+    @classmethod
+    def from_history(cls, df: DataFrame) -> "StreamingIndicatorEngine":
+        """
+        Builds the state the engine has after feeding every row of a chronologically ordered frame.
+
+        Cumulative sums and exponential averages are computed vectorized over the whole
+        history and only the last candles of each rolling window are pushed, so the cost
+        is O(len(df)) NumPy work plus a constant number of Python steps.
+
+        :param df: Input data frame with market data, oldest candle first.
+        """
+        engine = cls()
+        if df.empty:
+            return engine
+
+        close = df["price_close"].to_numpy(dtype="float64")
+        volume = df["volume_traded"].to_numpy(dtype="float64")
+        engine.cum_pv = math.fsum(volume * close)
+        engine.cum_volume = math.fsum(volume)
+        engine.last_close = float(close[-1])
+        engine.count = len(close)
+
+        for state in (engine.bollinger, engine.ma50, engine.ma200):
+            for value in close[-state.window:]:
+                state.push(float(value))
+        deltas = np.diff(close[-engine.gains.window - 1:], prepend=np.nan if len(close) > engine.gains.window else close[0])
+        for delta in deltas[-engine.gains.window:]:
+            delta = 0.0 if math.isnan(delta) else float(delta)
+            engine.gains.push(max(delta, 0.0))
+            engine.losses.push(max(-delta, 0.0))
+
+        ema12 = _ewm_series(close, engine.ema12.alpha)
+        ema26 = _ewm_series(close, engine.ema26.alpha)
+        engine.ema12.value = float(ema12[-1])
+        engine.ema26.value = float(ema26[-1])
+        engine.macd_signal.value = float(_ewm_series(ema12 - ema26, engine.macd_signal.alpha)[-1])
+        return engine
+
+    def copy(self) -> "StreamingIndicatorEngine":
+        """Returns an independent copy of the running state."""
+        return copy.deepcopy(self)
+
+    def update(self, candle: Mapping, replace_last: bool = False) -> dict:
+        """
+        Feeds one candle and returns the indicator values for it.
+
+        :param candle: A CoinAPI OHLCV record with prices, volume, trade count, time_open and time_close.
+        :param replace_last: Replace the previously fed candle instead of appending, for a candle that is still open.
+        :return: A dict with one value per column in INDICATOR_COLUMNS.
+        """
+        if replace_last:
+            self._revert()
+
+        close = float(candle["price_close"])
+        volume = float(candle["volume_traded"])
+        self._undo = (self.cum_pv, self.cum_volume, self.last_close)
+
+        self.cum_pv += volume * close
+        self.cum_volume += volume
+        vwap = self.cum_pv / self.cum_volume if self.cum_volume else math.nan
+
+        self.bollinger.push(close)
+        self.ma50.push(close)
+        self.ma200.push(close)
+        rolling_mean = self.bollinger.mean()
+        rolling_std = self.bollinger.std()
+
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        self.gains.push(max(delta, 0.0))
+        self.losses.push(max(-delta, 0.0))
+        self.last_close = close
+        avg_gain = self.gains.mean()
+        avg_loss = self.losses.mean()
+        if avg_loss == 0:
+            rsi = 100.0 if avg_gain > 0 else math.nan
+        else:
+            rsi = 100 - (100 / (1 + avg_gain / avg_loss))
+
+        ema12 = self.ema12.push(close)
+        ema26 = self.ema26.push(close)
+        macd = ema12 - ema26
+        macd_signal = self.macd_signal.push(macd)
+
+        hours = (pd.Timestamp(candle["time_close"]) - pd.Timestamp(candle["time_open"])).total_seconds() / 3600
+        trades = float(candle["trades_count"])
+        if hours:
+            trade_velocity = trades / hours
+        else:
+            trade_velocity = math.copysign(math.inf, trades) if trades else math.nan
+
+        self.count += 1
+        return {
+            "vwap": vwap,
+            "rolling_mean": rolling_mean,
+            "rolling_std": rolling_std,
+            "bollinger_upper": rolling_mean + rolling_std * 2,
+            "bollinger_lower": rolling_mean - rolling_std * 2,
+            "ma50": self.ma50.mean(),
+            "ma200": self.ma200.mean(),
+            "volatility": ((float(candle["price_high"]) - float(candle["price_low"])) / float(candle["price_open"])) * 100,
+            "trade_velocity": trade_velocity,
+            "rsi": rsi,
+            "ema12": ema12,
+            "ema26": ema26,
+            "macd": macd,
+            "macd_signal": macd_signal,
+        }
+
+    def _revert(self) -> None:
+        if self._undo is None:
+            raise ValueError("There is no candle to replace")
+        self.cum_pv, self.cum_volume, self.last_close = self._undo
+        for state in (self.bollinger, self.ma50, self.ma200, self.gains, self.losses,
+                      self.ema12, self.ema26, self.macd_signal):
+            state.undo()
+        self.count -= 1
+        self._undo = None
+
+    def update_frame(self, df: DataFrame) -> DataFrame:
+        """
+        Feeds every row of a chronologically ordered data frame.
+
+        :param df: Input data frame with market data, oldest candle first.
+        :return: Data frame with the indicator columns, aligned with the input index.
+        """
+        rows = [self.update(candle) for candle in df.to_dict("records")]
+        return DataFrame(rows, index=df.index, columns=INDICATOR_COLUMNS)
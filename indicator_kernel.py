@@ -0,0 +1,170 @@
+import logging
+from typing import Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from indicator_engine import INDICATOR_COLUMNS, _lfilter
+
+logging.basicConfig(level=logging.INFO)
+
+# Rows per block when accumulating sums of squares for rolling standard deviations.
+STD_BLOCK_ROWS = 4096
+
+
+def _rolling_mean(values: np.ndarray, window: int, out: np.ndarray) -> None:
+    """Rolling mean from one cumulative sum, NaN for the first window - 1 rows."""
+    out[:window - 1] = np.nan
+    if len(values) < window:
+        out[:] = np.nan
+        return
+    centered = np.cumsum(values - values[0])
+    out[window - 1] = centered[window - 1]
+    np.subtract(centered[window:], centered[:-window], out=out[window:])
+    out[window - 1:] /= window
+    out[window - 1:] += values[0]
+
+
+def _rolling_std(values: np.ndarray, window: int, out: np.ndarray) -> None:
+    """
+    Rolling sample std (ddof=1) from cumulative sums of squares.
+
+    Sums are accumulated per block of rows around the block mean, which keeps the
+    cancellation error of the sum of squares bounded however long the series is.
+    Windows holding a single repeated value are exactly 0, as in pandas.
+    """
+    out[:window - 1] = np.nan
+    if len(values) < window:
+        out[:] = np.nan
+        return
+    for start in range(window - 1, len(values), STD_BLOCK_ROWS):
+        stop = min(start + STD_BLOCK_ROWS, len(values))
+        chunk = values[start - window + 1:stop]
+        centered = chunk - chunk.mean()
+        sums = np.concatenate(([0.0], np.cumsum(centered)))
+        squares = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        total = sums[window:] - sums[:-window]
+        variance = (squares[window:] - squares[:-window] - total * total / window) / (window - 1)
+        np.sqrt(np.maximum(variance, 0.0), out=out[start:stop])
+
+    repeats = np.concatenate(([0], np.cumsum(values[1:] == values[:-1])))
+    constant = repeats[window - 1:] - repeats[:len(values) - window + 1] == window - 1
+    out[window - 1:][constant] = 0.0
+
+
+def _rolling_positive_mean(values: np.ndarray, window: int, out: np.ndarray) -> None:
+    """Rolling mean of non-negative values that is exactly 0 when every value in the window is 0."""
+    _rolling_mean(values, window, out)
+    nonzero = np.cumsum(values != 0)
+    counts = nonzero[window - 1:] - np.concatenate(([0], nonzero[:-window]))
+    out[window - 1:][counts == 0] = 0.0
+
+
+def _ewm(values: np.ndarray, span: int, out: np.ndarray) -> None:
+    """Exponentially weighted mean with adjust=False, as a first-order linear recursion."""
+    if not len(values):
+        return
+    alpha = 2 / (span + 1)
+    out[:], _ = _lfilter([alpha], [1, alpha - 1], values, zi=[(1 - alpha) * values[0]])
+
+
+def datetime_values(series: pd.Series) -> np.ndarray:
+    """Returns a datetime column as datetime64[ns] values (UTC for tz-aware columns), parsing only if needed."""
+    if not pd.api.types.is_datetime64_any_dtype(series):
+        series = pd.to_datetime(series)
+    return series.values
+
+
+def compute_indicator_arrays(
+    price_open: np.ndarray,
+    price_high: np.ndarray,
+    price_low: np.ndarray,
+    price_close: np.ndarray,
+    volume_traded: np.ndarray,
+    trades_count: np.ndarray,
+    hours: np.ndarray,
+    out: Union[np.ndarray, None] = None,
+) -> np.ndarray:
+    """
+    Computes every MarketDataCalculator indicator from contiguous float64 arrays.
+
+    :param price_open: Open prices.
+    :param price_high: High prices.
+    :param price_low: Low prices.
+    :param price_close: Close prices.
+    :param volume_traded: Traded volume.
+    :param trades_count: Number of trades.
+    :param hours: Hours between time_open and time_close of each candle.
+    :param out: Optional preallocated (rows, len(INDICATOR_COLUMNS)) float64 buffer to fill.
+    :return: The filled buffer, one column per entry of INDICATOR_COLUMNS.
+    """
+    n = len(price_close)
+    if out is None:
+        out = np.empty((n, len(INDICATOR_COLUMNS)), dtype="float64", order="F")
+    col = {name: out[:, i] for i, name in enumerate(INDICATOR_COLUMNS)}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        np.divide(np.cumsum(volume_traded * price_close), np.cumsum(volume_traded), out=col["vwap"])
+
+        _rolling_mean(price_close, 20, col["rolling_mean"])
+        _rolling_std(price_close, 20, col["rolling_std"])
+        np.multiply(col["rolling_std"], 2, out=col["bollinger_upper"])
+        np.subtract(col["rolling_mean"], col["bollinger_upper"], out=col["bollinger_lower"])
+        col["bollinger_upper"] += col["rolling_mean"]
+        _rolling_mean(price_close, 50, col["ma50"])
+        _rolling_mean(price_close, 200, col["ma200"])
+
+        np.subtract(price_high, price_low, out=col["volatility"])
+        col["volatility"] /= price_open
+        col["volatility"] *= 100
+
+        np.divide(trades_count, hours, out=col["trade_velocity"])
+
+        delta = np.diff(price_close, prepend=price_close[:1])
+        avg_gain = col["rsi"]
+        avg_loss = np.empty(n)
+        _rolling_positive_mean(np.maximum(delta, 0), 14, avg_gain)
+        _rolling_positive_mean(np.maximum(-delta, 0), 14, avg_loss)
+        avg_gain /= avg_loss
+        np.add(avg_gain, 1, out=avg_gain)
+        np.divide(100, avg_gain, out=avg_gain)
+        np.subtract(100, avg_gain, out=avg_gain)
+
+        _ewm(price_close, 12, col["ema12"])
+        _ewm(price_close, 26, col["ema26"])
+        np.subtract(col["ema12"], col["ema26"], out=col["macd"])
+        _ewm(col["macd"], 9, col["macd_signal"])
+
+    return out
+
+
+def compute_indicators(df: DataFrame) -> DataFrame:
+    """
+    Batch NumPy backend producing the same columns as the MarketDataCalculator pipeline.
+
+    The OHLCV columns are read once as float64 arrays, every indicator is written into
+    a single preallocated block and the result frame is assembled once from views of
+    the input columns and that block, without copying either.
+
+    :param df: Input data frame with market data and datetime time_open/time_close columns
+    :return: Data frame with calculated features
+    """
+    if not isinstance(df, DataFrame):
+        logging.error("Input is not a data frame")
+        raise ValueError("Input must be a data frame")
+
+    try:
+        arrays = {
+            col: np.ascontiguousarray(df[col].to_numpy(dtype="float64"))
+            for col in ["price_open", "price_high", "price_low", "price_close", "volume_traded", "trades_count"]
+        }
+        elapsed = datetime_values(df["time_close"]) - datetime_values(df["time_open"])
+    except KeyError as e:
+        logging.error(f"Missing necessary columns in data frame: {e}")
+        raise
+
+    hours = elapsed / np.timedelta64(1, "h")
+    block = compute_indicator_arrays(**arrays, hours=hours)
+    columns = {col: df[col] for col in df.columns if col not in INDICATOR_COLUMNS}
+    columns.update({col: block[:, i] for i, col in enumerate(INDICATOR_COLUMNS)})
+    return DataFrame(columns, index=df.index, copy=False)
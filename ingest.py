@@ -0,0 +1,172 @@
+import json
+import logging
+import re
+from typing import Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from candle_store import CANDLE_COLUMNS, COUNT_COLUMNS, PRICE_COLUMNS, TIME_COLUMNS
+from constants import INGEST_CHUNK_ROWS
+
+logging.basicConfig(level=logging.INFO)
+
+# CoinAPI timestamps look like "2023-09-20T12:00:00.0000000Z": ISO seconds, a 7-digit fraction and "Z".
+TIMESTAMP_LENGTH = 28
+_SECONDS_LENGTH = 19
+_FRACTION_SCALE = 10 ** np.arange(8, 1, -1, dtype=np.int64)  # 7 digits in units of 100 ns
+
+_WHITESPACE = re.compile(r"\s*").match
+_SEPARATOR = re.compile(r"\s*([,\]])\s*").match
+
+
+class _ColumnCollector:
+    """object_pairs_hook that appends the fields of every JSON object straight to per-column lists."""
+
+    def __init__(self):
+        self.columns = {}
+        self.rows = 0
+
+    def __call__(self, pairs):
+        columns = self.columns
+        for key, value in pairs:
+            column = columns.get(key)
+            if column is None:
+                # A field missing from earlier objects is padded so that all columns stay aligned.
+                column = columns[key] = [None] * self.rows
+            column.append(value)
+        self.rows += 1
+        if len(pairs) != len(columns):
+            for column in columns.values():
+                if len(column) < self.rows:
+                    column.append(None)
+        return None
+
+
+def _parse_fixed_format(strings: np.ndarray) -> Union[np.ndarray, None]:
+    """
+    Parses fixed-format timestamps, or returns None if any string deviates from it.
+
+    :param strings: A U{TIMESTAMP_LENGTH + 1} array; the extra character must be empty, so longer
+                    strings are never parsed by their first TIMESTAMP_LENGTH characters.
+    """
+    codes = strings.view(np.uint32).reshape(len(strings), TIMESTAMP_LENGTH + 1)
+    if not (
+        (codes[:, _SECONDS_LENGTH] == ord(".")) & (codes[:, TIMESTAMP_LENGTH - 1] == ord("Z")) & (codes[:, TIMESTAMP_LENGTH] == 0)
+    ).all():
+        return None
+    digits = codes[:, _SECONDS_LENGTH + 1:TIMESTAMP_LENGTH - 1].astype(np.int64) - ord("0")
+    if not ((digits >= 0) & (digits <= 9)).all():
+        return None
+    try:
+        # NumPy's ISO parser validates and converts the date and time of day.
+        seconds = strings.astype(f"U{_SECONDS_LENGTH}").astype("datetime64[s]")
+    except ValueError:
+        return None
+    return seconds.astype("datetime64[ns]") + (digits @ _FRACTION_SCALE).astype("timedelta64[ns]")
+
+
+def parse_timestamps(values) -> np.ndarray:
+    """
+    Parses CoinAPI ISO timestamps to datetime64[ns] (UTC).
+
+    Fixed-format strings are parsed vectorized: the seconds by NumPy's ISO parser
+    and the fraction from its digit code points. Anything else goes through
+    pd.to_datetime.
+
+    :param values: A sequence of timestamp strings.
+    :return: A datetime64[ns] array of naive UTC times.
+    """
+    strings = np.asarray(values, dtype=f"U{TIMESTAMP_LENGTH + 1}")
+    if len(strings) == 0:
+        return np.empty(0, dtype="datetime64[ns]")
+
+    parsed = _parse_fixed_format(strings)
+    if parsed is not None:
+        return parsed
+
+    index = pd.DatetimeIndex(pd.to_datetime(list(values), utc=True, format="ISO8601"))
+    return index.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+
+
+def _utc(values: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(values).tz_localize("UTC")
+
+
+def _typed_column(col: str, values: list):
+    if col in TIME_COLUMNS:
+        return _utc(parse_timestamps(values))
+    if col in PRICE_COLUMNS:
+        return np.array(values, dtype="float64")
+    if col in COUNT_COLUMNS:
+        try:
+            return np.array(values, dtype="int64")
+        except TypeError:
+            return np.array(values, dtype="float64")
+    return values
+
+
+def columns_to_frame(columns: dict) -> DataFrame:
+    """
+    Converts raw CoinAPI OHLCV columns to a typed data frame, emptying the given dict.
+
+    Time columns become datetime64[ns, UTC], prices and volume float64 and trade
+    counts int64 (float64 if a count is missing); unknown columns are kept as they
+    are. Each raw list is released as soon as it is converted, which keeps the
+    peak memory close to one raw column plus the typed result.
+    """
+    order = [col for col in CANDLE_COLUMNS if col in columns] + [col for col in columns if col not in CANDLE_COLUMNS]
+    typed = {}
+    for col in order:
+        typed[col] = _typed_column(col, columns.pop(col))
+    return DataFrame(typed, copy=False)
+
+
+def parse_candles(payload: Union[bytes, str], chunk_rows: int = INGEST_CHUNK_ROWS) -> DataFrame:
+    """
+    Decodes a CoinAPI OHLCV JSON array directly into a typed data frame.
+
+    The array is decoded one object at a time without materializing dicts: the
+    fields are appended to per-column lists, which are converted to typed arrays
+    every ``chunk_rows`` candles. Peak memory is therefore bounded by one chunk of
+    Python objects rather than the whole response.
+
+    :param payload: The raw response body.
+    :param chunk_rows: Number of candles decoded before their columns are converted.
+    :return: The candles in the order of the payload.
+    :raises ValueError: If the payload is not valid JSON or not a JSON array of objects.
+    """
+    text = payload.decode() if isinstance(payload, (bytes, bytearray)) else payload
+    position = _WHITESPACE(text, 0).end()
+    if not text.startswith("[", position):
+        raise ValueError(f"Unexpected response format: {text[:200]!r}")
+
+    collector = _ColumnCollector()
+    decode = json.JSONDecoder(object_pairs_hook=collector).raw_decode
+    chunks = []
+    position = _WHITESPACE(text, position + 1).end()
+    if text.startswith("]", position):
+        return DataFrame()
+
+    while True:
+        rows = collector.rows
+        _, position = decode(text, position)
+        if collector.rows != rows + 1:
+            raise ValueError("Unexpected response format: expected a JSON array of candle objects")
+        if collector.rows >= chunk_rows:
+            chunks.append(columns_to_frame(collector.columns))
+            collector = _ColumnCollector()
+            decode = json.JSONDecoder(object_pairs_hook=collector).raw_decode
+
+        separator = _SEPARATOR(text, position)
+        if separator is None:
+            raise ValueError(f"Unexpected response format at character {position}")
+        position = separator.end()
+        if separator.group(1) == "]":
+            break
+
+    if collector.rows:
+        chunks.append(columns_to_frame(collector.columns))
+    if len(chunks) == 1:
+        return chunks[0]
+    return pd.concat(chunks, ignore_index=True)
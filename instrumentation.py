@@ -0,0 +1,182 @@
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Union
+from pandas import DataFrame
+
+from constants import PROFILING_ENABLED, PROFILING_MAX_RECORDS
+
+logging.basicConfig(level=logging.INFO)
+
+try:
+    PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    PAGE_SIZE = 4096
+
+
+def _rss_bytes() -> int:
+    """Current resident set size of the process, or 0 where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def _rows(value) -> Union[int, None]:
+    if isinstance(value, DataFrame):
+        return len(value)
+    return None
+
+
+class Profiler:
+    """
+    Records wall time, CPU time, RSS delta and row count of named pipeline stages.
+
+    Records are kept in a bounded ring buffer shared by all threads, logged as one
+    JSON line each and aggregated into a Prometheus text exposition. While disabled,
+    ``stage`` returns a shared no-op context and ``instrumented`` functions cost one
+    attribute lookup per call.
+    """
+
+    def __init__(self, enabled: bool = PROFILING_ENABLED, max_records: int = PROFILING_MAX_RECORDS):
+        self.enabled = enabled
+        self.records = deque(maxlen=max_records)
+        self.totals = {}
+        self.lock = threading.Lock()
+
+    def stage(self, name: str, rows: Union[int, None] = None):
+        """Context manager measuring one stage; call ``set_rows`` on the returned object to report rows afterwards."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name, rows)
+
+    def record(self, name: str, wall: float, cpu: float, memory: int, rows: Union[int, None]) -> None:
+        entry = {
+            "stage": name,
+            "thread": threading.current_thread().name,
+            "wall_seconds": wall,
+            "cpu_seconds": cpu,
+            "memory_delta_bytes": memory,
+            "rows": rows,
+            "timestamp": time.time(),
+        }
+        with self.lock:
+            self.records.append(entry)
+            total = self.totals.setdefault(name, [0, 0.0, 0.0, 0, 0])
+            total[0] += 1
+            total[1] += wall
+            total[2] += cpu
+            total[3] += memory
+            total[4] += rows or 0
+        logging.info(f"stage {json.dumps(entry)}")
+
+    def recent(self, limit: Union[int, None] = None) -> list:
+        """Returns a copy of the latest records, oldest first."""
+        with self.lock:
+            records = list(self.records)
+        return records if limit is None else records[-limit:]
+
+    def reset(self) -> None:
+        with self.lock:
+            self.records.clear()
+            self.totals.clear()
+
+    def prometheus_text(self) -> str:
+        """Renders the per-stage totals in the Prometheus text exposition format."""
+        metrics = [
+            ("pipeline_stage_calls_total", "counter", "Number of times the stage ran.", 0),
+            ("pipeline_stage_wall_seconds_total", "counter", "Wall-clock time spent in the stage.", 1),
+            ("pipeline_stage_cpu_seconds_total", "counter", "CPU time of the calling thread spent in the stage.", 2),
+            ("pipeline_stage_memory_delta_bytes_total", "counter", "Sum of resident memory changes across the stage.", 3),
+            ("pipeline_stage_rows_total", "counter", "Rows processed by the stage.", 4),
+        ]
+        with self.lock:
+            totals = {name: list(total) for name, total in self.totals.items()}
+
+        lines = []
+        for metric, kind, description, index in metrics:
+            lines.append(f"# HELP {metric} {description}")
+            lines.append(f"# TYPE {metric} {kind}")
+            for name, total in sorted(totals.items()):
+                lines.append(f'{metric}{{stage="{name}"}} {total[index]}')
+        return "\n".join(lines) + "\n"
+
+
+class _Stage:
+    __slots__ = ("profiler", "name", "rows", "wall", "cpu", "memory")
+
+    def __init__(self, profiler: Profiler, name: str, rows: Union[int, None]):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+
+    def set_rows(self, rows: Union[int, None]) -> None:
+        self.rows = rows
+
+    def __enter__(self):
+        self.memory = _rss_bytes()
+        self.cpu = time.thread_time()
+        self.wall = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        wall = time.perf_counter() - self.wall
+        cpu = time.thread_time() - self.cpu
+        self.profiler.record(self.name, wall, cpu, _rss_bytes() - self.memory, self.rows)
+        return False
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def set_rows(self, rows):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+PROFILER = Profiler()
+
+
+def stage(name: str, rows: Union[int, None] = None):
+    """Measures a block of code as a named stage of the shared PROFILER."""
+    return PROFILER.stage(name, rows)
+
+
+def instrumented(name: Union[str, None] = None):
+    """
+    Decorator recording every call of a function as a stage of the shared PROFILER.
+
+    The row count is taken from the returned data frame, or else from the first data frame argument.
+
+    :param name: The stage name, the function's qualified name if None.
+    """
+    def decorator(func):
+        stage_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.enabled:
+                return func(*args, **kwargs)
+            with PROFILER.stage(stage_name) as measured:
+                result = func(*args, **kwargs)
+                rows = _rows(result)
+                if rows is None:
+                    rows = next((len(arg) for arg in args if isinstance(arg, DataFrame)), None)
+                measured.set_rows(rows)
+            return result
+
+        return wrapper
+
+    return decorator
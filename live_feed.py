@@ -0,0 +1,290 @@
+import json
+import logging
+import time
+from typing import Iterator, Mapping, NamedTuple, Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import LIVE_REPLAY_INTERVAL_SECONDS, LIVE_REPLAY_PORT, PERIOD_SECONDS
+from candle_store import CANDLE_COLUMNS, TIME_COLUMNS
+from indicator_engine import StreamingIndicatorEngine
+from indicator_kernel import compute_indicators, datetime_values
+
+logging.basicConfig(level=logging.INFO)
+
+
+def _timestamp(value) -> pd.Timestamp:
+    """Parses a CoinAPI time (ISO string with up to 7 fraction digits) or datetime to a UTC timestamp."""
+    timestamp = pd.Timestamp(value)
+    return timestamp.tz_localize("UTC") if timestamp.tz is None else timestamp.tz_convert("UTC")
+
+
+def _iso(timestamp: pd.Timestamp) -> str:
+    """Formats a UTC timestamp like CoinAPI, e.g. "2023-09-20T12:00:00.0000000Z"."""
+    return timestamp.strftime("%Y-%m-%dT%H:%M:%S.%f") + f"{timestamp.nanosecond // 100}Z"
+
+
+class CandleBuilder:
+    """
+    Builds the current candle of a period from a stream of trades or OHLCV updates.
+
+    Trades are bucketed by their exchange time into candles aligned to the epoch, like
+    CoinAPI's periods. Each trade or update returns the candle it changed and whether
+    that candle is new, i.e. the previous one has closed; input for an already closed
+    candle is ignored.
+    """
+
+    def __init__(self, period: str, candle: Union[Mapping, None] = None):
+        self.period = period
+        self.step = pd.Timedelta(seconds=PERIOD_SECONDS[period])
+        self.candle = None if candle is None else {col: candle[col] for col in CANDLE_COLUMNS}
+
+    def add_trade(self, time, price: float, size: float) -> Union[tuple, None]:
+        """
+        Adds one trade.
+
+        :param time: The exchange time of the trade.
+        :param price: The trade price.
+        :param size: The traded volume.
+        :return: A (candle, is_new) tuple, or None if the trade belongs to a closed candle.
+        """
+        time = _timestamp(time)
+        start = time.floor(self.step)
+        candle = self.candle
+        if candle is not None and start < candle["time_period_start"]:
+            return None
+        if candle is not None and start == candle["time_period_start"]:
+            candle["price_high"] = max(candle["price_high"], price)
+            candle["price_low"] = min(candle["price_low"], price)
+            candle["price_close"] = price
+            candle["volume_traded"] += size
+            candle["trades_count"] += 1
+            candle["time_close"] = max(candle["time_close"], time)
+            return dict(candle), False
+
+        self.candle = {
+            "time_period_start": start,
+            "time_period_end": start + self.step,
+            "time_open": time,
+            "time_close": time,
+            "price_open": price,
+            "price_high": price,
+            "price_low": price,
+            "price_close": price,
+            "volume_traded": size,
+            "trades_count": 1,
+        }
+        return dict(self.candle), True
+
+    def add_candle(self, message: Mapping) -> Union[tuple, None]:
+        """
+        Replaces the current candle with an OHLCV update of the same period.
+
+        :param message: A CoinAPI OHLCV record.
+        :return: A (candle, is_new) tuple, or None if the update belongs to a closed candle.
+        """
+        candle = {col: _timestamp(message[col]) if col in TIME_COLUMNS else message[col] for col in CANDLE_COLUMNS}
+        current = None if self.candle is None else self.candle["time_period_start"]
+        if current is not None and candle["time_period_start"] < current:
+            return None
+        self.candle = candle
+        return dict(candle), candle["time_period_start"] != current
+
+
+class LiveUpdate(NamedTuple):
+    """One processed message: the new or updated candle, its indicators and the processing time in seconds."""
+
+    candle: dict
+    indicators: dict
+    is_new: bool
+    seconds: float
+
+
+class LiveFeed:
+    """
+    Turns feed messages of one symbol and period into candle and indicator updates.
+
+    The indicator engine is warmed up on the history and the builder continues its
+    newest candle, so a trade that still falls into that candle updates it in place
+    (replace_last) and the first trade after its close opens the next one.
+
+    The engine computes oldest first, the only order new candles can be appended in,
+    while pipeline.analyze computes over the newest-first order the candles are fetched
+    in. Live points therefore continue history_frame(), not the analyzed frame.
+    """
+
+    def __init__(self, history: DataFrame, symbol_id: str, period: str):
+        self.symbol_id = symbol_id
+        self.period = period
+        candles = history.iloc[np.argsort(datetime_values(history["time_period_start"]), kind="stable")]
+        candles = self.candles = candles[CANDLE_COLUMNS].reset_index(drop=True)
+        self.engine = StreamingIndicatorEngine.from_history(candles.iloc[:-1])
+        last = None
+        if len(candles):
+            last = {col: _timestamp(value) if col in TIME_COLUMNS else value for col, value in candles.iloc[-1].items()}
+            self.engine.update(last)
+        self.builder = CandleBuilder(period, last)
+
+    def history_frame(self) -> DataFrame:
+        """The history with its indicators computed oldest first, as the engine was warmed up; live updates continue it."""
+        return compute_indicators(self.candles.copy())
+
+    def process(self, message: Mapping) -> Union[LiveUpdate, None]:
+        """
+        Applies one feed message.
+
+        :param message: A decoded CoinAPI WebSocket message; trades and OHLCV updates of
+                        other symbols or periods, and every other type, are ignored.
+        :return: The update, or None if the message changed no candle.
+        """
+        started = time.perf_counter()
+        kind = message.get("type")
+        if message.get("symbol_id") != self.symbol_id:
+            return None
+        if kind == "trade":
+            result = self.builder.add_trade(message["time_exchange"], float(message["price"]), float(message["size"]))
+        elif kind == "ohlcv" and message.get("period_id") == self.period:
+            result = self.builder.add_candle(message)
+        else:
+            return None
+        if result is None:
+            return None
+
+        candle, is_new = result
+        indicators = self.engine.update(candle, replace_last=not is_new)
+        return LiveUpdate(candle, indicators, is_new, time.perf_counter() - started)
+
+
+def hello_message(api_key: str, symbol_id: str, period: str, data_type: str = "trade") -> dict:
+    """The CoinAPI WebSocket subscription for the trades (or OHLCV updates) of exactly one symbol."""
+    return {
+        "type": "hello",
+        "apikey": api_key,
+        "heartbeat": False,
+        "subscribe_data_type": [data_type],
+        "subscribe_filter_symbol_id": [f"{symbol_id}$"],
+        "subscribe_filter_period_id": [period],
+    }
+
+
+def stream(
+    url: str,
+    api_key: str,
+    feed: LiveFeed,
+    data_type: str = "trade",
+    idle_timeout: Union[float, None] = None,
+    duration: Union[float, None] = None,
+) -> Iterator[LiveUpdate]:
+    """
+    Subscribes to a CoinAPI-compatible WebSocket feed and yields the updates of every message.
+
+    The stream ends when the server closes the connection, when no message arrived for
+    idle_timeout seconds or after duration seconds, whichever comes first.
+
+    :param url: The WebSocket URL, COIN_API_WS_URL or a local replay server.
+    :param api_key: The CoinAPI.io API key.
+    :param feed: The feed state of the symbol and period to follow.
+    :param data_type: "trade" to build candles from trades, "ohlcv" for CoinAPI's candle updates.
+    :param idle_timeout: Seconds to wait for a message, without limit if None.
+    :param duration: Seconds to follow the feed, without limit if None.
+    :raises ConnectionError: If the server answers with an error message.
+    """
+    # Deferred so the app only loads websockets in live mode.
+    from websockets.exceptions import ConnectionClosedOK
+    from websockets.sync.client import connect
+
+    deadline = None if duration is None else time.monotonic() + duration
+    with connect(url) as websocket:
+        websocket.send(json.dumps(hello_message(api_key, feed.symbol_id, feed.period, data_type)))
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            timeouts = [t for t in (idle_timeout, remaining) if t is not None]
+            try:
+                raw = websocket.recv(min(timeouts) if timeouts else None)
+            except TimeoutError:
+                reason = "session duration" if remaining is not None and time.monotonic() >= deadline else "idle timeout"
+                logging.info(f"Live feed of {feed.symbol_id} {feed.period} stopped: {reason} reached")
+                return
+            except ConnectionClosedOK:
+                return
+            message = json.loads(raw)
+            if message.get("type") == "error":
+                raise ConnectionError(f"Live feed error: {message.get('message')}")
+            update = feed.process(message)
+            if update is not None:
+                yield update
+
+
+def replay_messages(candles: DataFrame, symbol_id: str, period: str, data_type: str = "trade", start=None) -> Iterator[dict]:
+    """
+    Turns recorded candles into CoinAPI WebSocket messages, oldest first.
+
+    In "trade" mode every candle becomes four trades (open, low, high and close for a
+    rising candle, open, high, low and close otherwise) splitting its volume, so the
+    candles built from them have the recorded prices and volume but a trade count of 4.
+
+    :param start: Shift the candles in time so that the first one starts here (floored to the period).
+    """
+    candles = candles.iloc[np.argsort(datetime_values(candles["time_period_start"]), kind="stable")]
+    shift = pd.Timedelta(0)
+    if start is not None and len(candles):
+        shift = _timestamp(start).floor(pd.Timedelta(seconds=PERIOD_SECONDS[period])) - _timestamp(candles["time_period_start"].iloc[0])
+
+    for sequence, candle in enumerate(candles[CANDLE_COLUMNS].to_dict("records")):
+        times = {col: _timestamp(candle[col]) + shift for col in TIME_COLUMNS}
+        if data_type == "ohlcv":
+            yield {"type": "ohlcv", "symbol_id": symbol_id, "sequence": sequence, "period_id": period,
+                   **candle, **{col: _iso(value) for col, value in times.items()}}
+            continue
+
+        rising = candle["price_close"] >= candle["price_open"]
+        prices = [candle["price_open"], candle["price_low"], candle["price_high"], candle["price_close"]]
+        if not rising:
+            prices[1], prices[2] = prices[2], prices[1]
+        span = times["time_close"] - times["time_open"]
+        for i, price in enumerate(prices):
+            yield {"type": "trade", "symbol_id": symbol_id, "sequence": sequence * 4 + i,
+                   "time_exchange": _iso(times["time_open"] + span * i / 3),
+                   "price": price, "size": candle["volume_traded"] / 4, "taker_side": "BUY" if rising else "SELL"}
+
+
+def replay_server(
+    candles: DataFrame,
+    symbol_id: str,
+    period: str,
+    host: str = "localhost",
+    port: int = LIVE_REPLAY_PORT,
+    interval: float = LIVE_REPLAY_INTERVAL_SECONDS,
+    start=None,
+):
+    """
+    Local WebSocket server replaying recorded candles with the CoinAPI protocol, for offline testing.
+
+    Every connection sends a hello message and then receives replay_messages of the
+    subscribed data type, one every interval seconds.
+
+        with replay_server(store.load("1HRS"), "BITSTAMP_SPOT_BTC_USD", "1HRS") as server:
+            server.serve_forever()
+
+    :return: The websockets server, to be used as a context manager.
+    """
+    from websockets.exceptions import ConnectionClosed
+    from websockets.sync.server import serve
+
+    def handler(websocket):
+        hello = json.loads(websocket.recv())
+        if hello.get("type") != "hello":
+            websocket.send(json.dumps({"type": "error", "message": "Expected a hello message"}))
+            return
+        data_type = (hello.get("subscribe_data_type") or ["trade"])[0]
+        try:
+            for message in replay_messages(candles, symbol_id, period, data_type, start):
+                websocket.send(json.dumps(message))
+                time.sleep(interval)
+        except ConnectionClosed:
+            # Clients stop following the feed at any time, e.g. after their session duration.
+            pass
+
+    logging.info(f"Replaying {len(candles)} {symbol_id} {period} candles on ws://{host}:{port}")
+    return serve(handler, host, port)
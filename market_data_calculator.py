@@ -2,17 +2,21 @@ import logging
 from pandas import DataFrame
 import pandas as pd
 
+from instrumentation import instrumented
+
 # Initialize logging
 logging.basicConfig(level=logging.INFO)
 
 class MarketDataCalculator:
+    @instrumented()
     def convert_to_datetime(df: DataFrame) -> DataFrame:
-        """Converts specific columns to datetime format."""
-        df["time_period_start"] = pd.to_datetime(df["time_period_start"])
-        df["time_open"] = pd.to_datetime(df["time_open"])
-        df["time_close"] = pd.to_datetime(df["time_close"])
+        """Converts specific columns to datetime format, leaving columns that already are datetimes untouched."""
+        for col in ["time_period_start", "time_open", "time_close"]:
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col])
         return df
 
+    @instrumented()
     def calculate_market_data(df: DataFrame) -> DataFrame:
         """
         Calculates various market data features such as VWAP, rolling mean, and Bollinger Bands.
@@ -38,6 +42,7 @@ class MarketDataCalculator:
 
         return df
 
+    @instrumented()
     def calculate_volatility(df: DataFrame) -> DataFrame:
         """
         Calculates volatility based on price high, low, and open.
@@ -53,6 +58,7 @@ class MarketDataCalculator:
 
         return df
 
+    @instrumented()
     def calculate_trade_velocity(df: DataFrame) -> DataFrame:
         """
         Calculates trade velocity based on trade count and time difference.
@@ -68,6 +74,7 @@ class MarketDataCalculator:
 
         return df
 
+    @instrumented()
     def calculate_rsi(df: DataFrame) -> DataFrame:
         """
         Calculates the Relative Strength Index (RSI).
@@ -89,6 +96,7 @@ class MarketDataCalculator:
 
         return df
 
+    @instrumented()
     def calculate_macd(df: DataFrame) -> DataFrame:
         """
         Calculates the Moving Average Convergence Divergence (MACD).
@@ -0,0 +1,126 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Union
+import numpy as np
+
+from constants import MODEL_DRIFT_THRESHOLD, MODEL_REGISTRY_DIR, MODEL_REGISTRY_MAX_ENTRIES
+
+logging.basicConfig(level=logging.INFO)
+
+
+def window_hash(values: np.ndarray) -> str:
+    """Hashes the identity of a training window, e.g. its datetime64 time_period_start values."""
+    return hashlib.sha1(np.ascontiguousarray(values).tobytes()).hexdigest()
+
+
+class ModelEntry:
+    """Fitted linear regression coefficients of one forecast column."""
+
+    def __init__(self, coef: np.ndarray, intercept: float, rmse: float, window: str):
+        self.coef = coef
+        self.intercept = intercept
+        self.rmse = rmse
+        self.window = window
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def error(self, X: np.ndarray, y: np.ndarray) -> float:
+        """Root mean squared error of the model on the given data."""
+        return float(np.sqrt(np.mean((self.predict(X) - y) ** 2)))
+
+
+class ModelRegistry:
+    """
+    LRU cache of fitted forecast models kept in memory and persisted to disk.
+
+    Entries are keyed by symbol, period and column and remember the hash of the
+    training window they were fitted on. A cached model is reused while that window
+    is unchanged and its error on the current data has not drifted more than
+    ``drift_threshold`` (relative) above the error it had when it was fitted, which
+    covers the still-open latest candle changing between reruns.
+
+    One registry is shared by the refresher workers and the Streamlit threads, so the
+    LRU is only changed under a lock; disk reads and writes happen outside it.
+    """
+
+    def __init__(
+        self,
+        root: str = MODEL_REGISTRY_DIR,
+        max_entries: int = MODEL_REGISTRY_MAX_ENTRIES,
+        drift_threshold: float = MODEL_DRIFT_THRESHOLD,
+    ):
+        self.root = root
+        self.max_entries = max_entries
+        self.drift_threshold = drift_threshold
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.root, hashlib.sha1("/".join(key).encode()).hexdigest() + ".npz")
+
+    def load(self, symbol_id: str, period: str, column: str) -> Union[ModelEntry, None]:
+        """Returns the cached model of a column from memory or disk, or None."""
+        key = (symbol_id, period, column)
+        path = self._path(key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        if entry is None:
+            try:
+                with np.load(path) as data:
+                    entry = ModelEntry(data["coef"], float(data["intercept"]), float(data["rmse"]), str(data["window"]))
+            except (OSError, KeyError, ValueError):
+                return None
+            with self.lock:
+                # Another thread may have stored a newer model for the key while this one read the file.
+                entry = self.entries.setdefault(key, entry)
+                self.entries.move_to_end(key)
+                self._evict()
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def store(self, symbol_id: str, period: str, column: str, entry: ModelEntry) -> None:
+        """Caches a fitted model in memory and on disk."""
+        key = (symbol_id, period, column)
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            self._evict()
+
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(key)
+        # Temporary names are unique per thread, so concurrent stores of one key never share a file.
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as fh:
+            np.savez(fh, coef=entry.coef, intercept=entry.intercept, rmse=entry.rmse, window=entry.window)
+        os.replace(tmp, path)
+
+        try:
+            files = [os.path.join(self.root, name) for name in os.listdir(self.root) if name.endswith(".npz")]
+            if len(files) > self.max_entries:
+                files.sort(key=os.path.getmtime)
+                for path in files[:len(files) - self.max_entries]:
+                    os.remove(path)
+        except OSError as e:
+            # Another process sharing the directory may have evicted the same files.
+            logging.info(f"Skipping model registry eviction: {e}")
+
+    def _evict(self) -> None:
+        """Drops the least recently used entries beyond max_entries; the caller holds the lock."""
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def is_fresh(self, entry: Union[ModelEntry, None], window: str, X: np.ndarray, y: np.ndarray) -> bool:
+        """Tells whether a cached model can be reused for the given training window and data."""
+        if entry is None or entry.window != window or entry.coef.shape != (X.shape[1],):
+            return False
+        return entry.error(X, y) <= entry.rmse * (1 + self.drift_threshold) + 1e-12
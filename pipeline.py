@@ -0,0 +1,260 @@
+import logging
+import time
+import warnings
+from typing import Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import COIN_API_OHLCV_ENDPOINT, DEFAULT_SYMBOL_ID, INDICATOR_BACKEND, PERIOD_SECONDS, PIPELINE_MODE
+from market_data_calculator import MarketDataCalculator
+from indicator_engine import INDICATOR_COLUMNS
+from indicator_kernel import compute_indicator_arrays, compute_indicators, datetime_values
+from data_retriever import DataRetriever
+from candle_store import COUNT_COLUMNS, PRICE_COLUMNS, TIME_COLUMNS, CandleStore
+from model_registry import ModelRegistry, window_hash
+from resample import TimeframeSet, base_window
+from instrumentation import instrumented
+import prediction
+
+logging.basicConfig(level=logging.INFO)
+
+# Forecast models shared by every analysis run in this process, persisted across restarts.
+MODEL_REGISTRY = ModelRegistry()
+
+MARKET_CALCULATIONS = [
+    MarketDataCalculator.convert_to_datetime,
+    MarketDataCalculator.calculate_market_data,
+    MarketDataCalculator.calculate_volatility,
+    MarketDataCalculator.calculate_trade_velocity,
+    MarketDataCalculator.calculate_rsi,
+    MarketDataCalculator.calculate_macd
+]
+
+
+@instrumented()
+def apply_market_calculations(df, calculations):
+    """Applies a series of market calculations on the DataFrame."""
+    for calculation in calculations:
+        df = calculation(df)
+    return df
+
+
+@instrumented()
+def calculate_indicators(df, backend=INDICATOR_BACKEND):
+    """Computes every market indicator with the selected backend ("pandas" or "numpy")."""
+    if backend == "pandas":
+        return apply_market_calculations(df, MARKET_CALCULATIONS)
+    if backend == "numpy":
+        return compute_indicators(MarketDataCalculator.convert_to_datetime(df))
+    raise ValueError(f"Unknown indicator backend: {backend}")
+
+
+def candle_watermark(period: str, now: Union[float, None] = None) -> int:
+    """Returns the index of the candle interval containing ``now``, which changes exactly when a new candle opens."""
+    return int((time.time() if now is None else now) // PERIOD_SECONDS[period])
+
+
+@instrumented()
+def fetch_candles(api_key: str, period: str, symbol_id: str = DEFAULT_SYMBOL_ID) -> Union[DataFrame, None]:
+    """
+    Retrieves the latest candles of one symbol and period through the local candle store.
+
+    :param api_key: The CoinAPI.io API key.
+    :param period: The CoinAPI period identifier, e.g. "4HRS".
+    :param symbol_id: The CoinAPI symbol identifier, e.g. "BITSTAMP_SPOT_BTC_USD".
+    :return: A data frame with the latest candles newest first, or None if nothing could be retrieved.
+    """
+    headers = {"X-CoinAPI-Key": api_key}
+    endpoint = COIN_API_OHLCV_ENDPOINT.format(symbol_id=symbol_id)
+    return DataRetriever.retrieve_incremental(endpoint, period, headers, CandleStore(symbol_id=symbol_id))
+
+
+@instrumented()
+def fetch_timeframes(api_key: str, periods: list, symbol_id: str = DEFAULT_SYMBOL_ID) -> Union[TimeframeSet, None]:
+    """
+    Retrieves the finest of the periods once, through the local candle store, and derives the others from it.
+
+    :param api_key: The CoinAPI.io API key.
+    :param periods: CoinAPI period identifiers, each a whole multiple of the finest one.
+    :param symbol_id: The CoinAPI symbol identifier, e.g. "BITSTAMP_SPOT_BTC_USD".
+    :return: The candles of every period, derived locally on first access, or None if nothing could be retrieved.
+    """
+    base_period = min(periods, key=PERIOD_SECONDS.get)
+    headers = {"X-CoinAPI-Key": api_key}
+    endpoint = COIN_API_OHLCV_ENDPOINT.format(symbol_id=symbol_id)
+    base = DataRetriever.retrieve_incremental(
+        endpoint, base_period, headers, CandleStore(symbol_id=symbol_id), base_window(periods, base_period)
+    )
+    if base is None or base.empty:
+        return None
+    return TimeframeSet(base, base_period)
+
+
+# Numeric columns of the in-place frame, in the column order of its float64 block.
+NUMERIC_COLUMNS = PRICE_COLUMNS + COUNT_COLUMNS + INDICATOR_COLUMNS
+
+
+@instrumented()
+def analyze(
+    df: DataFrame,
+    period: Union[str, None] = None,
+    symbol_id: str = DEFAULT_SYMBOL_ID,
+    mode: str = PIPELINE_MODE,
+    horizon: Union[int, None] = None,
+) -> DataFrame:
+    """
+    Computes the indicators of a candle frame and appends the forecasted data.
+
+    Forecasts are one candle of the period apart (hourly when no period is given).
+    Fitted forecast models are cached in MODEL_REGISTRY when the period of the candles is given.
+
+    :param mode: "copy" for the step-by-step DataFrame pipeline, "in_place" for analyze_in_place,
+                 which always uses the NumPy indicator kernel whatever INDICATOR_BACKEND says.
+    :param horizon: Number of forecast rows to append (at least 1); one week's worth minus the first and last candle if None.
+    :return: The analyzed frame; in both modes an empty frame with the result's columns if there are no candles.
+    """
+    if mode not in ("copy", "in_place"):
+        raise ValueError(f"Unknown pipeline mode: {mode}")
+    if df.empty:
+        prediction.forecast_steps(period, horizon)  # still rejects an invalid horizon
+        return _empty_result()
+    if mode == "in_place":
+        return analyze_in_place(df, period, symbol_id, horizon)
+    df = calculate_indicators(df)
+    registry = MODEL_REGISTRY if period is not None else None
+    return prediction.append_forecasted_data(df, registry, symbol_id, period, horizon)
+
+
+@instrumented()
+def analyze_in_place(
+    df: DataFrame,
+    period: Union[str, None] = None,
+    symbol_id: str = DEFAULT_SYMBOL_ID,
+    horizon: Union[int, None] = None,
+) -> DataFrame:
+    """
+    Runs the indicator and forecast pipeline into one preallocated frame.
+
+    One float64 block holds the OHLCV and indicator columns and one int32 block the
+    calendar features, both sized for the history plus the forecast horizon. The
+    history is copied in once in chronological order, the NumPy indicator kernel
+    writes into its column slices and the forecasts fill the tail segment
+    [len(df):], so no intermediate frames are built. Indicators are computed over
+    the newest-first order the candles are fetched in and forecasts are trained on
+    the same rows, giving the same values per candle as the "copy" mode; only the
+    row order differs (oldest first, forecasts last).
+
+    The indicators always come from the NumPy kernel (indicator_kernel), which writes
+    into the preallocated columns; INDICATOR_BACKEND only selects the backend of the
+    "copy" mode. Both backends agree within floating-point rounding.
+
+    :param df: Candles newest first, as returned by fetch_candles.
+    :return: A frame of len(df) history rows followed by the forecasted rows; an empty
+             frame with the same columns if there are no candles to forecast from.
+    """
+    n = len(df)
+    if n == 0:
+        return _empty_result()
+    times = {col: datetime_values(df[col]) for col in TIME_COLUMNS}
+    order = np.argsort(times["time_period_start"], kind="stable")
+    offsets = prediction.forecast_offsets(period, horizon)
+    rows = n + len(offsets)
+
+    numeric = np.empty((rows, len(NUMERIC_COLUMNS)), dtype="float64", order="F")
+    features = np.empty((rows, len(prediction.FEATURE_COLUMNS)), dtype="int32", order="F")
+    stamps = np.empty((rows, len(TIME_COLUMNS)), dtype="datetime64[ns]", order="F")
+    column = {col: numeric[:, i] for i, col in enumerate(NUMERIC_COLUMNS)}
+    stamp = {col: stamps[:, i] for i, col in enumerate(TIME_COLUMNS)}
+
+    for col in PRICE_COLUMNS + COUNT_COLUMNS:
+        column[col][:n] = df[col].to_numpy(dtype="float64")[order]
+    for col in TIME_COLUMNS:
+        stamp[col][:n] = times[col][order]
+    numeric[n:] = np.nan
+
+    # Newest-first views of the history, matching the order the "copy" mode computes in.
+    newest = numeric[:n][::-1]
+    hours = (stamp["time_close"][:n] - stamp["time_open"][:n])[::-1] / np.timedelta64(1, "h")
+    first = len(PRICE_COLUMNS + COUNT_COLUMNS)
+    compute_indicator_arrays(
+        **{col: newest[:, i] for i, col in enumerate(PRICE_COLUMNS + COUNT_COLUMNS)},
+        hours=hours,
+        out=newest[:, first:first + len(INDICATOR_COLUMNS)],
+    )
+
+    stamp["time_period_start"][n:] = stamp["time_period_start"][n - 1] + offsets
+    stamp["time_period_end"][n:] = stamp["time_period_start"][n:] + prediction.period_step(period)
+    to_open = (stamp["time_open"][:n] - stamp["time_period_start"][:n]).view("int64").mean()
+    to_close = (stamp["time_period_end"][:n] - stamp["time_close"][:n]).view("int64").mean()
+    stamp["time_open"][n:] = stamp["time_period_start"][n:] + np.timedelta64(int(to_open), "ns")
+    stamp["time_close"][n:] = stamp["time_period_end"][n:] - np.timedelta64(int(to_close), "ns")
+    prediction.calendar_features(stamp["time_period_start"], features)
+
+    _forecast_tail(numeric, features, stamp["time_period_start"], n, period, symbol_id)
+
+    frame = {col: pd.DatetimeIndex(stamp[col]).tz_localize("UTC") for col in ["time_period_start", "time_period_end"]}
+    frame.update({col: features[:, i] for i, col in enumerate(prediction.FEATURE_COLUMNS)})
+    frame.update({col: column[col] for col in prediction.FORECAST_COLUMNS})
+    frame.update({col: pd.DatetimeIndex(stamp[col]).tz_localize("UTC") for col in ["time_open", "time_close"]})
+    result = DataFrame(frame, copy=False)
+
+    logging.info(f"In-place pipeline frame: {rows} rows, {(numeric.nbytes + features.nbytes + 2 * stamps.nbytes) / 1e6:.1f} MB")
+    return result
+
+
+def _empty_result() -> DataFrame:
+    """The columns and dtypes of an analyze result, in either mode, without rows."""
+    empty = pd.DatetimeIndex([], dtype="datetime64[ns, UTC]")
+    frame = {col: empty for col in ["time_period_start", "time_period_end"]}
+    frame.update({col: np.empty(0, dtype="int32") for col in prediction.FEATURE_COLUMNS})
+    frame.update({col: np.empty(0, dtype="float64") for col in prediction.FORECAST_COLUMNS})
+    frame.update({col: empty for col in ["time_open", "time_close"]})
+    return DataFrame(frame)
+
+
+def _forecast_tail(numeric: np.ndarray, features: np.ndarray, starts: np.ndarray, n: int, period, symbol_id: str) -> None:
+    """Fits the forecast models on the newest 80% of the history and writes their predictions into numeric[n:]."""
+    n_train = prediction.training_rows(n)
+    if n_train < 1:
+        return
+
+    indices = np.array([NUMERIC_COLUMNS.index(col) for col in prediction.FORECAST_COLUMNS])
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # columns that are all NaN are reported below
+        means = np.array([np.nanmean(numeric[:n, i]) for i in indices])
+    finite = np.isfinite(means)
+    for col in np.array(prediction.FORECAST_COLUMNS)[~finite]:
+        logging.error(f"Error forecasting column {col}: Input y contains NaN or infinity.")
+    targets = [col for col, ok in zip(prediction.FORECAST_COLUMNS, finite) if ok]
+    if not targets:
+        return
+
+    # Only the training rows are copied: the newest n_train candles, newest first.
+    train = slice(n - 1, n - 1 - n_train, -1)
+    Y_train = numeric[train][:, indices[finite]]
+    np.copyto(Y_train, means[finite], where=np.isnan(Y_train))
+    X_train = features[train].astype("float64")
+
+    registry = MODEL_REGISTRY if period is not None else None
+    window = window_hash(starts[train]) if registry is not None else None
+    try:
+        numeric[n:, indices[finite]] = prediction.predict_columns(
+            X_train, Y_train, features[n:].astype("float64"), targets, registry, symbol_id, period, window
+        )
+    except Exception as e:
+        logging.error(f"Error forecasting columns {targets}: {e}")
+
+
+def fetch_and_analyze(
+    api_key: str,
+    period: str,
+    symbol_id: str = DEFAULT_SYMBOL_ID,
+    horizon: Union[int, None] = None,
+    mode: str = PIPELINE_MODE,
+) -> Union[DataFrame, None]:
+    """Retrieves the latest candles of one series and runs the full indicator and forecast pipeline."""
+    df = fetch_candles(api_key, period, symbol_id)
+    if df is None or df.empty:
+        return None
+    return analyze(df, period, symbol_id, mode=mode, horizon=horizon)
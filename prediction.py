@@ -1,9 +1,12 @@
-from datetime import timedelta
+import math
+import numpy as np
 import pandas as pd
-from sklearn.linear_model import LinearRegression
-from sklearn.model_selection import train_test_split
 import logging
 
+from constants import FORECAST_HORIZON_SECONDS, PERIOD_SECONDS
+from model_registry import ModelEntry, window_hash
+from instrumentation import instrumented
+
 logging.basicConfig(level=logging.INFO)
 
 def convert_to_datetime(df):
@@ -11,59 +14,182 @@ def convert_to_datetime(df):
     datetime_columns = ["time_period_start", "time_period_end", "time_open", "time_close"]
     for col in datetime_columns:
         try:
-            df[col] = pd.to_datetime(df[col])
+            if not pd.api.types.is_datetime64_any_dtype(df[col]):
+                df[col] = pd.to_datetime(df[col])
         except Exception as e:
             logging.error(f"Error converting column {col} to datetime: {e}")
     return df
 
+def calendar_features(times, out):
+    """Write the hour, day, month and year of datetime64 (UTC) times into the four columns of out."""
+    days = times.astype("datetime64[D]")
+    months = times.astype("datetime64[M]")
+    out[:, 0] = (times - days) // np.timedelta64(1, "h")
+    out[:, 1] = (days - months.astype("datetime64[D]")).astype(np.int64) + 1
+    out[:, 2] = months.astype(np.int64) % 12 + 1
+    out[:, 3] = times.astype("datetime64[Y]").astype(np.int64) + 1970
+    return out
+
 def prepare_data_for_regression(df):
     """Prepare data for the linear regression model by extracting date components."""
-    df["hour"] = df["time_period_start"].dt.hour
-    df["day"] = df["time_period_start"].dt.day
-    df["month"] = df["time_period_start"].dt.month
-    df["year"] = df["time_period_start"].dt.year
+    features = calendar_features(df["time_period_start"].values, np.empty((len(df), len(FEATURE_COLUMNS)), dtype="int32"))
+    for i, col in enumerate(FEATURE_COLUMNS):
+        df[col] = features[:, i]
     return df
 
-def create_future_dataframe(greatest_date):
-    """Create a future dataframe for forecasting the next one week."""
-    future_dates = pd.date_range(start=greatest_date, periods=7*24, freq='H')
-    future_df = pd.DataFrame({"time_period_start": future_dates})
-    future_df["time_period_end"] = future_df["time_period_start"] + timedelta(hours=1)
-    future_df = prepare_data_for_regression(future_df)
+def training_rows(n):
+    """Number of leading rows the forecast models are fitted on: all but the last 20% (rounded up), as train_test_split(test_size=0.2, shuffle=False)."""
+    return n - math.ceil(0.2 * n)
+
+def period_step(period=None):
+    """Length of one candle of the CoinAPI period (hourly when None) as a timedelta64."""
+    return np.timedelta64(PERIOD_SECONDS[period or "1HRS"], "s").astype("timedelta64[ns]")
+
+def forecast_steps(period=None, horizon=None):
+    """
+    Number of future candles create_future_dataframe builds, the first and last of which are dropped when appended.
+
+    :param horizon: Number of forecast rows to append, at least 1; if None, as many steps as cover FORECAST_HORIZON_SECONDS.
+    :raises ValueError: If horizon is less than 1.
+    """
+    if horizon is not None:
+        if int(horizon) < 1:
+            raise ValueError(f"The forecast horizon must be at least 1 candle, got {horizon}")
+        return int(horizon) + 2
+    return max(FORECAST_HORIZON_SECONDS // PERIOD_SECONDS[period or "1HRS"], 2)
+
+def forecast_offsets(period=None, horizon=None):
+    """Offsets from the latest candle of the forecasted rows appended to the history: horizon rows, or one week's worth minus two."""
+    return np.arange(1, forecast_steps(period, horizon) - 1) * period_step(period)
+
+def create_future_dataframe(greatest_date, period="1HRS", horizon=None):
+    """
+    Create a future dataframe for forecasting, starting at greatest_date, in steps of the candle period.
+
+    :param greatest_date: The time_period_start of the latest candle.
+    :param period: The CoinAPI period identifier of the candles, e.g. "4HRS".
+    :param horizon: Number of forecast rows that will be appended; two more candles are built. One week's worth if None.
+    """
+    greatest_date = pd.Timestamp(greatest_date)
+    step = period_step(period)
+    origin = greatest_date.tz_convert(None) if greatest_date.tz is not None else greatest_date
+    starts = origin.to_datetime64().astype("datetime64[ns]") + np.arange(forecast_steps(period, horizon)) * step
+
+    features = calendar_features(starts, np.empty((len(starts), len(FEATURE_COLUMNS)), dtype="int32", order="F"))
+    future_df = pd.DataFrame({
+        "time_period_start": _like(starts, greatest_date),
+        "time_period_end": _like(starts + step, greatest_date),
+        **{col: features[:, i] for i, col in enumerate(FEATURE_COLUMNS)},
+    }, copy=False)
     return future_df
 
+def _like(values, timestamp):
+    """Wraps naive UTC datetime64 values with the timezone of timestamp."""
+    index = pd.DatetimeIndex(values)
+    return index.tz_localize("UTC").tz_convert(timestamp.tz) if timestamp.tz is not None else index
+
+FEATURE_COLUMNS = ["hour", "day", "month", "year"]
+
+FORECAST_COLUMNS = [
+    "price_open", "price_high", "price_low", "price_close",
+    "volume_traded", "trades_count", "volatility", "trade_velocity",
+    "rolling_mean", "rolling_std", "bollinger_upper", "bollinger_lower",
+    "ma50", "ma200", "vwap", "rsi", "ema12", "ema26", "macd", "macd_signal"
+]
+
+@instrumented()
 def forecast_column(df, future_df, col):
     """Forecast a single column using a linear regression model."""
+    forecast_columns(df, future_df, [col])
+
+@instrumented()
+def forecast_columns(df, future_df, cols, registry=None, symbol_id=None, period=None):
+    """
+    Forecast several columns with one multi-output linear regression sharing a single design matrix.
+
+    When a ModelRegistry is given, cached models of the same symbol and period are
+    reused and only the stale columns are refitted.
+    """
+    targets = []
+    for col in cols:
+        if col not in df.columns:
+            logging.error(f"Error forecasting column {col}: {KeyError(col)}")
+            continue
+        targets.append(col)
+
     try:
-        X = df[["hour", "day", "month", "year"]]
-        y = df[col].fillna(df[col].mean())  # Filling NaN values with mean
+        X = df[FEATURE_COLUMNS].to_numpy(dtype="float64")
+        Y = df[targets].astype("float64")
+        Y = Y.fillna(Y.mean())  # Filling NaN values with mean
+    except Exception as e:
+        logging.error(f"Error forecasting columns {targets}: {e}")
+        return
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
-        
-        model = LinearRegression()
-        model.fit(X_train, y_train)
-        
-        future_X = future_df[["hour", "day", "month", "year"]]
-        future_df[col] = model.predict(future_X)
+    finite = np.isfinite(Y.to_numpy()).all(axis=0)
+    for col in Y.columns[~finite]:
+        logging.error(f"Error forecasting column {col}: Input y contains NaN or infinity.")
+    targets = list(Y.columns[finite])
+    if not targets:
+        return
+
+    try:
+        n_train = training_rows(len(X))
+        if n_train < 1:
+            raise ValueError(f"With n_samples={len(X)} the training set would be empty")
+        X_train, Y_train = X[:n_train], Y[targets].to_numpy()[:n_train]
+        future_X = future_df[FEATURE_COLUMNS].to_numpy(dtype="float64")
+        window = None if registry is None else window_hash(df["time_period_start"].values[:len(X_train)])
+        future_df[targets] = predict_columns(X_train, Y_train, future_X, targets, registry, symbol_id, period, window)
     except Exception as e:
-        logging.error(f"Error forecasting column {col}: {e}")
+        logging.error(f"Error forecasting columns {targets}: {e}")
+
+def predict_columns(X_train, Y_train, future_X, targets, registry=None, symbol_id=None, period=None, window=None):
+    """
+    Fit one multi-output linear regression on the training arrays and predict the future rows.
+
+    With a ModelRegistry, cached models trained on the same window (hash) are reused and only stale columns are refitted.
+
+    :return: A (len(future_X), len(targets)) array of predictions.
+    """
+    if registry is None:
+        from sklearn.linear_model import LinearRegression  # deferred until a model is actually fitted
+
+        model = LinearRegression()
+        model.fit(X_train, Y_train)
+        return model.predict(future_X)
 
-def append_forecasted_data(df):
-    """Append forecasted data to the original dataframe."""
+    models = {col: registry.load(symbol_id, period, col) for col in targets}
+    stale = [i for i, col in enumerate(targets) if not registry.is_fresh(models[col], window, X_train, Y_train[:, i])]
+
+    if stale:
+        from sklearn.linear_model import LinearRegression
+
+        model = LinearRegression()
+        model.fit(X_train, Y_train[:, stale])
+        residuals = model.predict(X_train) - Y_train[:, stale]
+        rmse = np.sqrt(np.mean(residuals ** 2, axis=0))
+        for j, i in enumerate(stale):
+            models[targets[i]] = ModelEntry(model.coef_[j], float(model.intercept_[j]), float(rmse[j]), window)
+            registry.store(symbol_id, period, targets[i], models[targets[i]])
+    logging.info(f"Forecast models refitted for {len(stale)} of {len(targets)} columns")
+
+    return np.column_stack([models[col].predict(future_X) for col in targets])
+
+@instrumented()
+def append_forecasted_data(df, registry=None, symbol_id=None, period=None, horizon=None):
+    """
+    Append forecasted data to the original dataframe.
+
+    Forecasts are made one candle of the given period (hourly when None) apart: horizon rows
+    are appended, or one week's worth minus the first and last candle when horizon is None. Pass a ModelRegistry together with the symbol and period of the data
+    to reuse fitted models across calls.
+    """
     df = convert_to_datetime(df)
     df = prepare_data_for_regression(df)
     greatest_date = df["time_period_start"].max()
-    future_df = create_future_dataframe(greatest_date)
-
-    forecast_columns = [
-        "price_open", "price_high", "price_low", "price_close", 
-        "volume_traded", "trades_count", "volatility", "trade_velocity", 
-        "rolling_mean", "rolling_std", "bollinger_upper", "bollinger_lower", 
-        "ma50", "ma200", "vwap", "rsi", "ema12", "ema26", "macd", "macd_signal"
-    ]
+    future_df = create_future_dataframe(greatest_date, period or "1HRS", horizon)
 
-    for col in forecast_columns:
-        forecast_column(df, future_df, col)
+    forecast_columns(df, future_df, FORECAST_COLUMNS, registry, symbol_id, period)
 
     # Calculate forecasted time_open and time_close based on average time differences
     avg_time_to_open = (df['time_open'] - df['time_period_start']).mean()
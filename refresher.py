@@ -0,0 +1,217 @@
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import NamedTuple, Union
+from pandas import DataFrame
+
+from constants import (
+    APP_PERIODS,
+    COMPACT_SNAPSHOTS,
+    DEFAULT_SYMBOL_ID,
+    PERIOD_SECONDS,
+    REFRESHER_CLOSE_DELAY_SECONDS,
+    REFRESHER_IDLE_SECONDS,
+    REFRESHER_MAX_WORKERS,
+)
+from compact import compact_frame
+from data_retriever import collect_errors
+from instrumentation import instrumented
+import pipeline
+
+logging.basicConfig(level=logging.INFO)
+
+
+def key_id(api_key: str) -> str:
+    """Identifies an API key in the refresher's keys without keeping it in them."""
+    return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+
+
+class Snapshot(NamedTuple):
+    """
+    An analyzed frame and the candles it was computed from, published by the Refresher; both are shared by every reader and must not be modified.
+
+    With COMPACT_SNAPSHOTS the frame is in the compact layout; read it through compact.expand_frame.
+    """
+
+    frame: DataFrame
+    symbol_id: str
+    period: str
+    watermark: int
+    refreshed_at: float
+    candles: DataFrame
+
+
+class Refresher:
+    """
+    Process-wide background refresher serving one pipeline run per series to every reader.
+
+    Each (API key, symbol, period) that has been read recently is recomputed once per
+    close of the base candle (the finest of the periods, which every other period is
+    resampled from) by a scheduler thread, and the result is published as an immutable
+    Snapshot. Readers get the current snapshot without copying; a series that has no
+    current snapshot yet is computed once, with concurrent readers waiting on the same run.
+
+    Series are keyed by a hash of the API key, so a snapshot is only served to readers
+    with the key it was fetched with, and every key's refreshes spend that key's quota.
+    When a refresh fails, the last good snapshot stays published and the error is kept
+    for last_error. Base candles are fetched and merged into the candle store under one
+    lock per (symbol, base period), whatever the key, since all keys share that store.
+    """
+
+    def __init__(self, periods: list = APP_PERIODS, max_workers: int = REFRESHER_MAX_WORKERS, compact: bool = COMPACT_SNAPSHOTS):
+        self.periods = list(periods)
+        self.base_period = min(self.periods, key=PERIOD_SECONDS.get)
+        self.compact = compact
+        self.snapshots = {}
+        self.failures = {}
+        self.readers = {}
+        self.inflight = {}
+        self.timeframes = {}
+        self.base_locks = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.stopped = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="refresher")
+        self.scheduler = None
+
+    def watermark(self, now: Union[float, None] = None) -> int:
+        """Index of the current base candle; snapshots of an older one are stale."""
+        return pipeline.candle_watermark(self.base_period, now)
+
+    def get(
+        self, api_key: str, period: str, symbol_id: str = DEFAULT_SYMBOL_ID, timeout: Union[float, None] = None
+    ) -> Union[Snapshot, None]:
+        """
+        Returns the current snapshot of a series, computing it first if there is none.
+
+        Reading a series keeps it scheduled for background refreshes, done with the API
+        key of its latest reader.
+
+        :param api_key: The CoinAPI.io API key.
+        :param period: The CoinAPI period identifier, one of the refresher's periods.
+        :param symbol_id: The CoinAPI symbol identifier.
+        :param timeout: Seconds to wait for a cold series, without limit if None.
+        :return: The current snapshot, the last good one if the refresh failed (see last_error),
+                 or None if no market data could be retrieved with this key yet.
+        """
+        if period not in self.periods:
+            raise ValueError(f"Unknown period {period}, expected one of {self.periods}")
+        key = (key_id(api_key), symbol_id, period)
+        watermark = self.watermark()
+        with self.lock:
+            self.readers[key] = (api_key, time.time())
+            snapshot = self.snapshots.get(key)
+            if snapshot is not None and snapshot.watermark >= watermark:
+                return snapshot
+            future = self._submit(key, api_key, watermark)
+        self._start()
+        return future.result(timeout)
+
+    def last_error(self, api_key: str, period: str, symbol_id: str = DEFAULT_SYMBOL_ID) -> Union[str, None]:
+        """The error of the latest refresh of a series, or None if it succeeded."""
+        with self.lock:
+            return self.failures.get((key_id(api_key), symbol_id, period))
+
+    def _submit(self, key: tuple, api_key: str, watermark: int) -> Future:
+        """Schedules a refresh unless one for the same key is already running; the caller holds the lock."""
+        future = self.inflight.get(key)
+        if future is None:
+            future = self.inflight[key] = self.executor.submit(self._refresh, key, api_key, watermark)
+        return future
+
+    def _base(self, api_key: str, base_key: tuple, watermark: int):
+        """Returns the candles of every period of a (key hash, symbol), fetching the base period once per base candle."""
+        with self.lock:
+            base_lock = self.base_locks.setdefault((base_key[1], self.base_period), threading.Lock())
+        with base_lock:
+            cached = self.timeframes.get(base_key)
+            if cached is None or cached[0] < watermark:
+                timeframes = pipeline.fetch_timeframes(api_key, self.periods, base_key[1])
+                if timeframes is None:
+                    return None
+                cached = self.timeframes[base_key] = (watermark, timeframes)
+            return cached[1]
+
+    @instrumented()
+    def _refresh(self, key: tuple, api_key: str, watermark: int) -> Union[Snapshot, None]:
+        _, symbol_id, period = key
+        try:
+            with collect_errors() as errors:
+                timeframes = self._base(api_key, key[:2], watermark)
+            if timeframes is not None:
+                # The derived candles are shared by the periods' runs, so the pipeline gets its own copy.
+                candles = timeframes.get(period)
+                frame = pipeline.analyze(candles.copy(), period, symbol_id)
+                if self.compact:
+                    frame = compact_frame(frame, period)
+                snapshot = Snapshot(frame, symbol_id, period, watermark, time.time(), candles)
+                with self.lock:
+                    self.snapshots[key] = snapshot
+                    self.failures.pop(key, None)
+                    self.inflight.pop(key, None)
+                logging.info(f"Published {symbol_id} {period} snapshot of {len(frame)} rows for candle {watermark}")
+                return snapshot
+            error = "; ".join(errors) or f"No market data available for {symbol_id} {period}"
+        except Exception as e:
+            logging.error(f"Error refreshing {symbol_id} {period}: {e}")
+            error = f"Error refreshing {symbol_id} {period}: {e}"
+
+        with self.lock:
+            self.failures[key] = error
+            self.inflight.pop(key, None)
+            return self.snapshots.get(key)
+
+    def _start(self) -> None:
+        with self.lock:
+            if self.scheduler is None:
+                self.scheduler = threading.Thread(target=self._run, name="refresher-scheduler", daemon=True)
+                self.scheduler.start()
+
+    def _run(self) -> None:
+        """Sleeps until shortly after the next base candle close, then refreshes every active series."""
+        step = PERIOD_SECONDS[self.base_period]
+        while not self.stopped.is_set():
+            now = time.time()
+            self.wake.wait((now // step + 1) * step + REFRESHER_CLOSE_DELAY_SECONDS - now)
+            self.wake.clear()
+            if not self.stopped.is_set():
+                self.refresh_due()
+
+    def refresh_due(self) -> list:
+        """
+        Starts a refresh of every recently read series whose snapshot is older than the current candle.
+
+        Series not read for REFRESHER_IDLE_SECONDS are dropped instead, with their snapshot.
+
+        :return: The futures of the started or already running refreshes.
+        """
+        watermark = self.watermark()
+        now = time.time()
+        futures = []
+        with self.lock:
+            for key, (api_key, read_at) in list(self.readers.items()):
+                if now - read_at > REFRESHER_IDLE_SECONDS:
+                    del self.readers[key]
+                    self.snapshots.pop(key, None)
+                    self.failures.pop(key, None)
+                    continue
+                snapshot = self.snapshots.get(key)
+                if snapshot is None or snapshot.watermark < watermark:
+                    futures.append(self._submit(key, api_key, watermark))
+            active = {key[:2] for key in self.readers}
+            for base_key in list(self.timeframes):
+                if base_key not in active:
+                    del self.timeframes[base_key]
+            symbols = {symbol_id for _, symbol_id in active}
+            for lock_key, base_lock in list(self.base_locks.items()):
+                if lock_key[0] not in symbols and not base_lock.locked():
+                    del self.base_locks[lock_key]
+        return futures
+
+    def stop(self) -> None:
+        """Stops the scheduler and waits for running refreshes."""
+        self.stopped.set()
+        self.wake.set()
+        self.executor.shutdown(wait=True)
@@ -0,0 +1,130 @@
+import logging
+import threading
+from typing import Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from constants import PERIOD_SECONDS
+from candle_store import CANDLE_COLUMNS, TIME_COLUMNS
+from data_retriever import DataRetriever
+from indicator_kernel import datetime_values
+from instrumentation import instrumented
+
+logging.basicConfig(level=logging.INFO)
+
+
+def period_ratio(period: str, base_period: str) -> int:
+    """
+    Number of base candles in one candle of the coarser period.
+
+    :raises ValueError: If the period is not a whole multiple of the base period.
+    """
+    ratio, remainder = divmod(PERIOD_SECONDS[period], PERIOD_SECONDS[base_period])
+    if remainder or not ratio:
+        raise ValueError(f"{period} candles cannot be derived from {base_period} candles")
+    return ratio
+
+
+def base_window(periods: list, base_period: str) -> int:
+    """
+    Number of base candles needed to derive DataRetriever.set_limit(period) candles of every period.
+
+    Each coarser candle takes ratio base candles, plus up to ratio - 1 more because the
+    oldest bucket is dropped when the history starts in the middle of it.
+    """
+    return max(
+        DataRetriever.set_limit(period) * period_ratio(period, base_period) + period_ratio(period, base_period) - 1
+        for period in periods
+    )
+
+
+def _utc(values: np.ndarray) -> pd.DatetimeIndex:
+    return pd.DatetimeIndex(values.view("datetime64[ns]")).tz_localize("UTC")
+
+
+@instrumented()
+def resample_candles(df: DataFrame, period: str, base_period: str = "1HRS", limit: Union[int, None] = None) -> DataFrame:
+    """
+    Derives candles of a coarser period from candles of a finer one with vectorized segment reductions.
+
+    Base candles are grouped into buckets aligned to the epoch, like CoinAPI's periods,
+    and each bucket is reduced with ufunc.reduceat: the first open, max high, min low,
+    last close, summed volume and trade count, min time_open and max time_close. The
+    oldest bucket is dropped if the history starts after its beginning, since it would
+    be incomplete; the newest one is kept like the still-open candle of the API.
+
+    :param df: Candles of base_period in any order.
+    :param period: The CoinAPI period identifier to derive, e.g. "4HRS".
+    :param base_period: The period of the given candles.
+    :param limit: Maximum number of candles to return, newest first. All candles if None.
+    :return: A data frame of the derived candles, newest first like the CoinAPI /latest endpoint.
+    :raises ValueError: If the period is not a whole multiple of the base period.
+    """
+    period_ratio(period, base_period)
+    if df.empty:
+        return DataFrame({col: df[col] for col in CANDLE_COLUMNS})
+
+    step = PERIOD_SECONDS[period] * 10 ** 9
+    starts = datetime_values(df["time_period_start"]).view("int64")
+    order = np.argsort(starts, kind="stable")
+    starts = starts[order]
+    buckets = starts // step
+
+    first = np.flatnonzero(np.diff(buckets, prepend=buckets[0] - 1))
+    if starts[0] != buckets[0] * step and len(first) > 1:
+        first = first[1:]
+    last = np.append(first[1:], len(starts)) - 1
+
+    def column(col, dtype):
+        return df[col].to_numpy(dtype=dtype)[order]
+
+    def times(col):
+        return datetime_values(df[col]).view("int64")[order]
+
+    count_dtype = "int64" if pd.api.types.is_integer_dtype(df["trades_count"]) else "float64"
+    derived = {
+        "time_period_start": buckets[first] * step,
+        "time_period_end": buckets[first] * step + step,
+        "time_open": np.minimum.reduceat(times("time_open"), first),
+        "time_close": np.maximum.reduceat(times("time_close"), first),
+        "price_open": column("price_open", "float64")[first],
+        "price_high": np.maximum.reduceat(column("price_high", "float64"), first),
+        "price_low": np.minimum.reduceat(column("price_low", "float64"), first),
+        "price_close": column("price_close", "float64")[last],
+        "volume_traded": np.add.reduceat(column("volume_traded", "float64"), first),
+        "trades_count": np.add.reduceat(column("trades_count", count_dtype), first),
+    }
+
+    newest = {col: derived[col][::-1][:limit] for col in CANDLE_COLUMNS}
+    return DataFrame({col: _utc(values) if col in TIME_COLUMNS else values for col, values in newest.items()})
+
+
+class TimeframeSet:
+    """
+    Candles of one base period and the coarser timeframes derived from it.
+
+    Each timeframe is derived once, on first request, and then shared; the base
+    candles and every derived frame must be treated as read-only.
+    """
+
+    def __init__(self, base: DataFrame, base_period: str = "1HRS"):
+        self.base = base
+        self.base_period = base_period
+        self.frames = {}
+        self.lock = threading.Lock()
+
+    def get(self, period: str, limit: Union[int, None] = None) -> DataFrame:
+        """
+        Returns the candles of a period, deriving them from the base candles the first time.
+
+        :param period: The CoinAPI period identifier, a whole multiple of the base period.
+        :param limit: Maximum number of candles to return, newest first, set_limit(period) if None.
+        :return: A data frame of candles, newest first.
+        """
+        key = (period, limit or DataRetriever.set_limit(period))
+        with self.lock:
+            if key not in self.frames:
+                self.frames[key] = resample_candles(self.base, period, self.base_period, key[1])
+                logging.info(f"Derived {len(self.frames[key])} {period} candles from {len(self.base)} {self.base_period} candles")
+            return self.frames[key]
@@ -0,0 +1,238 @@
+import logging
+from itertools import product
+from typing import Sequence, Union
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+
+from indicator_engine import _lfilter
+from indicator_kernel import STD_BLOCK_ROWS
+
+logging.basicConfig(level=logging.INFO)
+
+# Parameter names of each indicator family, in the order of the tuples in the grid.
+SWEEP_PARAMETERS = {
+    "rolling": ["window"],
+    "bollinger": ["window", "num_std"],
+    "rsi": ["period"],
+    "macd": ["fast", "slow", "signal"],
+}
+
+# Output columns of each indicator family, the last axis of its result array.
+SWEEP_OUTPUTS = {
+    "rolling": ["rolling_mean", "rolling_std"],
+    "bollinger": ["bollinger_upper", "bollinger_lower"],
+    "rsi": ["rsi"],
+    "macd": ["ema_fast", "ema_slow", "macd", "macd_signal"],
+}
+
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    """Cumulative sum with a leading 0, so the sum of values[i:j] is sums[j] - sums[i]."""
+    sums = np.empty(len(values) + 1)
+    sums[0] = 0.0
+    np.cumsum(values, out=sums[1:])
+    return sums
+
+
+def _rolling_means(values: np.ndarray, windows: Sequence[int], out: np.ndarray) -> None:
+    """Rolling means of every window from one cumulative sum, NaN for the first window - 1 rows."""
+    sums = _prefix_sums(values - values[0]) if len(values) else np.zeros(1)
+    for i, window in enumerate(windows):
+        out[i, :window - 1] = np.nan
+        if len(values) < window:
+            continue
+        np.subtract(sums[window:], sums[:-window], out=out[i, window - 1:])
+        out[i, window - 1:] /= window
+        out[i, window - 1:] += values[0]
+
+
+def _rolling_stds(values: np.ndarray, windows: Sequence[int], out: np.ndarray) -> None:
+    """
+    Rolling sample stds (ddof=1) of every window from shared cumulative sums of squares.
+
+    As in indicator_kernel, sums are accumulated per block of rows around the block mean;
+    each block is summed once for the longest window and every window reads its sums.
+    """
+    n = len(values)
+    longest = max(windows)
+    out[:] = np.nan
+    for start in range(0, n, STD_BLOCK_ROWS):
+        stop = min(start + STD_BLOCK_ROWS, n)
+        first = max(start - longest + 1, 0)
+        chunk = values[first:stop]
+        centered = chunk - chunk.mean()
+        sums = _prefix_sums(centered)
+        squares = _prefix_sums(centered * centered)
+        for i, window in enumerate(windows):
+            begin = max(start, window - 1)
+            if begin >= stop:
+                continue
+            ends = np.arange(begin - first + 1, stop - first + 1)
+            total = sums[ends] - sums[ends - window]
+            variance = (squares[ends] - squares[ends - window] - total * total / window) / (window - 1)
+            np.sqrt(np.maximum(variance, 0.0), out=out[i, begin:stop])
+
+    repeats = np.concatenate(([0], np.cumsum(values[1:] == values[:-1])))
+    for i, window in enumerate(windows):
+        if n < window:
+            continue
+        constant = repeats[window - 1:] - repeats[:n - window + 1] == window - 1
+        out[i, window - 1:][constant] = 0.0
+
+
+def _rolling_positive_means(values: np.ndarray, windows: Sequence[int], out: np.ndarray) -> None:
+    """Rolling means of non-negative values, exactly 0 for windows where every value is 0."""
+    _rolling_means(values, windows, out)
+    nonzero = _prefix_sums(values != 0)
+    for i, window in enumerate(windows):
+        if len(values) < window:
+            continue
+        out[i, window - 1:][nonzero[window:] == nonzero[:-window]] = 0.0
+
+
+def _ewms(series: np.ndarray, span: int) -> np.ndarray:
+    """
+    adjust=False exponentially weighted means of many series sharing one span.
+
+    All rows run through a single lfilter recursion along the time axis, each seeded
+    with its own first value.
+    """
+    alpha = 2 / (span + 1)
+    if not series.shape[-1]:
+        return series.copy()
+    result, _ = _lfilter([alpha], [1, alpha - 1], series, axis=-1, zi=(1 - alpha) * series[..., :1])
+    return result
+
+
+def parameter_grid(
+    windows: Sequence[int] = (20, 50, 200),
+    num_stds: Sequence[float] = (2,),
+    rsi_periods: Sequence[int] = (14,),
+    macd: Sequence[tuple] = ((12, 26, 9),),
+) -> dict:
+    """
+    Lists the parameter combinations of every indicator family, in the order of the sweep results.
+
+    :return: A dict of family name to a list of parameter tuples, see SWEEP_PARAMETERS.
+    """
+    return {
+        "rolling": [(window,) for window in windows],
+        "bollinger": list(product(windows, num_stds)),
+        "rsi": [(period,) for period in rsi_periods],
+        "macd": [tuple(spans) for spans in macd],
+    }
+
+
+def sweep(
+    price_close: Union[np.ndarray, pd.Series],
+    windows: Sequence[int] = (20, 50, 200),
+    num_stds: Sequence[float] = (2,),
+    rsi_periods: Sequence[int] = (14,),
+    macd: Sequence[tuple] = ((12, 26, 9),),
+    long_format: bool = False,
+) -> Union[dict, DataFrame]:
+    """
+    Evaluates a grid of indicator parameters over one close price series in a single pass.
+
+    Work is shared across the grid: one cumulative sum serves the rolling means of every
+    window (and, through them, every Bollinger band and RSI period), the block sums of
+    squares are computed once for the longest window, and each distinct EMA span is
+    computed once and reused by every MACD combination using it, with the signal lines of
+    one span filtered together. With the default grid the values equal those of
+    compute_indicator_arrays (the MarketDataCalculator settings).
+
+    Values are computed in the order of the series, like the indicator backends; pass
+    the candles oldest first to get chronological indicators.
+
+    :param price_close: Close prices.
+    :param windows: Rolling windows of the moving averages and Bollinger bands.
+    :param num_stds: Bollinger band widths in standard deviations.
+    :param rsi_periods: RSI periods.
+    :param macd: (fast, slow, signal) EMA spans of each MACD combination.
+    :param long_format: Return one tidy frame instead of a dict of arrays.
+    :return: A dict of family name to a (combinations, rows, outputs) float64 array, in the
+             order of parameter_grid and SWEEP_OUTPUTS, or a tidy frame with one row per
+             family, combination and candle, the parameter columns and one column per output.
+    """
+    close = np.ascontiguousarray(np.asarray(price_close, dtype="float64"))
+    n = len(close)
+    windows, rsi_periods = list(windows), list(rsi_periods)
+    grid = parameter_grid(windows, num_stds, rsi_periods, macd)
+    results = {family: np.empty((len(combinations), n, len(SWEEP_OUTPUTS[family]))) for family, combinations in grid.items()}
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if len(windows):
+            means = np.empty((len(windows), n))
+            stds = np.empty((len(windows), n))
+            _rolling_means(close, windows, means)
+            _rolling_stds(close, windows, stds)
+            results["rolling"][:, :, 0] = means
+            results["rolling"][:, :, 1] = stds
+            for i, (window, num_std) in enumerate(grid["bollinger"]):
+                j = windows.index(window)
+                np.multiply(stds[j], num_std, out=results["bollinger"][i, :, 0])
+                np.subtract(means[j], results["bollinger"][i, :, 0], out=results["bollinger"][i, :, 1])
+                results["bollinger"][i, :, 0] += means[j]
+
+        if len(rsi_periods):
+            delta = np.diff(close, prepend=close[:1])
+            avg_gain = np.empty((len(rsi_periods), n))
+            avg_loss = np.empty((len(rsi_periods), n))
+            _rolling_positive_means(np.maximum(delta, 0), rsi_periods, avg_gain)
+            _rolling_positive_means(np.maximum(-delta, 0), rsi_periods, avg_loss)
+            results["rsi"][:, :, 0] = 100 - 100 / (1 + avg_gain / avg_loss)
+
+        if len(macd):
+            spans = sorted({span for fast, slow, _ in grid["macd"] for span in (fast, slow)})
+            emas = {span: _ewms(close, span) for span in spans}
+            out = results["macd"]
+            for i, (fast, slow, _) in enumerate(grid["macd"]):
+                out[i, :, 0] = emas[fast]
+                out[i, :, 1] = emas[slow]
+                np.subtract(out[i, :, 0], out[i, :, 1], out=out[i, :, 2])
+            for signal in {combination[2] for combination in grid["macd"]}:
+                rows = [i for i, combination in enumerate(grid["macd"]) if combination[2] == signal]
+                out[rows, :, 3] = _ewms(out[rows, :, 2], signal)
+
+    logging.info(f"Swept {sum(len(combinations) for combinations in grid.values())} indicator combinations over {n} candles")
+    if not long_format:
+        return results
+    return to_frame(results, grid, getattr(price_close, "index", None))
+
+
+def to_frame(results: dict, grid: dict, index: Union[pd.Index, None] = None) -> DataFrame:
+    """
+    Converts sweep results to one tidy frame.
+
+    :param results: The dict returned by sweep.
+    :param grid: The parameter_grid the results were computed with.
+    :param index: Labels of the candles, their positions if None.
+    :return: A frame with an indicator column, one column per parameter (empty where a
+             family does not use it), a row column with the candle label and one column
+             per output (empty where a family does not produce it).
+    """
+    parameters = list(dict.fromkeys(name for names in SWEEP_PARAMETERS.values() for name in names))
+    frames = []
+    for family, values in results.items():
+        combinations, n, _ = values.shape
+        if not combinations:
+            continue
+        labels = np.arange(n) if index is None else np.asarray(index)
+        columns = {"indicator": np.full(combinations * n, family, dtype=object)}
+        for name in parameters:
+            if name in SWEEP_PARAMETERS[family]:
+                position = SWEEP_PARAMETERS[family].index(name)
+                columns[name] = np.repeat([combination[position] for combination in grid[family]], n)
+        columns["row"] = np.tile(labels, combinations)
+        for k, output in enumerate(SWEEP_OUTPUTS[family]):
+            columns[output] = values[:, :, k].ravel()
+        frames.append(DataFrame(columns))
+    if not frames:
+        return DataFrame()
+    frame = pd.concat(frames, ignore_index=True)
+    present = [name for name in parameters if name in frame.columns]
+    for name in present:
+        if name != "num_std":
+            frame[name] = frame[name].astype("Int64")
+    return frame[["indicator"] + present + [col for col in frame.columns if col not in present and col != "indicator"]]
@@ -0,0 +1,178 @@
+"""
+AsyncDataRetriever, and the store backfill using it, against a local stub of the CoinAPI endpoints.
+
+    python -m pytest tests
+    python -m unittest discover tests
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+import aiohttp
+import pandas as pd
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from async_retriever import AsyncDataRetriever, TokenBucket  # noqa: E402
+from candle_store import CandleStore  # noqa: E402
+from constants import COIN_API_BASE_URL, COIN_API_HISTORY_PATH, COIN_API_OHLCV_ENDPOINT  # noqa: E402
+from data_retriever import DataRetriever  # noqa: E402
+
+SYMBOL_ID = "STUB_SPOT_BTC_USD"
+
+
+def candle(start: pd.Timestamp) -> dict:
+    end = start + pd.Timedelta(hours=1)
+    return {
+        "time_period_start": start.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+        "time_period_end": end.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+        "time_open": start.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+        "time_close": end.strftime("%Y-%m-%dT%H:%M:%S.0000000Z"),
+        "price_open": 1.0, "price_high": 1.0, "price_low": 1.0, "price_close": 1.0,
+        "volume_traded": 1.0, "trades_count": 1,
+    }
+
+
+class StubServer:
+    """
+    Serves hourly candles for any range; responses listed in `failures` are sent first, one per request.
+
+    The /latest endpoint serves the candles up to the current hour, newest first.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.latest_requests = []
+        self.failures = []
+        self.headers = {}
+
+    async def history(self, request: web.Request) -> web.Response:
+        self.requests.append(dict(request.query))
+        if self.failures:
+            status, headers = self.failures.pop(0)
+            return web.Response(status=status, headers=headers)
+        start = pd.Timestamp(request.query["time_start"], tz="UTC")
+        end = pd.Timestamp(request.query["time_end"], tz="UTC")
+        records = [candle(t) for t in pd.date_range(start, end, freq="1h", inclusive="left")]
+        return web.json_response(records[:int(request.query["limit"])], headers=self.headers)
+
+    async def latest(self, request: web.Request) -> web.Response:
+        self.latest_requests.append(dict(request.query))
+        now = pd.Timestamp.now(tz="UTC").floor("h")
+        limit = int(request.query["limit"])
+        return web.json_response([candle(now - pd.Timedelta(hours=i)) for i in range(limit)])
+
+    async def __aenter__(self) -> str:
+        app = web.Application()
+        app.router.add_get(COIN_API_HISTORY_PATH.format(symbol_id=SYMBOL_ID), self.history)
+        app.router.add_get(COIN_API_OHLCV_ENDPOINT.format(symbol_id=SYMBOL_ID)[len(COIN_API_BASE_URL):], self.latest)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        return f"http://127.0.0.1:{self.runner.addresses[0][1]}"
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.runner.cleanup()
+
+
+class AsyncRetrieverTest(unittest.IsolatedAsyncioTestCase):
+    async def test_history_is_split_into_pages_and_merged(self):
+        stub = StubServer()
+        async with stub as url:
+            async with AsyncDataRetriever("key", base_url=url, page_limit=100, requests_per_second=100) as retriever:
+                records = await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-01", "2023-01-11 12:00")
+
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual([r["time_start"] for r in stub.requests], sorted(r["time_start"] for r in stub.requests))
+        self.assertEqual(len(records), 252)
+        starts = [r["time_period_start"] for r in records]
+        self.assertEqual(starts, sorted(set(starts)))
+
+    async def test_retries_rate_limits_and_server_errors(self):
+        stub = StubServer()
+        stub.failures = [(429, {"Retry-After": "0"}), (503, {})]
+        async with stub as url:
+            async with AsyncDataRetriever("key", base_url=url, backoff=0.01, requests_per_second=100) as retriever:
+                records = await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-01", "2023-01-01 05:00")
+
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual(len(records), 5)
+
+    async def test_gives_up_after_the_last_retry(self):
+        stub = StubServer()
+        stub.failures = [(500, {})] * 3
+        async with stub as url:
+            async with AsyncDataRetriever("key", base_url=url, backoff=0.01, retries=2, requests_per_second=100) as retriever:
+                with self.assertRaises(aiohttp.ClientError):
+                    await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-01", "2023-01-01 05:00")
+        self.assertEqual(len(stub.requests), 3)
+
+    async def test_client_errors_are_not_retried(self):
+        stub = StubServer()
+        stub.failures = [(401, {})]
+        async with stub as url:
+            async with AsyncDataRetriever("key", base_url=url, backoff=0.01, requests_per_second=100) as retriever:
+                with self.assertRaises(aiohttp.ClientResponseError):
+                    await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-01", "2023-01-01 05:00")
+        self.assertEqual(len(stub.requests), 1)
+
+    async def test_token_bucket_limits_the_request_rate(self):
+        stub = StubServer()
+        async with stub as url:
+            async with AsyncDataRetriever("key", base_url=url, page_limit=10, requests_per_second=20) as retriever:
+                started = time.monotonic()
+                await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-01", "2023-01-13 12:00")
+                elapsed = time.monotonic() - started
+
+        # 30 pages with a burst capacity of 20 tokens refilled at 20 per second.
+        self.assertEqual(len(stub.requests), 30)
+        self.assertGreaterEqual(elapsed, (30 - 20) / 20 * 0.9)
+
+    async def test_exhausted_quota_waits_for_the_reset(self):
+        stub = StubServer()
+        reset = (pd.Timestamp.now(tz="UTC") + pd.Timedelta(seconds=0.5)).isoformat()
+        stub.headers = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": reset}
+        async with stub as url:
+            async with AsyncDataRetriever("key", base_url=url, page_limit=24, requests_per_second=100) as retriever:
+                started = time.monotonic()
+                await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-01", "2023-01-01 23:00")
+                await retriever.retrieve_history(SYMBOL_ID, "1HRS", "2023-01-02", "2023-01-02 23:00")
+                elapsed = time.monotonic() - started
+
+        self.assertEqual(len(stub.requests), 2)
+        self.assertGreaterEqual(elapsed, 0.3)
+
+    async def test_deep_windows_are_backfilled_from_history_pages(self):
+        stub = StubServer()
+        store = tempfile.TemporaryDirectory()
+        self.addCleanup(store.cleanup)
+        async with stub as url:
+            endpoint = url + COIN_API_OHLCV_ENDPOINT.format(symbol_id=SYMBOL_ID)[len(COIN_API_BASE_URL):]
+            with mock.patch("data_retriever.ASYNC_BACKFILL_MIN_ROWS", 100):
+                # The blocking retriever runs off the loop serving the stub.
+                df = await asyncio.to_thread(
+                    DataRetriever.retrieve_incremental, endpoint, "1HRS", {"X-CoinAPI-Key": "key"},
+                    CandleStore(store.name, SYMBOL_ID), 2500,
+                )
+
+        self.assertEqual(len(stub.requests), 3)
+        self.assertEqual([r["limit"] for r in stub.latest_requests], ["2"])
+        self.assertEqual(len(df), 2500)
+        self.assertEqual(df["time_period_start"].iloc[0], pd.Timestamp.now(tz="UTC").floor("h"))
+        self.assertTrue((df["time_period_start"].diff().iloc[1:] == -pd.Timedelta(hours=1)).all())
+
+    async def test_bucket_refills_at_its_rate(self):
+        bucket = TokenBucket(rate=50, capacity=1)
+        started = time.monotonic()
+        for _ in range(6):
+            await bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - started, 5 / 50 * 0.9)
+
+
+if __name__ == "__main__":
+    unittest.main()
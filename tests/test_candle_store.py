@@ -0,0 +1,68 @@
+"""
+CandleStore merges, including concurrent writers of one symbol and period.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+from candle_store import CANDLE_COLUMNS, CandleStore  # noqa: E402
+
+
+class CandleStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        self.candles = synthetic_frame(1000)
+
+    def assert_consistent(self, store, rows):
+        arrays = store.load_arrays("1HRS")
+        self.assertIsNotNone(arrays)
+        starts = np.asarray(arrays["time_period_start"])
+        self.assertEqual(len(starts), rows)
+        self.assertTrue(np.all(np.diff(starts) > 0))
+        # Rows line up across the column files: every end is one period after its start.
+        self.assertTrue(np.all(np.asarray(arrays["time_period_end"]) - starts == 3600 * 10 ** 9))
+        self.assertEqual(sorted(arrays), sorted(CANDLE_COLUMNS))
+
+    def test_merge_replaces_candles_with_the_same_start(self):
+        store = CandleStore(self.root.name, "S")
+        store.merge("1HRS", self.candles.iloc[100:])
+        latest = self.candles.iloc[:101].copy()
+        latest["price_close"] = 1.0
+        merged = store.merge("1HRS", latest, limit=101)
+
+        self.assert_consistent(store, 1000)
+        self.assertTrue((merged["price_close"] == 1.0).all())
+        self.assertTrue(merged["time_period_start"].equals(self.candles["time_period_start"].iloc[:101]))
+
+    def test_concurrent_merges_keep_the_columns_aligned(self):
+        errors = []
+
+        def merge(i):
+            try:
+                CandleStore(self.root.name, "S").merge("1HRS", self.candles.iloc[i * 200:(i + 1) * 200 + 20])
+            except Exception as e:
+                errors.append(e)
+
+        for _ in range(3):
+            threads = [threading.Thread(target=merge, args=(i,)) for i in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(errors, [])
+        self.assert_consistent(CandleStore(self.root.name, "S"), 1000)
+        self.assertEqual([name for name in os.listdir(os.path.join(self.root.name, "S", "1HRS")) if name.endswith(".tmp")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+"""
+The compact frame layout against its accuracy contract.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+from compact import (  # noqa: E402
+    COMPACT_ATTR, FLOAT32_ATOL, FLOAT32_RTOL, accuracy_problems, compact_frame, expand_frame, is_compact,
+    select_rows, time_bounds,
+)
+from downsample import select_range  # noqa: E402
+import pipeline  # noqa: E402
+
+
+def analyzed(rows: int = 1500) -> pd.DataFrame:
+    # Without a period the forecast bypasses the model registry.
+    return pipeline.analyze(synthetic_frame(rows))
+
+
+class CompactFrameTest(unittest.TestCase):
+    def setUp(self):
+        self.frame = analyzed()
+
+    def assert_contract(self, frame, **kwargs):
+        compacted = compact_frame(frame, **kwargs)
+        self.assertTrue(is_compact(compacted))
+        self.assertEqual(accuracy_problems(frame, compacted), [])
+        return compacted
+
+    def test_round_trip_within_the_contract(self):
+        for calendar in ("narrow", "recompute"):
+            with self.subTest(calendar=calendar):
+                compacted = self.assert_contract(self.frame, period="1HRS", calendar=calendar)
+                self.assertLess(compacted.memory_usage(index=False).sum(), 0.65 * self.frame.memory_usage(index=False).sum())
+                expanded = expand_frame(compacted)
+                self.assertEqual(list(expanded.columns), list(self.frame.columns))
+                self.assertTrue(expanded.index.equals(self.frame.index))
+                for col in ["price_close", "volume_traded", "trades_count", "time_period_start", "time_period_end", "hour", "year"]:
+                    np.testing.assert_array_equal(expanded[col].to_numpy(), self.frame[col].to_numpy())
+
+    def test_float32_bound(self):
+        expanded = expand_frame(compact_frame(self.frame, "1HRS"))
+        for col in ["vwap", "rsi", "macd", "rolling_std"]:
+            expected = self.frame[col].to_numpy()
+            finite = np.isfinite(expected)
+            bound = FLOAT32_RTOL * np.abs(expected[finite]) + FLOAT32_ATOL
+            self.assertTrue(np.all(np.abs(expanded[col].to_numpy()[finite] - expected[finite]) <= bound), col)
+
+    def test_special_values(self):
+        frame = self.frame.copy()
+        frame.loc[5, "rsi"] = np.inf
+        frame.loc[6, "rsi"] = -np.inf
+        frame.loc[7, "macd"] = 1e-42  # subnormal in float32
+        frame.loc[8, "time_open"] = pd.NaT
+        frame.loc[9, "time_close"] = frame.loc[9, "time_close"] + pd.Timedelta(microseconds=1234)
+        compacted = self.assert_contract(frame, period="1HRS")
+        expanded = expand_frame(compacted)
+        self.assertEqual(expanded.loc[5, "rsi"], np.inf)
+        self.assertTrue(pd.isna(expanded.loc[8, "time_open"]))
+
+    def test_period_is_inferred_and_off_grid_starts_are_kept(self):
+        compacted = self.assert_contract(self.frame)
+        self.assertEqual(compacted.attrs[COMPACT_ATTR]["step_ns"], 3600 * 10 ** 9)
+
+        frame = self.frame.copy()
+        frame.loc[10, "time_period_start"] += pd.Timedelta(minutes=1)
+        compacted = self.assert_contract(frame, period="1HRS")
+        self.assertIsNone(compacted.attrs[COMPACT_ATTR]["epoch_ns"])
+
+    def test_compacting_twice_and_expanding_plain_frames(self):
+        compacted = compact_frame(self.frame, "1HRS")
+        self.assertIs(compact_frame(compacted, "1HRS"), compacted)
+        self.assertIs(expand_frame(self.frame), self.frame)
+        with self.assertRaises(ValueError):
+            compact_frame(self.frame, calendar="wide")
+
+    def test_bounds_and_selection_without_expanding(self):
+        compacted = compact_frame(self.frame, "1HRS")
+        starts = self.frame["time_period_start"]
+        self.assertEqual(time_bounds(compacted), (starts.min(), starts.max()))
+        self.assertEqual(time_bounds(self.frame), (starts.min(), starts.max()))
+
+        start, end = starts.min() + pd.Timedelta(days=10), starts.max() - pd.Timedelta(days=3)
+        selected = select_rows(compacted, start.to_pydatetime(), end.to_pydatetime())
+        self.assertTrue(is_compact(selected))
+        pd.testing.assert_frame_equal(expand_frame(selected), expand_frame(compacted).pipe(select_range, start, end))
+        pd.testing.assert_frame_equal(select_rows(self.frame, start, end), select_range(self.frame, start, end))
+
+
+if __name__ == "__main__":
+    unittest.main()
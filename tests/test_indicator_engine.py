@@ -0,0 +1,86 @@
+"""
+StreamingIndicatorEngine against the batch MarketDataCalculator pipeline.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+from indicator_engine import INDICATOR_COLUMNS, StreamingIndicatorEngine  # noqa: E402
+import pipeline  # noqa: E402
+
+# The tolerance documented by StreamingIndicatorEngine.
+RTOL = ATOL = 1e-9
+
+
+def chronological_candles(rows: int, seed: int = 0):
+    """Synthetic candles oldest first, with a flat stretch exercising the constant-window paths."""
+    df = synthetic_frame(rows, seed=seed).iloc[::-1].reset_index(drop=True)
+    flat = slice(rows // 2, rows // 2 + 60)
+    for col in ["price_open", "price_high", "price_low", "price_close"]:
+        df.loc[flat, col] = 27000.0
+    return df
+
+
+def reference(df):
+    return pipeline.apply_market_calculations(df.copy(), pipeline.MARKET_CALCULATIONS)[INDICATOR_COLUMNS]
+
+
+class StreamingIndicatorEngineTest(unittest.TestCase):
+    def setUp(self):
+        # Long enough for the rolling sums of every window to be rebuilt several times.
+        self.candles = chronological_candles(900)
+        self.expected = reference(self.candles).to_numpy()
+
+    def assert_matches(self, actual, expected):
+        np.testing.assert_allclose(np.asarray(actual, dtype="float64"), expected, rtol=RTOL, atol=ATOL, equal_nan=True)
+
+    def test_update_frame_matches_the_batch_pipeline(self):
+        actual = StreamingIndicatorEngine().update_frame(self.candles)
+        self.assertEqual(list(actual.columns), INDICATOR_COLUMNS)
+        self.assert_matches(actual.to_numpy(), self.expected)
+
+    def test_replacing_the_last_candle_matches_the_final_candles(self):
+        engine = StreamingIndicatorEngine()
+        rows = []
+        for candle in self.candles.to_dict("records"):
+            # The open candle is updated a few times before it closes with its final values.
+            for scale in (0.99, 1.02):
+                partial = dict(candle, price_close=candle["price_close"] * scale, volume_traded=candle["volume_traded"] / 2)
+                engine.update(partial, replace_last=scale != 0.99)
+            rows.append([engine.update(candle, replace_last=True)[col] for col in INDICATOR_COLUMNS])
+        self.assert_matches(rows, self.expected)
+
+    def test_from_history_continues_like_a_full_stream(self):
+        for split in (1, 13, 199, 200, 450):
+            engine = StreamingIndicatorEngine.from_history(self.candles.iloc[:split])
+            self.assertEqual(engine.count, split)
+            actual = engine.update_frame(self.candles.iloc[split:])
+            self.assert_matches(actual.to_numpy(), self.expected[split:])
+
+    def test_from_history_state_can_replace_its_last_candle(self):
+        engine = StreamingIndicatorEngine.from_history(self.candles.iloc[:300])
+        engine.update(self.candles.iloc[300].to_dict())
+        engine.update(dict(self.candles.iloc[300].to_dict(), price_close=1.0), replace_last=True)
+        values = engine.update(self.candles.iloc[300].to_dict(), replace_last=True)
+        self.assert_matches([values[col] for col in INDICATOR_COLUMNS], self.expected[300])
+
+    def test_copies_are_independent(self):
+        engine = StreamingIndicatorEngine.from_history(self.candles.iloc[:400])
+        branch = engine.copy()
+        branch.update_frame(self.candles.iloc[400:500])
+        actual = engine.update_frame(self.candles.iloc[400:])
+        self.assert_matches(actual.to_numpy(), self.expected[400:])
+
+    def test_nothing_to_replace(self):
+        with self.assertRaises(ValueError):
+            StreamingIndicatorEngine().update(self.candles.iloc[0].to_dict(), replace_last=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
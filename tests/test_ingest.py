@@ -0,0 +1,109 @@
+"""
+parse_candles and its vectorized timestamp fast path, against pandas parsing.
+
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_candles  # noqa: E402
+from candle_store import TIME_COLUMNS  # noqa: E402
+from constants import INGEST_CHUNK_ROWS  # noqa: E402
+from ingest import parse_candles, parse_timestamps  # noqa: E402
+
+
+def expected_times(values) -> np.ndarray:
+    index = pd.DatetimeIndex(pd.to_datetime(list(values), utc=True, format="ISO8601"))
+    return index.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+
+
+def records(rows: int) -> list:
+    return json.loads(synthetic_candles(rows))
+
+
+class ParseTimestampsTest(unittest.TestCase):
+    def assert_parsed(self, values):
+        np.testing.assert_array_equal(parse_timestamps(values), expected_times(values))
+
+    def test_fixed_format(self):
+        self.assert_parsed(["2023-09-20T12:00:00.0000000Z", "2024-02-29T23:59:59.9999999Z", "1999-01-01T00:00:00.1234567Z"])
+
+    def test_other_fraction_lengths(self):
+        for value in ["2023-09-20T12:00:00Z", "2023-09-20T12:00:00.5Z", "2023-09-20T12:00:00.123Z",
+                      "2023-09-20T12:00:00.123456Z", "2023-09-20T12:00:00.12345678Z", "2023-09-20T12:00:00.123456789Z"]:
+            with self.subTest(value=value):
+                self.assert_parsed([value, "2023-09-20T12:00:00.0000000Z"])
+
+    def test_missing_or_other_time_zone(self):
+        for value in ["2023-09-20T12:00:00.1234567", "2023-09-20T12:00:00.1234567+00:00", "2023-09-20T14:00:00.1234567+02:00"]:
+            with self.subTest(value=value):
+                self.assert_parsed([value, "2023-09-20T12:00:00.0000000Z"])
+
+    def test_mixed_formats(self):
+        self.assert_parsed(["2023-09-20T12:00:00.0000000Z", "2023-09-20T13:00:00Z", "2023-09-20T14:00:00.5000000Z", "2023-09-20 15:00:00"])
+
+    def test_invalid_dates_are_rejected(self):
+        with self.assertRaises(ValueError):
+            parse_timestamps(["2023-02-30T12:00:00.0000000Z"])
+        with self.assertRaises(ValueError):
+            parse_timestamps(["2023-09-20T12:00:00.00000x0Z"])
+        with self.assertRaises(ValueError):
+            # Valid in its first 28 characters, which the fast path must not parse alone.
+            parse_timestamps(["2023-09-20T12:00:00.0000000Z0"])
+
+    def test_empty(self):
+        self.assertEqual(parse_timestamps([]).dtype, np.dtype("datetime64[ns]"))
+
+
+class ParseCandlesTest(unittest.TestCase):
+    def assert_frame(self, df, candles):
+        self.assertEqual(len(df), len(candles))
+        for col in TIME_COLUMNS:
+            np.testing.assert_array_equal(
+                df[col].dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[ns]"),
+                expected_times([candle[col] for candle in candles]),
+            )
+        for col in ["price_open", "price_high", "price_low", "price_close", "volume_traded", "trades_count"]:
+            np.testing.assert_array_equal(df[col].to_numpy(), np.array([candle[col] for candle in candles]))
+
+    def test_chunk_boundaries(self):
+        candles = records(40)
+        for chunk_rows in (1, 7, 20, 39, 40, 41):
+            with self.subTest(chunk_rows=chunk_rows):
+                df = parse_candles(json.dumps(candles), chunk_rows=chunk_rows)
+                self.assert_frame(df, candles)
+                self.assertEqual(list(df.index), list(range(40)))
+                self.assertEqual(df["trades_count"].dtype, np.dtype("int64"))
+
+    def test_default_chunk_boundary(self):
+        payload = synthetic_candles(INGEST_CHUNK_ROWS + 1)
+        df = parse_candles(payload)
+        self.assert_frame(df.iloc[INGEST_CHUNK_ROWS - 1:], json.loads(payload)[INGEST_CHUNK_ROWS - 1:])
+
+    def test_chunks_in_other_formats_fall_back(self):
+        candles = records(30)
+        # The second chunk has millisecond times, the third mixes them with the CoinAPI format.
+        for i in range(10, 25):
+            candles[i]["time_open"] = candles[i]["time_open"].replace(".0000000Z", ".123Z")
+        for i in range(20, 30, 3):
+            candles[i]["time_close"] = candles[i]["time_close"].replace(".0000000Z", "Z")
+        self.assert_frame(parse_candles(json.dumps(candles), chunk_rows=10), candles)
+
+    def test_empty_array(self):
+        self.assertTrue(parse_candles(b" [ ] ").empty)
+
+    def test_unexpected_payloads(self):
+        for payload in [b'{"error": "Invalid API key"}', b"[1, 2]", b'[{"a": 1} {"a": 2}]', b"not json"]:
+            with self.subTest(payload=payload):
+                with self.assertRaises(ValueError):
+                    parse_candles(payload)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+The contract shared by the "copy" and "in_place" modes of pipeline.analyze.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+import pipeline  # noqa: E402
+
+MODES = ("copy", "in_place")
+
+
+class AnalyzeModesTest(unittest.TestCase):
+    def test_empty_candles_give_the_same_empty_frame(self):
+        results = {mode: pipeline.analyze(synthetic_frame(10).iloc[:0], mode=mode) for mode in MODES}
+        for mode, result in results.items():
+            with self.subTest(mode=mode):
+                self.assertTrue(result.empty)
+        pd.testing.assert_frame_equal(results["copy"], results["in_place"])
+
+        full = pipeline.analyze(synthetic_frame(300), mode="copy")
+        self.assertEqual(list(results["copy"].columns), list(full.columns))
+        self.assertEqual(dict(results["copy"].dtypes), dict(full.dtypes))
+
+    def test_invalid_arguments_are_rejected_for_empty_candles_too(self):
+        for rows in (0, 300):
+            for mode in MODES:
+                with self.subTest(rows=rows, mode=mode):
+                    with self.assertRaises(ValueError):
+                        pipeline.analyze(synthetic_frame(300).iloc[:rows], mode=mode, horizon=0)
+            with self.assertRaises(ValueError):
+                pipeline.analyze(synthetic_frame(300).iloc[:rows], mode="lazy")
+
+    def test_modes_return_the_same_columns_and_rows(self):
+        for horizon in (1, 24):
+            results = {mode: pipeline.analyze(synthetic_frame(300), mode=mode, horizon=horizon) for mode in MODES}
+            with self.subTest(horizon=horizon):
+                self.assertEqual(list(results["copy"].columns), list(results["in_place"].columns))
+                self.assertEqual(len(results["copy"]), 300 + horizon)
+                self.assertEqual(len(results["in_place"]), 300 + horizon)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+The multi-output forecast of prediction.forecast_columns against the per-column regressions it replaced.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+from indicator_kernel import compute_indicators  # noqa: E402
+from model_registry import ModelRegistry  # noqa: E402
+import prediction  # noqa: E402
+
+# The documented agreement with the per-column loop.
+RTOL = 1e-10
+
+
+def analyzed(rows: int = 2000) -> pd.DataFrame:
+    return prediction.prepare_data_for_regression(compute_indicators(synthetic_frame(rows)))
+
+
+def per_column_forecast(df: pd.DataFrame, future_df: pd.DataFrame, col: str) -> np.ndarray:
+    """The forecast_column loop body before the multi-output fit: one regression per column."""
+    X = df[prediction.FEATURE_COLUMNS]
+    y = df[col].fillna(df[col].mean())
+    n_train = prediction.training_rows(len(X))
+    model = LinearRegression().fit(X[:n_train], y[:n_train])
+    return model.predict(future_df[prediction.FEATURE_COLUMNS])
+
+
+class ForecastColumnsTest(unittest.TestCase):
+    def setUp(self):
+        self.df = analyzed()
+        self.future_df = prediction.create_future_dataframe(self.df["time_period_start"].max(), "1HRS")
+
+    def assert_forecasts(self, future_df, cols):
+        scale = {col: np.abs(self.df[col]).max() for col in cols}
+        for col in cols:
+            with self.subTest(column=col):
+                expected = per_column_forecast(self.df, self.future_df, col)
+                np.testing.assert_allclose(future_df[col].to_numpy(), expected, rtol=RTOL, atol=RTOL * scale[col])
+
+    def test_matches_the_per_column_regressions(self):
+        future_df = self.future_df.copy()
+        prediction.forecast_columns(self.df, future_df, prediction.FORECAST_COLUMNS)
+        self.assert_forecasts(future_df, prediction.FORECAST_COLUMNS)
+
+    def test_single_column_wrapper(self):
+        future_df = self.future_df.copy()
+        prediction.forecast_column(self.df, future_df, "price_close")
+        self.assert_forecasts(future_df, ["price_close"])
+        self.assertNotIn("volume_traded", future_df)
+
+    def test_unusable_columns_are_skipped_alone(self):
+        self.df["rsi"] = self.df["rsi"].where(self.df.index % 7 != 0)  # NaN is filled with the mean
+        self.df.loc[3, "trade_velocity"] = np.inf
+        future_df = self.future_df.copy()
+        with self.assertLogs(level="ERROR"):
+            prediction.forecast_columns(self.df, future_df, ["price_close", "missing", "trade_velocity", "rsi"])
+
+        self.assertNotIn("missing", future_df)
+        self.assertNotIn("trade_velocity", future_df)
+        self.assert_forecasts(future_df, ["price_close", "rsi"])
+
+    def test_registry_reuses_models_with_the_same_forecast(self):
+        root = tempfile.TemporaryDirectory()
+        self.addCleanup(root.cleanup)
+        registry = ModelRegistry(root.name)
+        for _ in range(2):
+            future_df = self.future_df.copy()
+            with self.assertLogs(level="INFO") as logs:
+                prediction.forecast_columns(self.df, future_df, prediction.FORECAST_COLUMNS, registry, "TEST", "1HRS")
+            self.assert_forecasts(future_df, prediction.FORECAST_COLUMNS)
+        # The second run reused every model fitted by the first.
+        self.assertIn(f"refitted for 0 of {len(prediction.FORECAST_COLUMNS)} columns", logs.output[-1])
+
+
+if __name__ == "__main__":
+    unittest.main()
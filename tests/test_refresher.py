@@ -0,0 +1,86 @@
+"""
+Refresher scheduling and locking, with the fetch and the pipeline replaced by fakes.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+from refresher import Refresher  # noqa: E402
+
+SYMBOL_ID = "STUB_SPOT_BTC_USD"
+
+
+class FakeFetch:
+    """Stands in for pipeline.fetch_timeframes and records how many fetches of a symbol overlap."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.overlap = 0
+        self.calls = 0
+
+    def __call__(self, api_key, periods, symbol_id):
+        with self.lock:
+            self.calls += 1
+            self.running += 1
+            self.overlap = max(self.overlap, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        return {period: synthetic_frame(50) for period in periods}
+
+
+class RefresherTest(unittest.TestCase):
+    def setUp(self):
+        self.fetch = FakeFetch()
+        patches = [
+            mock.patch("pipeline.fetch_timeframes", self.fetch),
+            mock.patch("pipeline.analyze", lambda candles, period, symbol_id: candles),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.refresher = Refresher(periods=["1HRS"], max_workers=4)
+        self.addCleanup(self.refresher.stop)
+
+    def test_keys_fetch_one_symbol_one_at_a_time(self):
+        threads = [
+            threading.Thread(target=self.refresher.get, args=(f"key-{i}", "1HRS", SYMBOL_ID))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Snapshots stay per key, but the fetches (and candle store merges) of the symbol never overlap.
+        self.assertEqual(self.fetch.calls, 4)
+        self.assertEqual(self.fetch.overlap, 1)
+        self.assertEqual(len(self.refresher.snapshots), 4)
+        self.assertEqual(list(self.refresher.base_locks), [(SYMBOL_ID, "1HRS")])
+
+    def test_idle_series_drop_their_base_locks(self):
+        self.refresher.get("key", "1HRS", SYMBOL_ID)
+        self.refresher.get("key", "1HRS", "OTHER_SPOT_BTC_USD")
+        self.assertEqual(len(self.refresher.base_locks), 2)
+
+        with self.refresher.lock:
+            for key, (api_key, _) in list(self.refresher.readers.items()):
+                if key[1] == SYMBOL_ID:
+                    self.refresher.readers[key] = (api_key, 0.0)
+        self.refresher.refresh_due()
+
+        self.assertEqual(list(self.refresher.base_locks), [("OTHER_SPOT_BTC_USD", "1HRS")])
+        self.assertEqual({key[1] for key in self.refresher.snapshots}, {"OTHER_SPOT_BTC_USD"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+resample_candles against a pandas groupby over epoch-aligned buckets.
+
+    python -m pytest tests
+"""
+import os
+import sys
+import unittest
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import synthetic_frame  # noqa: E402
+from candle_store import CANDLE_COLUMNS  # noqa: E402
+from constants import PERIOD_SECONDS  # noqa: E402
+from resample import resample_candles  # noqa: E402
+
+AGGREGATIONS = {
+    "time_open": "min", "time_close": "max", "price_open": "first", "price_high": "max",
+    "price_low": "min", "price_close": "last", "volume_traded": "sum", "trades_count": "sum",
+}
+
+
+def reference(df: pd.DataFrame, period: str) -> pd.DataFrame:
+    """Groups the candles by epoch-aligned bucket, dropping the oldest bucket if the history starts inside it."""
+    step = pd.Timedelta(seconds=PERIOD_SECONDS[period])
+    df = df.sort_values("time_period_start", kind="stable")
+    buckets = df["time_period_start"].dt.floor(step)
+    derived = df.groupby(buckets).agg(AGGREGATIONS)
+    if df["time_period_start"].iloc[0] != buckets.iloc[0] and len(derived) > 1:
+        derived = derived.iloc[1:]
+    derived = derived.rename_axis("time_period_start").reset_index()
+    derived["time_period_end"] = derived["time_period_start"] + step
+    return derived[CANDLE_COLUMNS].iloc[::-1].reset_index(drop=True)
+
+
+class ResampleCandlesTest(unittest.TestCase):
+    def assert_matches(self, df, period, limit=None):
+        expected = reference(df, period).iloc[:limit].reset_index(drop=True)
+        pd.testing.assert_frame_equal(resample_candles(df, period, "1HRS", limit), expected, check_exact=False, rtol=1e-12)
+
+    def test_aligned_history(self):
+        # The newest candle starts at 23:00, so the oldest of 480 hourly candles starts at midnight.
+        df = synthetic_frame(480, end="2023-09-20T23:00:00")
+        for period in ("4HRS", "12HRS", "1DAY"):
+            with self.subTest(period=period):
+                self.assert_matches(df, period)
+
+    def test_partial_oldest_and_newest_buckets_in_any_order(self):
+        df = synthetic_frame(483, end="2023-09-20T13:00:00")
+        shuffled = df.sample(frac=1, random_state=0)
+        for period in ("4HRS", "12HRS", "1DAY"):
+            with self.subTest(period=period):
+                result = resample_candles(shuffled, period, "1HRS")
+                self.assert_matches(shuffled, period)
+                # The oldest bucket is dropped as incomplete, the newest kept like an open candle.
+                self.assertGreater(result["time_period_start"].iloc[-1], df["time_period_start"].min())
+                self.assertEqual(result["time_period_start"].iloc[0], df["time_period_start"].max().floor(f"{PERIOD_SECONDS[period]}s"))
+
+    def test_gaps(self):
+        df = synthetic_frame(600, end="2023-09-20T23:00:00")
+        rng = np.random.default_rng(1)
+        keep = rng.random(len(df)) > 0.3
+        keep[100:130] = False  # whole buckets missing
+        for period in ("4HRS", "12HRS"):
+            with self.subTest(period=period):
+                self.assert_matches(df[keep], period)
+                # A history starting with a gap inside its oldest bucket.
+                self.assert_matches(df[keep].iloc[:-2], period)
+
+    def test_limit_and_single_partial_bucket(self):
+        df = synthetic_frame(480, end="2023-09-20T23:00:00")
+        self.assert_matches(df, "4HRS", limit=25)
+        self.assert_matches(synthetic_frame(3, end="2023-09-20T10:00:00"), "12HRS")
+
+    def test_float_trade_counts(self):
+        df = synthetic_frame(100, end="2023-09-20T23:00:00")
+        df["trades_count"] = df["trades_count"].astype("float64")
+        df.loc[5, "trades_count"] = np.nan
+        result = resample_candles(df, "4HRS", "1HRS")
+        self.assertEqual(result["trades_count"].dtype, np.dtype("float64"))
+        self.assertTrue(np.isnan(result["trades_count"]).any())
+
+    def test_empty_and_invalid_periods(self):
+        self.assertTrue(resample_candles(synthetic_frame(10).iloc[:0], "4HRS").empty)
+        with self.assertRaises(ValueError):
+            resample_candles(synthetic_frame(10), "1HRS", "4HRS")
+
+
+if __name__ == "__main__":
+    unittest.main()
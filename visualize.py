@@ -1,9 +1,17 @@
 
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Mapping
+import numpy as np
+import pandas as pd
 from plotly.subplots import make_subplots
 import plotly.graph_objects as go
 import streamlit as st
 
+from compact import time_bounds
+from downsample import bar_points, candle_points, line_points
+from instrumentation import instrumented
+
 # Setting up logging
 logging.basicConfig(level=logging.INFO)
 
@@ -31,9 +39,53 @@ from constants import (
     MACD_LINE_USAGE,
     SIGNAL_LINE_DESCRIPTION,
     SIGNAL_LINE_USAGE,
+    WEBGL_POINT_THRESHOLD,
 )
 
 
+class FigureBuilder:
+    """
+    Shared trace factory for the chart builders.
+
+    The time axis is pulled out of the data frame once as a datetime64 array and
+    the same array is handed to every trace of every figure; values are passed as
+    NumPy arrays too, which plotly validates and serializes far faster than pandas
+    Series. Sharing the array only saves work on the server: the figure JSON has no
+    way to reference one array from several traces, so every trace still carries
+    its own x values, and downsampled traces keep different points anyway.
+
+    Line traces switch to WebGL when the frame has more than WEBGL_POINT_THRESHOLD
+    rows. The switch uses the row count before downsampling, because the app always
+    downsamples to point_budget() points.
+    """
+
+    def __init__(self, df, max_points=None):
+        self.df = df
+        self.max_points = max_points
+        self.x = df["time_period_start"].values
+        self.line = go.Scattergl if len(self.x) > WEBGL_POINT_THRESHOLD else go.Scatter
+
+    def scatter(self, y, **kwargs):
+        x, y = line_points(self.x, y.to_numpy(), self.max_points)
+        return self.line(x=x, y=y, **kwargs)
+
+    def bar(self, y, **kwargs):
+        x, y = bar_points(self.x, y.to_numpy(), self.max_points)
+        return go.Bar(x=x, y=y, **kwargs)
+
+    def candlestick(self, **kwargs):
+        df = self.df
+        points = candle_points(
+            self.x,
+            df["price_open"].to_numpy(),
+            df["price_high"].to_numpy(),
+            df["price_low"].to_numpy(),
+            df["price_close"].to_numpy(),
+            self.max_points,
+        )
+        return go.Candlestick(**points, **kwargs)
+
+
 def display_description_and_usage(description, usage):
     """Displays the description and usage information."""
     st.write(f"""
@@ -45,7 +97,20 @@ def display_description_and_usage(description, usage):
     """)
 
 
-def market_data(df):
+def chart_range(df):
+    """
+    Lets the user zoom all charts into a time range; the charts are rebuilt from full-resolution data for it.
+
+    The frame may be in the compact layout; only its time axis is read.
+    """
+    first, last = (bound.to_pydatetime() for bound in time_bounds(df))
+    if first == last:
+        return first, last
+    return st.slider("Chart range", min_value=first, max_value=last, value=(first, last))
+
+
+@instrumented()
+def market_data(df, fig=None):
     """Visualizes market data using various indicators."""
     try:
         st.title(MARKET_DATA_TITLE)
@@ -59,34 +124,39 @@ def market_data(df):
             display_description_and_usage(MA50_DESCRIPTION, MA50_USAGE)
             display_description_and_usage(MA200_DESCRIPTION, MA200_USAGE)
 
-        fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=("Market Data",))
+        if fig is None:
+            fig = market_data_figure(df)
+
+        st.plotly_chart(fig, use_container_width=True)
+
+    except Exception as e:
+        logging.error(f"An error occurred while visualizing market data: {e}")
+        st.write("An error occurred while visualizing market data. Please check the logs for more details.")
 
-        fig.add_trace(go.Candlestick(
-            x=df["time_period_start"], 
-            open=df["price_open"], 
-            high=df["price_high"], 
-            low=df["price_low"], 
-            close=df["price_close"], 
-            name="Market data"))
 
-        fig.add_trace(go.Scatter(x=df["time_period_start"], y=df["vwap"], mode="lines", name="Volume Weighted Average Price (VWAP)", line=dict(width=2, color="purple")))
+@instrumented()
+def market_data_figure(df, max_points=None, builder=None):
+    """Builds the candlestick chart with VWAP, Bollinger Bands and moving averages, downsampled to max_points."""
+    builder = builder or FigureBuilder(df, max_points)
+    fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=("Market Data",))
 
-        fig.add_trace(go.Scatter(x=df["time_period_start"], y=df["bollinger_upper"], marker=dict(color="blue"), line=dict(width=0.5), name="Upper Bollinger Band"))
-        fig.add_trace(go.Scatter(x=df["time_period_start"], y=df["bollinger_lower"], marker=dict(color="red"), line=dict(width=0.5), name="Lower Bollinger Band"))
+    fig.add_trace(builder.candlestick(name="Market data"))
 
-        fig.add_trace(go.Scatter(x=df["time_period_start"], y=df["ma50"], marker=dict(color="orange"), line=dict(width=0.5), name="50-period Moving Average"))
-        fig.add_trace(go.Scatter(x=df["time_period_start"], y=df["ma200"], marker=dict(color="green"), line=dict(width=0.5), name="200-period Moving Average"))
+    fig.add_trace(builder.scatter(df["vwap"], mode="lines", name="Volume Weighted Average Price (VWAP)", line=dict(width=2, color="purple")))
 
-        fig.update_layout(title="Bitcoin Candlestick Chart with Market Data", yaxis_title="Price (USD)")
+    fig.add_trace(builder.scatter(df["bollinger_upper"], marker=dict(color="blue"), line=dict(width=0.5), name="Upper Bollinger Band"))
+    fig.add_trace(builder.scatter(df["bollinger_lower"], marker=dict(color="red"), line=dict(width=0.5), name="Lower Bollinger Band"))
 
-        st.plotly_chart(fig, use_container_width=True)
+    fig.add_trace(builder.scatter(df["ma50"], marker=dict(color="orange"), line=dict(width=0.5), name="50-period Moving Average"))
+    fig.add_trace(builder.scatter(df["ma200"], marker=dict(color="green"), line=dict(width=0.5), name="200-period Moving Average"))
 
-    except Exception as e:
-        logging.error(f"An error occurred while visualizing market data: {e}")
-        st.write("An error occurred while visualizing market data. Please check the logs for more details.")
+    fig.update_layout(title="Bitcoin Candlestick Chart with Market Data", yaxis_title="Price (USD)")
 
+    return fig
 
-def volatility(df):
+
+@instrumented()
+def volatility(df, fig=None):
     """Visualizes the volatility of the market data."""
     try:
         st.title(VOLATILITY_TITLE)
@@ -96,11 +166,8 @@ def volatility(df):
         if volatility_description:
             display_description_and_usage(VOLATILITY_DESCRIPTION, VOLATILITY_USAGE)
 
-        fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=('Volatility Analysis',))
-
-        fig.add_trace(go.Scatter(x=df['time_period_start'], y=df['volatility'], mode='lines', name='Volatility', line=dict(width=2, color='red')))
-
-        fig.update_layout(title='Bitcoin Price Volatility Analysis', yaxis_title='Volatility (%)')
+        if fig is None:
+            fig = volatility_figure(df)
 
         st.plotly_chart(fig, use_container_width=True)
 
@@ -109,7 +176,21 @@ def volatility(df):
         st.write("An error occurred while visualizing volatility data. Please check the logs for more details.")
 
 
-def trade_velocity(df):
+@instrumented()
+def volatility_figure(df, max_points=None, builder=None):
+    """Builds the volatility line chart, downsampled to max_points."""
+    builder = builder or FigureBuilder(df, max_points)
+    fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=('Volatility Analysis',))
+
+    fig.add_trace(builder.scatter(df['volatility'], mode='lines', name='Volatility', line=dict(width=2, color='red')))
+
+    fig.update_layout(title='Bitcoin Price Volatility Analysis', yaxis_title='Volatility (%)')
+
+    return fig
+
+
+@instrumented()
+def trade_velocity(df, fig=None):
     """Visualizes the trade velocity based on volume traded."""
     try:
         st.title(VOLUME_TRADED_TITLE)
@@ -119,11 +200,8 @@ def trade_velocity(df):
         if volume_traded_description:
             display_description_and_usage(VOLUME_DESCRIPTION, VOLUME_USAGE)
 
-        fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=('Volume Traded',))
-
-        fig.add_trace(go.Bar(x=df['time_period_start'], y=df['volume_traded'], name='Volume Traded'))
-
-        fig.update_layout(title='Bitcoin Volume Traded Analysis', yaxis_title='Volume')
+        if fig is None:
+            fig = trade_velocity_figure(df)
 
         st.plotly_chart(fig, use_container_width=True)
 
@@ -132,7 +210,21 @@ def trade_velocity(df):
         st.write("An error occurred while visualizing trade velocity data. Please check the logs for more details.")
 
 
-def rsi_and_macd(df):
+@instrumented()
+def trade_velocity_figure(df, max_points=None, builder=None):
+    """Builds the volume traded bar chart, downsampled to max_points."""
+    builder = builder or FigureBuilder(df, max_points)
+    fig = make_subplots(rows=1, cols=1, shared_xaxes=True, subplot_titles=('Volume Traded',))
+
+    fig.add_trace(builder.bar(df['volume_traded'], name='Volume Traded'))
+
+    fig.update_layout(title='Bitcoin Volume Traded Analysis', yaxis_title='Volume')
+
+    return fig
+
+
+@instrumented()
+def rsi_and_macd(df, fig=None):
     """Visualizes the RSI and MACD indicators."""
     try:
         st.title(MACD_ANALYSIS_TITLE)
@@ -143,16 +235,126 @@ def rsi_and_macd(df):
             display_description_and_usage(MACD_LINE_DESCRIPTION, MACD_LINE_USAGE)
             display_description_and_usage(SIGNAL_LINE_DESCRIPTION, SIGNAL_LINE_USAGE)
 
-        fig = make_subplots(rows=2, cols=1, shared_xaxes=True, subplot_titles=('MACD Line and Signal Line', 'MACD Histogram'))
-
-        fig.add_trace(go.Scatter(x=df['time_period_start'], y=df['macd'], mode='lines', name='MACD Line', line=dict(width=2, color='blue')), row=1, col=1)
-        fig.add_trace(go.Scatter(x=df['time_period_start'], y=df['macd_signal'], mode='lines', name='Signal Line', line=dict(width=2, color='red')), row=1, col=1)
-        fig.add_trace(go.Bar(x=df['time_period_start'], y=df['macd'] - df['macd_signal'], name='MACD Histogram'), row=2, col=1)
-
-        fig.update_layout(title='Bitcoin Moving Average Convergence Divergence (MACD) Analysis', yaxis_title='MACD Value')
+        if fig is None:
+            fig = rsi_and_macd_figure(df)
 
         st.plotly_chart(fig, use_container_width=True)
 
     except Exception as e:
         logging.error(f"An error occurred while visualizing RSI and MACD data: {e}")
         st.write("An error occurred while visualizing RSI and MACD data. Please check the logs for more details.")
+
+
+@instrumented()
+def rsi_and_macd_figure(df, max_points=None, builder=None):
+    """Builds the MACD line, signal line and histogram chart, downsampled to max_points."""
+    builder = builder or FigureBuilder(df, max_points)
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, subplot_titles=('MACD Line and Signal Line', 'MACD Histogram'))
+
+    fig.add_trace(builder.scatter(df['macd'], mode='lines', name='MACD Line', line=dict(width=2, color='blue')), row=1, col=1)
+    fig.add_trace(builder.scatter(df['macd_signal'], mode='lines', name='Signal Line', line=dict(width=2, color='red')), row=1, col=1)
+    fig.add_trace(builder.bar(df['macd'] - df['macd_signal'], name='MACD Histogram'), row=2, col=1)
+
+    fig.update_layout(title='Bitcoin Moving Average Convergence Divergence (MACD) Analysis', yaxis_title='MACD Value')
+
+    return fig
+
+
+FIGURE_BUILDERS = {
+    "market_data": market_data_figure,
+    "volatility": volatility_figure,
+    "trade_velocity": trade_velocity_figure,
+    "rsi_and_macd": rsi_and_macd_figure,
+}
+
+
+@instrumented()
+def build_figures(df, max_points=None):
+    """
+    Builds every chart concurrently from one shared FigureBuilder.
+
+    :return: A dict of chart name to figure; a chart that fails to build is logged and left out.
+    """
+    builder = FigureBuilder(df, max_points)
+    with ThreadPoolExecutor(max_workers=len(FIGURE_BUILDERS)) as executor:
+        futures = {name: executor.submit(build, df, max_points, builder) for name, build in FIGURE_BUILDERS.items()}
+
+    figures = {}
+    for name, future in futures.items():
+        try:
+            figures[name] = future.result()
+        except Exception as e:
+            logging.error(f"An error occurred while building the {name} chart: {e}")
+    return figures
+
+
+# Column (or callable of the candle and indicator values) plotted by each named line or bar trace.
+LIVE_TRACE_VALUES = {
+    "Volume Weighted Average Price (VWAP)": "vwap",
+    "Upper Bollinger Band": "bollinger_upper",
+    "Lower Bollinger Band": "bollinger_lower",
+    "50-period Moving Average": "ma50",
+    "200-period Moving Average": "ma200",
+    "Volatility": "volatility",
+    "Volume Traded": "volume_traded",
+    "MACD Line": "macd",
+    "Signal Line": "macd_signal",
+    "MACD Histogram": lambda values: values["macd"] - values["macd_signal"],
+}
+
+
+def upsert_point(trace, x, **values):
+    """
+    Replaces the point of a trace at x, or inserts it where it keeps the x values ordered.
+
+    Traces hold either ascending (downsampled) or descending (frame order) x values,
+    and both orders are kept. The data arrays are replaced rather than written to, so
+    figures copied from a shared one never alias its arrays.
+
+    :param trace: A plotly trace with array data.
+    :param x: The time_period_start of the point, a datetime64 or tz-aware timestamp.
+    :param values: New values of the trace's data arrays, e.g. y=... or open=..., close=...
+    """
+    xs = np.asarray(trace.x)
+    x = pd.Timestamp(x).as_unit("ns").to_datetime64()
+    match = np.flatnonzero(xs == x)
+    if len(match):
+        for key, value in values.items():
+            data = np.array(trace[key], dtype="float64")
+            data[match] = value
+            trace[key] = data
+        return
+
+    descending = len(xs) > 1 and xs[0] > xs[-1]
+    position = np.count_nonzero(xs > x) if descending else np.count_nonzero(xs < x)
+    trace.x = np.insert(xs, position, x)
+    for key, value in values.items():
+        trace[key] = np.insert(np.asarray(trace[key], dtype="float64"), position, value)
+
+
+@instrumented()
+def extend_figures(figures, candle: Mapping, indicators: Mapping):
+    """
+    Applies one new or updated candle to the charts built by build_figures in place.
+
+    Only the point at the candle's time_period_start is replaced or inserted in each
+    trace, so a live tick costs a few array copies instead of rebuilding the charts.
+
+    :param figures: A dict of chart name to figure, as returned by build_figures.
+    :param candle: The candle, with the CoinAPI OHLCV fields.
+    :param indicators: Its indicator values, as returned by StreamingIndicatorEngine.update.
+    """
+    values = {**candle, **indicators}
+    x = candle["time_period_start"]
+    for fig in figures.values():
+        with fig.batch_update():
+            for trace in fig.data:
+                if trace.type == "candlestick":
+                    upsert_point(
+                        trace, x, open=values["price_open"], high=values["price_high"],
+                        low=values["price_low"], close=values["price_close"],
+                    )
+                elif trace.name in LIVE_TRACE_VALUES:
+                    column = LIVE_TRACE_VALUES[trace.name]
+                    upsert_point(trace, x, y=column(values) if callable(column) else values[column])
+    return figures